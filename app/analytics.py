@@ -0,0 +1,212 @@
+from bisect import bisect_left, bisect_right, insort
+from calendar import monthrange
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .models import AnalyticsBucket, AnalyticsReport, Retro, TermCount
+from .repository import CatchUpListener
+from .search import tokenize
+
+TERM_FIELDS = ("to_improve", "actions")
+
+
+@dataclass
+class _Stats:
+    retros: int = 0
+    items: int = 0
+    terms: Dict[str, Counter] = field(
+        default_factory=lambda: {f: Counter() for f in TERM_FIELDS}
+    )
+
+    def apply(self, retros: int, items: int, deltas: Dict[str, Counter]) -> None:
+        self.retros += retros
+        self.items += items
+        for name, delta in deltas.items():
+            counter = self.terms[name]
+            if retros > 0:
+                counter.update(delta)
+            else:
+                counter.subtract(delta)
+                for term in delta:
+                    if counter[term] <= 0:
+                        del counter[term]
+
+
+Month = Tuple[int, int]
+
+
+def period_of(day: date, granularity: str) -> str:
+    if granularity == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return f"{day.year}-{day.month:02d}"
+
+
+def _month_end(month: Month) -> date:
+    year, number = month
+    return date(year, number, monthrange(year, number)[1])
+
+
+class _Contribution(NamedTuple):
+    """Вклад одного ретро в корзины: вычитается, когда ретро меняется."""
+
+    day: date
+    items: int
+    terms: Dict[str, Counter]
+
+
+class RetroAnalytics(CatchUpListener):
+    """
+    Инкрементальные агрегаты по ретро: счетчики и частоты термов по дням,
+    месяцам и годам.
+
+    Обновляется как CatchUpListener: события своего процесса применяются по
+    ревизии (опоздавшее событие не меняет агрегаты дважды), записи других
+    воркеров общего SQLite подтягивает sync() перед отчетом. Для этого
+    хранится вклад каждого ретро.
+
+    Каждая запись меняет только корзины своего дня, месяца и года (для
+    update — старые и новые). Запрос собирает диапазон из крупных корзин:
+    целые годы, затем целые месяцы, и только у неполных месяцев на краях
+    диапазона — дни. Поэтому он стоит O(лет + месяцев + ~60 дней) слияний
+    счетчиков, а не O(дней в диапазоне), и остается точным по
+    from_date/to_date.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._contributions: Dict[int, _Contribution] = {}
+        self._days: Dict[date, _Stats] = {}
+        self._sorted_days: List[date] = []
+        self._months: Dict[Month, _Stats] = {}
+        self._sorted_months: List[Month] = []
+        self._years: Dict[int, _Stats] = {}
+
+    def report(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        granularity: str = "month",
+        top: int = 10,
+    ) -> AnalyticsReport:
+        buckets: Dict[str, AnalyticsBucket] = {}
+        terms = {f: Counter() for f in TERM_FIELDS}
+        with self._lock:
+            self._collect(
+                from_date or date.min, to_date or date.max, granularity, buckets, terms
+            )
+        return AnalyticsReport(
+            granularity=granularity,
+            buckets=list(buckets.values()),
+            top_terms={
+                name: [TermCount(term=t, count=c) for t, c in counter.most_common(top)]
+                for name, counter in terms.items()
+            },
+        )
+
+    def _collect(
+        self,
+        start: date,
+        end: date,
+        granularity: str,
+        buckets: Dict[str, AnalyticsBucket],
+        terms: Dict[str, Counter],
+    ) -> None:
+        if not self._sorted_days:
+            return
+        # Данных вне [первый день, последний день] нет: перебор можно сузить.
+        lo = max(start, self._sorted_days[0])
+        hi = min(end, self._sorted_days[-1])
+        if lo > hi:
+            return
+        full_years = {
+            year
+            for year in range(lo.year, hi.year + 1)
+            if date(year, 1, 1) >= start and date(year, 12, 31) <= end
+        }
+        months = self._sorted_months
+        first = bisect_left(months, (lo.year, lo.month))
+        last = bisect_right(months, (hi.year, hi.month))
+        for month in months[first:last]:
+            if date(*month, 1) >= start and _month_end(month) <= end:
+                parts = [self._months[month]]
+                if month[0] not in full_years:
+                    _merge_terms(terms, parts)
+            else:
+                days = self._sorted_days
+                day_lo = bisect_left(days, max(lo, date(*month, 1)))
+                day_hi = bisect_right(days, min(hi, _month_end(month)))
+                parts = [self._days[day] for day in days[day_lo:day_hi]]
+                if not parts:
+                    continue
+                _merge_terms(terms, parts)
+            period = period_of(date(*month, 1), granularity)
+            bucket = buckets.get(period)
+            if bucket is None:
+                bucket = buckets[period] = AnalyticsBucket(
+                    period=period, retros=0, items=0
+                )
+            for stats in parts:
+                bucket.retros += stats.retros
+                bucket.items += stats.items
+        _merge_terms(
+            terms, [self._years[y] for y in sorted(full_years) if y in self._years]
+        )
+
+    def _put(self, retro: Retro) -> None:
+        contribution = _Contribution(
+            retro.session_date,
+            len(retro.items),
+            {
+                name: Counter(
+                    t
+                    for item in retro.items
+                    for t in tokenize(getattr(item, name), stem=False)
+                )
+                for name in TERM_FIELDS
+            },
+        )
+        self._contributions[retro.id] = contribution
+        self._apply(contribution, +1)
+
+    def _drop(self, retro_id: int) -> None:
+        contribution = self._contributions.pop(retro_id, None)
+        if contribution is not None:
+            self._apply(contribution, -1)
+
+    def _reset(self) -> None:
+        self._contributions.clear()
+        self._days.clear()
+        self._sorted_days.clear()
+        self._months.clear()
+        self._sorted_months.clear()
+        self._years.clear()
+
+    def _apply(self, contribution: _Contribution, sign: int) -> None:
+        day = contribution.day
+        deltas = contribution.terms
+        items = sign * contribution.items
+        month = (day.year, day.month)
+        levels = (
+            (self._days, self._sorted_days, day),
+            (self._months, self._sorted_months, month),
+            (self._years, None, day.year),
+        )
+        for stats_by_key, sorted_keys, key in levels:
+            stats = stats_by_key.get(key)
+            if stats is None:
+                stats = stats_by_key[key] = _Stats()
+                if sorted_keys is not None:
+                    insort(sorted_keys, key)
+            stats.apply(sign, items, deltas)
+            if stats.retros == 0:
+                del stats_by_key[key]
+                if sorted_keys is not None:
+                    del sorted_keys[bisect_left(sorted_keys, key)]
+
+
+def _merge_terms(terms: Dict[str, Counter], parts: List[_Stats]) -> None:
+    for stats in parts:
+        for name in TERM_FIELDS:
+            terms[name].update(stats.terms[name])
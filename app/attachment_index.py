@@ -0,0 +1,349 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .attachments import is_blob_name, is_uuid_name, resolve_attachment
+from .blob_store import BlobStore
+from .models import Retro
+from .repository import RetroListener, RetroRepository
+from .secure_upload import SavedFile
+
+logger = logging.getLogger(__name__)
+
+_ATTACHMENTS = """
+CREATE TABLE IF NOT EXISTS attachments (
+    store TEXT NOT NULL,
+    retro_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mime_type TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (store, retro_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_attachments_name ON attachments (name);
+"""
+
+_SCHEMA = (
+    _ATTACHMENTS
+    + """
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+) WITHOUT ROWID;
+"""
+)
+
+# Индекс без колонки store: все его строки принадлежат общему хранилищу.
+_ADD_STORE = (
+    """
+BEGIN;
+DROP INDEX ix_attachments_name;
+ALTER TABLE attachments RENAME TO attachments_old;
+"""
+    + _ATTACHMENTS
+    + """
+INSERT INTO attachments
+    SELECT '', retro_id, name, size, mime_type, sha256, created_at FROM attachments_old;
+DROP TABLE attachments_old;
+COMMIT;
+"""
+)
+
+# Запрос на удаление вложений: (хранилище, id ретро или None — все, момент
+# удаления). Вложения, добавленные позже этого момента, не трогаются: id ретро
+# после clear() выдаются заново.
+_Purge = Tuple[str, Optional[int], float]
+
+_MEMORY_STORE = re.compile(r"^memory-(\d+)-[0-9a-f]+$")
+
+
+def memory_store_id() -> str:
+    """
+    Идентификатор in-memory хранилища ретро этого процесса: у каждого воркера
+    свои ретро с пересекающимися id, поэтому их вложения нельзя смешивать.
+    """
+    return f"memory-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _is_dead_memory_store(store: str) -> bool:
+    match = _MEMORY_STORE.match(store)
+    if match is None:
+        return False
+    pid = int(match.group(1))
+    if pid == os.getpid():
+        # Тот же pid у другого идентификатора — завершившийся прошлый процесс.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+class AttachmentRecord(NamedTuple):
+    name: str
+    size: int
+    mime_type: str
+    sha256: str
+    created_at: float
+
+
+class AttachmentIndex(RetroListener):
+    """
+    Индекс вложений (ретро → файлы с размером, MIME-типом и SHA-256) в SQLite
+    рядом с файлами, общий для всех воркеров. Строки помечены хранилищем
+    ретро store: пустая строка — общее для воркеров (SQLite, журнал), иначе
+    in-memory хранилище одного процесса (memory_store_id). Чтение, удаление
+    и сверка затрагивают только свое хранилище.
+
+    Подписан на хранилище ретро: удаление ретро только ставит запрос в
+    очередь, а файлы удаляет фоновый поток пачками, поэтому DELETE не ждет
+    файловой системы. Тот же поток раз в sweep_interval сверяет индекс с
+    диском (см. sweep).
+    """
+
+    def __init__(
+        self,
+        upload_root: Path,
+        blob_store: Optional[BlobStore] = None,
+        store: str = "",
+        index_name: str = ".attachments.sqlite3",
+        orphan_grace: float = 3600.0,
+        batch_size: int = 100,
+    ) -> None:
+        self.root = upload_root.resolve(strict=True)
+        self.blob_store = blob_store
+        self.store = store
+        self.orphan_grace = orphan_grace
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.root / index_name), isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(attachments)")
+        ]
+        if columns and "store" not in columns:
+            self._conn.executescript(_ADD_STORE)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO index_meta (key, value) VALUES ('created_at', ?)",
+            (time.time(),),
+        )
+        # Файлы старше индекса могли быть загружены до него: их не трогаем.
+        self.created_at = self._conn.execute(
+            "SELECT value FROM index_meta WHERE key = 'created_at'"
+        ).fetchone()[0]
+        self._queue: "queue.Queue[Optional[_Purge]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, retro_id: int, saved: SavedFile) -> AttachmentRecord:
+        record = AttachmentRecord(
+            saved.path.name, saved.size, saved.mime_type, saved.sha256, time.time()
+        )
+        with self._lock, self._conn:
+            inserted = self._conn.execute(
+                "INSERT INTO attachments VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (store, retro_id, name) DO NOTHING",
+                (self.store, retro_id, *record),
+            ).rowcount
+        if not inserted and self.blob_store is not None and is_blob_name(record.name):
+            # Тот же объект повторно загружен к тому же ретро: лишняя ссылка не нужна.
+            self.blob_store.release(record.sha256)
+        return record
+
+    def list(self, retro_id: int) -> List[AttachmentRecord]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, size, mime_type, sha256, created_at FROM attachments "
+                "WHERE store = ? AND retro_id = ? ORDER BY created_at, name",
+                (self.store, retro_id),
+            ).fetchall()
+        return [AttachmentRecord(*row) for row in rows]
+
+    def owns(self, retro_id: int, name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM attachments WHERE store = ? AND retro_id = ? AND name = ?",
+                (self.store, retro_id, name),
+            ).fetchone()
+        return row is not None
+
+    def on_write(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        if new is None and old is not None:
+            self.schedule_purge(old.id)
+
+    def on_clear(self) -> None:
+        self._queue.put((self.store, None, time.time()))
+
+    def schedule_purge(self, retro_id: int) -> None:
+        """Ставит удаление вложений ретро в очередь фонового потока."""
+        self._queue.put((self.store, retro_id, time.time()))
+
+    def prune_missing(self, retros: RetroRepository) -> int:
+        """
+        Ставит в очередь удаление вложений ретро своего хранилища, которых в
+        нем нет, и всех вложений in-memory хранилищ завершившихся процессов.
+        Возвращает число запросов.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT store, retro_id FROM attachments"
+            ).fetchall()
+        now = time.time()
+        requests: List[_Purge] = []
+        dead = set()
+        for store, retro_id in rows:
+            if store == self.store:
+                if retro_id not in retros:
+                    requests.append((store, retro_id, now))
+            elif store not in dead and _is_dead_memory_store(store):
+                dead.add(store)
+                requests.append((store, None, now))
+        for request in requests:
+            self._queue.put(request)
+        return len(requests)
+
+    def purge(self, requests: List[_Purge]) -> int:
+        """Удаляет строки индекса одной транзакцией, затем файлы. Возвращает число строк."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = []
+            for store, retro_id, cutoff in requests:
+                where = "store = ? AND created_at <= ?"
+                params: tuple = (store, cutoff)
+                if retro_id is not None:
+                    where += " AND retro_id = ?"
+                    params += (retro_id,)
+                rows += self._conn.execute(
+                    f"SELECT name, sha256 FROM attachments WHERE {where}", params
+                ).fetchall()
+                self._conn.execute(f"DELETE FROM attachments WHERE {where}", params)
+        self._remove_files(rows)
+        return len(rows)
+
+    def sweep(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Сверяет индекс с диском: удаляет строки, чьих файлов нет, файлы
+        без строки в индексе (созданные после индекса и старше orphan_grace)
+        и брошенные временные файлы загрузок; в режиме cas собирает объекты
+        без ссылок.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            names = {
+                row[0] for row in self._conn.execute("SELECT name FROM attachments")
+            }
+        missing = [
+            name
+            for name in names
+            if resolve_attachment(self.root, name, self.blob_store) is None
+        ]
+        if missing:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "DELETE FROM attachments WHERE name = ?", [(n,) for n in missing]
+                )
+
+        orphans = parts = 0
+        cutoff = now - self.orphan_grace
+        for entry in os.scandir(self.root):
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            mtime = entry.stat(follow_symlinks=False).st_mtime
+            if mtime >= cutoff:
+                continue
+            if is_uuid_name(entry.name):
+                if entry.name in names or mtime < self.created_at:
+                    continue
+                orphans += 1
+            elif entry.name.startswith(".upload-") and entry.name.endswith(".part"):
+                parts += 1
+            else:
+                continue
+            Path(entry.path).unlink(missing_ok=True)
+
+        blobs = self.blob_store.collect_garbage() if self.blob_store is not None else 0
+        return {
+            "missing_rows": len(missing),
+            "orphan_files": orphans,
+            "stale_parts": parts,
+            "blobs": blobs,
+        }
+
+    def start(self, sweep_interval: float) -> None:
+        """Запускает фоновый поток каскадного удаления и периодической сверки."""
+        self._thread = threading.Thread(
+            target=self._run, args=(sweep_interval,), name="attachments", daemon=True
+        )
+        self._thread.start()
+
+    def wait_idle(self) -> None:
+        """Ждет, пока поток обработает все поставленные удаления."""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._conn.close()
+
+    def _remove_files(self, rows: List[Tuple[str, str]]) -> None:
+        released = False
+        for name, sha256 in rows:
+            if is_blob_name(name):
+                if self.blob_store is not None:
+                    self.blob_store.release(sha256)
+                    released = True
+            elif is_uuid_name(name):
+                (self.root / name).unlink(missing_ok=True)
+        if released:
+            self.blob_store.collect_garbage()
+
+    def _run(self, sweep_interval: float) -> None:
+        next_sweep = time.monotonic() + sweep_interval
+        stopping = False
+        while not stopping:
+            batch: List[_Purge] = []
+            taken = 0
+            try:
+                item = self._queue.get(timeout=max(0.0, next_sweep - time.monotonic()))
+                taken = 1
+                while True:
+                    if item is None:
+                        stopping = True
+                    else:
+                        batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+                    taken += 1
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    self.purge(batch)
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + sweep_interval
+                    stats = self.sweep()
+                    if any(stats.values()):
+                        logger.info("Attachment sweep", extra=stats)
+            except (OSError, sqlite3.Error):
+                logger.exception("Attachment cleanup failed")
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .blob_store import BlobStore
+from .secure_upload import ALLOWED_MIME_TYPES, CHUNK_SIZE, MAX_FILE_SIZE
+
+_EXT_TO_MIME = {ext: mime for mime, ext in ALLOWED_MIME_TYPES.items()}
+_EXTS = "|".join(re.escape(ext) for ext in _EXT_TO_MIME)
+_UUID_NAME = re.compile(
+    rf"^[0-9a-f]{{8}}(-[0-9a-f]{{4}}){{3}}-[0-9a-f]{{12}}({_EXTS})$"
+)
+_BLOB_NAME = re.compile(rf"^[0-9a-f]{{64}}({_EXTS})$")
+
+# Сколько файлов можно загрузить одним запросом /attachments/batch.
+MAX_BATCH_FILES = 20
+
+# Пределы тела multipart-запросов: файл плюс запас на заголовки частей.
+MAX_UPLOAD_BODY = MAX_FILE_SIZE + 64 * 1024
+MAX_BATCH_BODY = MAX_BATCH_FILES * MAX_UPLOAD_BODY
+
+# Вложения неизменяемы: имя — это uuid4 или SHA-256 содержимого.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def is_uuid_name(name: str) -> bool:
+    """Имя вложения в режиме uuid (файл лежит прямо в каталоге загрузок)."""
+    return _UUID_NAME.match(name) is not None
+
+
+def is_blob_name(name: str) -> bool:
+    """Имя вложения в режиме cas (<sha256><ext>, объект BlobStore)."""
+    return _BLOB_NAME.match(name) is not None
+
+
+def media_type_for(name: str) -> str:
+    return _EXT_TO_MIME.get(Path(name).suffix, "application/octet-stream")
+
+
+def resolve_attachment(
+    upload_dir: Path, name: str, blob_store: Optional[BlobStore] = None
+) -> Optional[Path]:
+    """
+    Возвращает путь к вложению по его публичному имени или None.
+    Принимаются только имена, которые выдает сервер, поэтому выйти за
+    пределы upload_dir через имя нельзя.
+    """
+    if _BLOB_NAME.match(name):
+        return blob_store.lookup(name) if blob_store is not None else None
+    if _UUID_NAME.match(name):
+        path = upload_dir / name
+        return path if path.is_file() and not path.is_symlink() else None
+    return None
+
+
+class ContentHashCache:
+    """
+    LRU-кэш SHA-256 содержимого файлов для сильных ETag.
+    Ключ включает mtime и размер, так что измененный файл будет пересчитан.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, path: Path, stat_result: os.stat_result) -> str:
+        key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if _BLOB_NAME.match(path.name):
+            digest = path.stem
+        else:
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+
+        with self._lock:
+            self._entries[key] = digest
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+    def etag(self, path: Path, stat_result: os.stat_result) -> str:
+        return f'"{self.digest(path, stat_result)}"'
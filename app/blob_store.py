@@ -0,0 +1,117 @@
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_blobs_garbage ON blobs (refcount) WHERE refcount <= 0;
+"""
+
+_BLOB_NAME = re.compile(r"^(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]{1,8})$")
+
+
+class BlobStore:
+    """
+    Контентно-адресуемое хранилище вложений.
+
+    Объект лежит по пути objects/<2 hex>/<2 hex>/<sha256><ext> внутри каталога
+    загрузок, счетчики ссылок — в небольшом SQLite-индексе рядом с объектами.
+    Повторная загрузка тех же байтов только увеличивает счетчик.
+    """
+
+    def __init__(self, root: Path, index_name: str = ".blobs.sqlite3") -> None:
+        self.root = root.resolve(strict=True)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.root / index_name), isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def path_for(self, digest: str, ext: str) -> Path:
+        return self.objects / digest[:2] / digest[2:4] / f"{digest}{ext}"
+
+    def lookup(self, name: str) -> Optional[Path]:
+        """Возвращает путь к объекту по имени <sha256><ext> или None."""
+        match = _BLOB_NAME.match(name)
+        if match is None:
+            return None
+        path = self.path_for(match["digest"], match["ext"])
+        return path if path.is_file() else None
+
+    def put(self, tmp: BinaryIO, digest: str, ext: str, size: int) -> Path:
+        """
+        Публикует временный файл tmp как объект digest.
+        Если объект уже есть, tmp удаляется без fsync и записи, а счетчик растет.
+        """
+        path = self.path_for(digest, ext)
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT refcount FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+            if row is not None and path.is_file():
+                tmp.close()
+                os.unlink(tmp.name)
+                self._conn.execute(
+                    "UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?",
+                    (digest,),
+                )
+                return path
+
+            os.fsync(tmp.fileno())
+            tmp.close()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp.name, path)
+            self._conn.execute(
+                "INSERT INTO blobs (digest, ext, size, refcount) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (digest) DO UPDATE SET refcount = MAX(refcount, 0) + 1",
+                (digest, ext, size),
+            )
+        return path
+
+    def refcount(self, digest: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refcount FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+        return 0 if row is None else row[0]
+
+    def release(self, digest: str) -> int:
+        """Уменьшает счетчик ссылок; сам файл удаляет collect_garbage()."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE blobs SET refcount = refcount - 1 WHERE digest = ? AND refcount > 0",
+                (digest,),
+            )
+            row = self._conn.execute(
+                "SELECT refcount FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+        return 0 if row is None else row[0]
+
+    def collect_garbage(self) -> int:
+        """Удаляет объекты без ссылок. Возвращает число удаленных объектов."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT digest, ext FROM blobs WHERE refcount <= 0"
+            ).fetchall()
+            for digest, ext in rows:
+                self.path_for(digest, ext).unlink(missing_ok=True)
+            self._conn.executemany(
+                "DELETE FROM blobs WHERE digest = ?", [(d,) for d, _ in rows]
+            )
+        return len(rows)
+
+    def close(self) -> None:
+        self._conn.close()
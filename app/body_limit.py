@@ -0,0 +1,63 @@
+from typing import Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.types import Message, Receive
+
+BODY_LIMIT_EXTRA = "x-max-body-size"
+
+
+def body_limit(max_bytes: int) -> dict:
+    """
+    openapi_extra маршрута с пределом размера тела запроса. Предел действует
+    до разбора тела (multipart, JSON), а не после того, как оно целиком
+    получено: лишние байты не читаются.
+    """
+    return {BODY_LIMIT_EXTRA: max_bytes}
+
+
+class BodyTooLarge(HTTPException):
+    # HTTPException, чтобы FastAPI не превращал ошибку при чтении тела в 400.
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(
+            status_code=413,
+            detail=f"Request body is larger than {max_bytes} bytes",
+        )
+
+
+def _limited(receive: Receive, max_bytes: int) -> Receive:
+    received = 0
+
+    async def limited_receive() -> Message:
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise BodyTooLarge(max_bytes)
+        return message
+
+    return limited_receive
+
+
+class BodyLimitedRoute(APIRoute):
+    """
+    Маршрут, отклоняющий тело больше объявленного через body_limit(): сразу
+    по Content-Length или, если его нет, как только прочитано больше предела.
+    Маршруты без объявления не ограничиваются.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        max_bytes = (self.openapi_extra or {}).get(BODY_LIMIT_EXTRA)
+        if max_bytes is None:
+            return handler
+
+        async def body_limited_handler(request: Request) -> Response:
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > max_bytes:
+                raise BodyTooLarge(max_bytes)
+            request = Request(request.scope, _limited(request.receive, max_bytes))
+            return await handler(request)
+
+        return body_limited_handler
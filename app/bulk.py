@@ -0,0 +1,149 @@
+from datetime import date
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+import orjson
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .models import CreateRetroRequest
+from .repository import RetroRepository
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+BULK_BATCH_SIZE = 500
+MAX_NDJSON_LINE = 512 * 1024  # 20 пунктов × 3 поля × 2048 символов UTF-8 с запасом
+
+RawRecord = Union[bytes, dict]
+
+
+class BulkRecordTooLarge(ValueError):
+    pass
+
+
+async def iter_ndjson_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Разбивает поток тела запроса на строки NDJSON, не буферизуя все тело."""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > MAX_NDJSON_LINE:
+            raise BulkRecordTooLarge("NDJSON record is too large")
+    if buffer.strip():
+        yield buffer
+
+
+def parse_json_array(body: bytes) -> List[RawRecord]:
+    try:
+        records = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise ValueError("Request body is not valid JSON")
+    if not isinstance(records, list):
+        raise ValueError("Expected a JSON array of retros")
+    return records
+
+
+async def iter_records(records: List[RawRecord]) -> AsyncIterator[RawRecord]:
+    for record in records:
+        yield record
+
+
+def validate_record(
+    raw: RawRecord, today: date
+) -> Tuple[Optional[CreateRetroRequest], dict]:
+    """
+    Валидирует одну запись импорта.
+    Возвращает (запрос, {}) или (None, описание ошибки для результата).
+    """
+    try:
+        if isinstance(raw, bytes):
+            record = CreateRetroRequest.model_validate_json(raw)
+        else:
+            record = CreateRetroRequest.model_validate(raw)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False, include_input=False)
+        return None, {"status": 422, "errors": errors}
+    if record.session_date > today:
+        return None, {"status": 422, "detail": "Session date cannot be in the future"}
+    return record, {}
+
+
+def result_line(index: int, **fields) -> bytes:
+    return orjson.dumps({"index": index, **fields}) + b"\n"
+
+
+def import_batch(
+    repository: RetroRepository, raw_batch: List[RawRecord], start: int, today: date
+) -> List[bytes]:
+    """
+    Валидирует пачку записей и вставляет валидные одним вызовом create_many.
+    Возвращает строки результата в порядке записей.
+    """
+    lines: List[Optional[bytes]] = [None] * len(raw_batch)
+    valid: List[Tuple[int, CreateRetroRequest]] = []
+    for offset, raw in enumerate(raw_batch):
+        record, error = validate_record(raw, today)
+        if record is None:
+            lines[offset] = result_line(start + offset, **error)
+        else:
+            valid.append((offset, record))
+
+    created = repository.create_many((r.session_date, r.items) for _, r in valid)
+    for (offset, _), retro in zip(valid, created):
+        lines[offset] = result_line(start + offset, status=201, id=retro.id)
+    return lines
+
+
+async def import_records(
+    repository: RetroRepository, records: AsyncIterator[RawRecord], today: date
+) -> AsyncIterator[bytes]:
+    """
+    Импортирует записи пачками по BULK_BATCH_SIZE в threadpool и отдает
+    строки результата по мере обработки каждой пачки, пока тело еще читается.
+    Ошибка чтения тела (слишком длинная запись, предел тела или бюджета)
+    завершает поток строкой с ее статусом: заголовки ответа уже отправлены.
+    """
+    count = 0
+    batch: List[RawRecord] = []
+    error: Optional[dict] = None
+    try:
+        async for raw in records:
+            batch.append(raw)
+            if len(batch) >= BULK_BATCH_SIZE:
+                lines = await run_in_threadpool(
+                    import_batch, repository, batch, count, today
+                )
+                count += len(batch)
+                batch = []
+                yield b"".join(lines)
+    except BulkRecordTooLarge as e:
+        error = {"status": 413, "detail": str(e)}
+    except HTTPException as e:
+        error = {"status": e.status_code, "detail": e.detail}
+    if batch:
+        lines = await run_in_threadpool(import_batch, repository, batch, count, today)
+        count += len(batch)
+        yield b"".join(lines)
+    if error is not None:
+        yield result_line(count, **error)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse, который не ждет разрыва соединения в receive: тело
+    запроса в это время читает сам генератор ответа. Разрыв обнаруживается
+    по ошибке отправки.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import orjson
+
+from .models import Retro
+from .repository import RetroListener
+
+ListKey = Tuple[Optional[date], Optional[date]]
+
+
+def encode_retro(retro: Retro) -> bytes:
+    return orjson.dumps(retro.model_dump())
+
+
+def encode_list(retros: Iterable[Retro]) -> bytes:
+    return b"[" + b",".join(encode_retro(r) for r in retros) + b"]"
+
+
+class _LRU:
+    """
+    LRU-словарь (значение, ревизия) с счетчиками попаданий и промахов.
+    Ограничен и числом записей, и суммарным размером байтов: тело больше
+    max_bytes не кэшируется вовсе.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, bytes]]" = OrderedDict()
+
+    def get(self, key: Hashable, revision: int) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, revision: int, body: bytes) -> None:
+        self.pop(key)
+        if len(body) > self.max_bytes:
+            return
+        self._entries[key] = (revision, body)
+        self.bytes += len(body)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache(RetroListener):
+    """
+    Кэш готовых JSON-байтов для ответов /retros.
+
+    Байты отдельного ретро кладутся в кэш при записи (write-through) и
+    удаляются при удалении; списки кэшируются по (from_date, to_date).
+    Каждая запись помечена ревизией/версией хранилища, поэтому запись,
+    сделанная другим воркером на общем SQLite, тоже приводит к промаху.
+    """
+
+    def __init__(
+        self,
+        max_retros: int = 10000,
+        max_lists: int = 128,
+        max_retro_bytes: int = 32 * 1024 * 1024,
+        max_list_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self._retros = _LRU(max_retros, max_retro_bytes)
+        self._lists = _LRU(max_lists, max_list_bytes)
+        self._lock = threading.Lock()
+
+    def get_retro(self, retro_id: int, revision: int) -> Optional[bytes]:
+        with self._lock:
+            return self._retros.get(retro_id, revision)
+
+    def put_retro(self, retro: Retro, revision: int) -> bytes:
+        body = encode_retro(retro)
+        with self._lock:
+            self._retros.put(retro.id, revision, body)
+        return body
+
+    def get_list(self, key: ListKey, version: int) -> Optional[bytes]:
+        with self._lock:
+            return self._lists.get(key, version)
+
+    def put_list(self, key: ListKey, version: int, retros: Iterable[Retro]) -> bytes:
+        body = encode_list(retros)
+        with self._lock:
+            self._lists.put(key, version, body)
+        return body
+
+    def on_write(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        body = encode_retro(new) if new is not None else None
+        with self._lock:
+            if new is not None:
+                self._retros.put(new.id, revision, body)
+            elif old is not None:
+                self._retros.pop(old.id)
+            self._lists.clear()
+
+    def on_clear(self) -> None:
+        with self._lock:
+            self._retros.clear()
+            self._lists.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "retro_hits": self._retros.hits,
+                "retro_misses": self._retros.misses,
+                "retro_entries": len(self._retros),
+                "retro_bytes": self._retros.bytes,
+                "list_hits": self._lists.hits,
+                "list_misses": self._lists.misses,
+                "list_entries": len(self._lists),
+                "list_bytes": self._lists.bytes,
+            }
@@ -0,0 +1,281 @@
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .conditional import encoded_etag
+from .secure_upload import ALLOWED_MIME_TYPES
+
+try:
+    import zstandard
+except ImportError:  # zstandard есть в requirements.txt; без него отдаем только gzip
+    zstandard = None
+
+# Уже сжатые форматы: повторное сжатие только тратит CPU.
+INCOMPRESSIBLE_TYPES = frozenset(ALLOWED_MIME_TYPES) | {
+    "application/gzip",
+    "application/zip",
+    "application/zstd",
+}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Поддерживаемые кодировки в порядке предпочтения сервера."""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Кодировка по Accept-Encoding: с наибольшим q, при равенстве — по
+    предпочтению сервера. None — клиент не принимает ни одну из наших.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compressor(encoding: str, gzip_level: int, zstd_level: int):
+    """Потоковый компрессор с методами compress(bytes) и flush()."""
+    if encoding == "gzip":
+        return zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=zstd_level).compressobj()
+
+
+def _flush_mode(encoding: str, final: bool) -> int:
+    """
+    Завершение потока для последнего куска, иначе сброс блока: клиент
+    получает и может распаковать каждый чанк, а не ждет накопления окна.
+    """
+    if encoding == "gzip":
+        return zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+    if final:
+        return zstandard.COMPRESSOBJ_FLUSH_FINISH
+    return zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+
+def _feed(stream, data: bytes, flush_mode: int) -> bytes:
+    return stream.compress(data) + stream.flush(flush_mode)
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов gzip или zstd по Accept-Encoding.
+
+    Ответ целиком меньше minimum_size, уже сжатые типы (PNG/JPEG вложений),
+    ответы с Content-Encoding и частичные (206) отдаются как есть. Потоковые
+    ответы (NDJSON) сжимаются по мере отправки чанков, каждый чанк
+    сбрасывается целым блоком. Сжатые байты ответов с ETag запоминаются в
+    LRU по (путь, ETag, кодировка): ETag ретро и списков меняется вместе с
+    содержимым, поэтому повторный запрос той же версии не сжимается заново.
+
+    Сжатое представление — другие байты, поэтому к ETag добавляется
+    кодировка ("r1.2" -> "r1.2-gzip"). If-Match и If-None-Match сравнивают
+    тег без нее (app.conditional), а 304 на такой тег несет его же.
+
+    Кэш ограничен и числом записей, и суммарным размером. Тела и чанки от
+    thread_threshold байт сжимаются в threadpool, чтобы не блокировать
+    цикл событий.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        cache_entries: int = 256,
+        cache_bytes: int = 16 * 1024 * 1024,
+        thread_threshold: int = 64 * 1024,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache_entries = cache_entries
+        self.cache_bytes = cache_bytes
+        self.thread_threshold = thread_threshold
+        self.cache_size = 0
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        # Обработчик и кэш работают в одном цикле событий, блокировка не нужна.
+        self._cache: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingSend(
+            self, scope, encoding, Headers(scope=scope).get("if-none-match"), send
+        )
+        await self.app(scope, receive, responder)
+
+    def cached(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        body = self._cache.get(key)
+        if body is not None:
+            self._cache.move_to_end(key)
+        return body
+
+    def remember(self, key: Tuple[str, str, str], body: bytes) -> None:
+        if self.cache_entries <= 0 or len(body) > self.cache_bytes:
+            return
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self.cache_size -= len(old)
+        self._cache[key] = body
+        self.cache_size += len(body)
+        while (
+            len(self._cache) > self.cache_entries or self.cache_size > self.cache_bytes
+        ):
+            _, evicted = self._cache.popitem(last=False)
+            self.cache_size -= len(evicted)
+
+    def compressor(self, encoding: str):
+        return _compressor(encoding, self.gzip_level, self.zstd_level)
+
+    async def compress(self, stream, data: bytes, flush_mode: int) -> bytes:
+        if len(data) >= self.thread_threshold:
+            return await run_in_threadpool(_feed, stream, data, flush_mode)
+        return _feed(stream, data, flush_mode)
+
+
+class _CompressingSend:
+    """send одного запроса: решает по первому чанку тела, сжимать ли ответ."""
+
+    def __init__(
+        self,
+        owner: CompressionMiddleware,
+        scope: Scope,
+        encoding: str,
+        if_none_match: Optional[str],
+        send: Send,
+    ) -> None:
+        self.owner = owner
+        self.path = scope["path"]
+        self.encoding = encoding
+        self.if_none_match = if_none_match
+        self.send = send
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.stream = None
+
+    async def __call__(self, message: Message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            if message["status"] == 304:
+                message = self._not_modified(message)
+            self.start = message
+            self.passthrough = not self._compressible(Headers(raw=message["headers"]))
+            return
+        if kind != "http.response.body":
+            # Например, http.response.pathsend: файл уходит без нашего участия.
+            await self._flush_start()
+            await self.send(message)
+            return
+        if self.start is not None:
+            await self._first_body(message)
+            return
+        await self._next_body(message)
+
+    def _compressible(self, headers: Headers) -> bool:
+        if self.start["status"] < 200 or self.start["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in INCOMPRESSIBLE_TYPES:
+            return False
+        length = headers.get("content-length")
+        return length is None or int(length) >= self.owner.minimum_size
+
+    def _not_modified(self, message: Message) -> Message:
+        """304 на тег сжатого представления подтверждает именно его."""
+        headers = MutableHeaders(raw=list(message["headers"]))
+        etag = headers.get("etag")
+        if etag is None or not self.if_none_match:
+            return message
+        encoded = encoded_etag(etag, self.encoding)
+        if encoded not in (tag.strip() for tag in self.if_none_match.split(",")):
+            return message
+        headers["etag"] = encoded
+        return {**message, "headers": headers.raw}
+
+    async def _flush_start(self) -> None:
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
+
+    async def _first_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.passthrough or (not more_body and len(body) < self.owner.minimum_size):
+            self.passthrough = True
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=list(self.start["headers"]))
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("accept-encoding")
+        etag = headers.get("etag")
+        if etag:
+            headers["etag"] = encoded_etag(etag, self.encoding)
+        if not more_body:
+            key = (self.path, etag or "", self.encoding)
+            compressed = self.owner.cached(key) if etag else None
+            if compressed is None:
+                stream = self.owner.compressor(self.encoding)
+                compressed = await self.owner.compress(
+                    stream, body, _flush_mode(self.encoding, final=True)
+                )
+                if etag and self.start["status"] == 200:
+                    self.owner.remember(key, compressed)
+            headers["content-length"] = str(len(compressed))
+            await self._send_start(headers)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Потоковый ответ: длина заранее неизвестна.
+        if "content-length" in headers:
+            del headers["content-length"]
+        self.stream = self.owner.compressor(self.encoding)
+        await self._send_start(headers)
+        await self._next_body(message)
+
+    async def _next_body(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+            return
+        more_body = message.get("more_body", False)
+        body = message.get("body", b"")
+        if more_body and not body:
+            return
+        chunk = await self.owner.compress(
+            self.stream, body, _flush_mode(self.encoding, final=not more_body)
+        )
+        if chunk or not more_body:
+            await self.send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+    async def _send_start(self, headers: MutableHeaders) -> None:
+        start, self.start = self.start, None
+        await self.send({**start, "headers": headers.raw})
@@ -0,0 +1,57 @@
+import hashlib
+import re
+from typing import Optional, Set
+
+_RETRO_ETAG = re.compile(r'^"r(?P<id>\d+)\.(?P<revision>\d+)"$')
+# Суффикс, который CompressionMiddleware добавляет к ETag сжатого ответа.
+_ENCODING_SUFFIX = re.compile(r'-(?:gzip|zstd)"$')
+
+
+def _tags(header: str) -> list:
+    """Теги заголовка без суффикса кодировки сжатого представления."""
+    tags = (tag.strip() for tag in header.split(","))
+    return [_ENCODING_SUFFIX.sub('"', tag) for tag in tags if tag]
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag сжатого представления: "r1.2" -> "r1.2-gzip"."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Сравнение для If-None-Match (слабое сравнение по RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in _tags(if_none_match))
+
+
+def retro_etag(retro_id: int, revision: int) -> str:
+    return f'"r{retro_id}.{revision}"'
+
+
+def list_etag(version: int, variant: str) -> str:
+    """
+    ETag списка: версия хранилища плюс хэш параметров запроса,
+    так как разные фильтры дают разные представления.
+    """
+    digest = hashlib.blake2s(variant.encode(), digest_size=6).hexdigest()
+    return f'"v{version}-{digest}"'
+
+
+def if_match_revisions(if_match: str, retro_id: int) -> Optional[Set[int]]:
+    """
+    Разбирает If-Match для ретро. Возвращает множество допустимых ревизий
+    или None для "*" (подходит любая существующая версия).
+    Используется сильное сравнение: слабые теги не подходят.
+    """
+    if if_match.strip() == "*":
+        return None
+    revisions = set()
+    for tag in _tags(if_match):
+        match = _RETRO_ETAG.match(tag)
+        if match and int(match["id"]) == retro_id:
+            revisions.add(int(match["revision"]))
+    return revisions
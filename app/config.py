@@ -1,4 +1,6 @@
 # app/config.py
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,6 +8,50 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     SECRET_KEY: str = "default_secret_for_local_dev"
+    LOG_LEVEL: str = "info"
+
+    STORAGE_BACKEND: Literal["memory", "sqlite"] = "memory"
+    SQLITE_PATH: str = "data/secdev.sqlite3"
+    SQLITE_POOL_SIZE: int = 4
+    JOURNAL_DIR: str = ""
+    JOURNAL_FLUSH_INTERVAL_MS: int = 10
+    JOURNAL_SNAPSHOT_INTERVAL: int = 300
+    JOURNAL_SNAPSHOT_RECORDS: int = 10000
+
+    RESPONSE_CACHE_RETROS: int = 10000
+    RESPONSE_CACHE_LISTS: int = 128
+    RESPONSE_CACHE_RETRO_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_LIST_BYTES: int = 64 * 1024 * 1024
+
+    BULK_MAX_BODY_SIZE: int = 64 * 1024 * 1024
+
+    UPLOAD_WORKERS: int = 4
+    UPLOAD_QUEUE_LIMIT: int = 16
+    ATTACHMENT_READ_WORKERS: int = 4
+    ATTACHMENT_READ_QUEUE_LIMIT: int = 64
+    UPLOAD_STORAGE: Literal["uuid", "cas"] = "uuid"
+    UPLOAD_SESSION_TTL: int = 3600
+    UPLOAD_SESSION_SWEEP_INTERVAL: int = 60
+    ATTACHMENT_SWEEP_INTERVAL: int = 600
+    ATTACHMENT_ORPHAN_GRACE: int = 3600
+
+    METRICS_DIR: str = "data/metrics"
+    METRICS_HEARTBEAT_TTL: float = 30.0
+
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_CACHE_ENTRIES: int = 256
+    COMPRESSION_CACHE_BYTES: int = 16 * 1024 * 1024
+
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "profiles"
+    PROFILING_MAX_FILES: int = 20
+
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_STRATEGY: Literal["fixed-window", "sliding-window-counter"] = (
+        "fixed-window"
+    )
+    RATE_LIMIT_COST_BUDGET: str = "600/minute"
 
 
 settings = Settings()
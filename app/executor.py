@@ -0,0 +1,54 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    """Очередь задач исполнителя заполнена — запрос нужно отклонить."""
+
+
+class BoundedExecutor:
+    """
+    Пул потоков для блокирующего файлового I/O с ограничением очереди.
+
+    max_workers задает число одновременно работающих потоков, max_pending —
+    сколько операций (включая ожидающие) может быть занято одновременно.
+    Отдельный пул не дает всплеску загрузок занять общий threadpool Starlette,
+    в котором выполняются sync-эндпоинты /retros.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = "io") -> None:
+        self.max_pending = max_pending
+        self.pending = 0
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["BoundedExecutor"]:
+        """Резервирует место в очереди или сразу бросает ExecutorSaturated."""
+        # Счетчик меняется только из потока event loop, поэтому блокировка не нужна.
+        if self.pending >= self.max_pending:
+            raise ExecutorSaturated("Executor queue is full")
+        self.pending += 1
+        try:
+            yield self
+        finally:
+            self.pending -= 1
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Выполняет fn в пуле. Вызывать внутри slot(), иначе очередь не ограничена."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, partial(fn, *args, **kwargs))
+
+    async def submit(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Одиночная операция: run() в собственном slot()."""
+        async with self.slot():
+            return await self.run(fn, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
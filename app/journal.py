@@ -0,0 +1,336 @@
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from .models import Retro
+from .repository import RetroListener
+from .store import ItemStore, RetroStore
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = "snapshot.ndjson"
+_SEGMENT = re.compile(r"^journal-(\d{8})\.ndjson$")
+
+
+def _segment_name(number: int) -> str:
+    return f"journal-{number:08d}.ndjson"
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _State:
+    """Состояние хранилищ, собираемое из снимка и хвоста журнала."""
+
+    def __init__(self) -> None:
+        self.retros: Dict[int, Tuple[dict, int]] = {}
+        self.items: Dict[int, dict] = {}
+        self.version = 0
+        self.last_retro_id = 0
+        self.last_item_id = 0
+
+    def apply(self, record: dict) -> None:
+        # Записи несут полное значение, поэтому повторное применение
+        # уже попавших в снимок записей не меняет результат.
+        op = record["op"]
+        if op == "put":
+            retro = record["retro"]
+            self.retros[retro["id"]] = (retro, record["rev"])
+            self.last_retro_id = max(self.last_retro_id, retro["id"])
+            self.version = max(self.version, record["rev"])
+        elif op == "del":
+            self.retros.pop(record["id"], None)
+        elif op == "clear":
+            self.retros.clear()
+            self.last_retro_id = 0
+        elif op == "item":
+            item = record["item"]
+            self.items[item["id"]] = item
+            self.last_item_id = max(self.last_item_id, item["id"])
+        self.version = max(self.version, record.get("version", 0))
+
+
+class Journal(RetroListener):
+    """
+    Журнал изменений in-memory хранилищ в NDJSON-сегментах.
+
+    Запись только добавляется в буфер (под блокировкой хранилища это дешево);
+    фоновый поток раз в flush_interval пишет накопленное одним write и
+    одним fsync (group commit). Писатель после записи ждет fsync своей
+    пачки (wait_durable) уже вне блокировки хранилища, поэтому подтвержденная
+    запись при сбое не теряется, а ожидание делят все записи окна. Тот же
+    поток периодически переключает сегмент, пишет снимок и удаляет сегменты,
+    которые снимок уже покрывает. При старте читается снимок и проигрывается
+    только хвост журнала после него.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        retros: RetroStore,
+        items: ItemStore,
+        flush_interval: float = 0.01,
+        snapshot_interval: float = 300.0,
+        snapshot_records: int = 10000,
+    ) -> None:
+        self.directory = directory
+        self.retros = retros
+        self.items = items
+        self.flush_interval = flush_interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_records = snapshot_records
+        self._pending: List[bytes] = []
+        self._lock = threading.Lock()
+        # Номера записей: добавленных в буфер, записанных с fsync и потерянных
+        # из-за ошибки записи.
+        self._appended = 0
+        self._durable = 0
+        self._failed = 0
+        self._synced = threading.Condition(self._lock)
+        self._io_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._records_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._last_retro_id = 0
+        self._last_item_id = 0
+        self._segment = 0
+        self._file: Optional[BinaryIO] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self) -> None:
+        """Восстанавливает хранилища с диска и начинает новый сегмент журнала."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state, first_segment = self._read_snapshot()
+        segments = self._segments()
+        for number in segments:
+            if number >= first_segment:
+                self._replay(self.directory / _segment_name(number), state)
+
+        self.retros.restore(
+            [(Retro.model_validate(r), rev) for r, rev in state.retros.values()],
+            state.version,
+            state.last_retro_id,
+        )
+        self.items.restore(state.items.values(), state.last_item_id)
+        self._last_retro_id = state.last_retro_id
+        self._last_item_id = state.last_item_id
+        self._segment = max(segments + [first_segment - 1]) + 1
+        self._file = open(self.directory / _segment_name(self._segment), "ab")
+        _fsync_dir(self.directory)
+
+        self.retros.subscribe(self)
+        self.retros.on_commit = self.wait_durable
+        self.items.on_create = self.log_item
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._thread.start()
+
+    def on_write(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        if new is not None:
+            self._last_retro_id = max(self._last_retro_id, new.id)
+            record = {
+                "op": "put",
+                "rev": revision,
+                "retro": new.model_dump(mode="json"),
+            }
+        else:
+            record = {"op": "del", "id": old.id, "version": revision}
+        self._append(record)
+
+    def on_clear(self) -> None:
+        self._last_retro_id = 0
+        self._append({"op": "clear", "version": self.retros.version})
+
+    def log_item(self, item: dict) -> None:
+        self._last_item_id = max(self._last_item_id, item["id"])
+        self._append({"op": "item", "item": item})
+        self.wait_durable()
+
+    def wait_durable(self) -> None:
+        """
+        Ждет fsync всех записей, добавленных до вызова. Бросает OSError, если
+        их пачку записать не удалось.
+        """
+        with self._synced:
+            target = self._appended
+            self._synced.wait_for(
+                lambda: self._durable >= target or self._failed >= target
+            )
+            if self._durable < target:
+                raise OSError("Journal write failed")
+
+    def flush(self) -> None:
+        """Пишет буфер в текущий сегмент и делает fsync."""
+        with self._io_lock:
+            with self._lock:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                last = self._appended
+            with self._synced_on_success(last):
+                if data:
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+
+    def snapshot(self) -> None:
+        """Переключает сегмент, пишет снимок и удаляет покрытые им сегменты."""
+        with self._snapshot_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self) -> None:
+        with self._io_lock:
+            with self._lock:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                last = self._appended
+                retros, version = self.retros.export()
+                items = self.items.export()
+                header = {
+                    "segment": self._segment + 1,
+                    "version": version,
+                    "last_retro_id": self._last_retro_id,
+                    "last_item_id": self._last_item_id,
+                }
+                old_file, self._segment = self._file, self._segment + 1
+                self._file = open(self.directory / _segment_name(self._segment), "ab")
+                self._records_since_snapshot = 0
+            with self._synced_on_success(last):
+                old_file.write(data)
+                old_file.flush()
+                os.fsync(old_file.fileno())
+                old_file.close()
+
+        tmp = self.directory / f".{SNAPSHOT_NAME}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(header) + b"\n")
+            # Снимок хранилища неизменяем: записи собираются уже вне
+            # блокировки журнала, писатели их не ждут.
+            for retro, revision in retros:
+                f.write(orjson.dumps({"retro": retro, "rev": revision}) + b"\n")
+            for item in items:
+                f.write(orjson.dumps({"item": item}) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.directory / SNAPSHOT_NAME)
+        _fsync_dir(self.directory)
+        for number in self._segments():
+            if number < header["segment"]:
+                (self.directory / _segment_name(number)).unlink(missing_ok=True)
+        self._last_snapshot = time.monotonic()
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._file is not None and not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    @contextmanager
+    def _synced_on_success(self, last: int) -> Iterator[None]:
+        """Отмечает записи до last записанными или потерянными и будит ждущих."""
+        try:
+            yield
+        except BaseException:
+            with self._synced:
+                self._failed = max(self._failed, last)
+                self._synced.notify_all()
+            raise
+        with self._synced:
+            self._durable = max(self._durable, last)
+            self._synced.notify_all()
+
+    def _append(self, record: dict) -> None:
+        line = orjson.dumps(record) + b"\n"
+        with self._lock:
+            self._pending.append(line)
+            self._appended += 1
+            self._records_since_snapshot += 1
+            pending = len(self._pending)
+        if pending >= 1000:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                due = time.monotonic() - self._last_snapshot >= self.snapshot_interval
+                if due or self._records_since_snapshot >= self.snapshot_records:
+                    self.snapshot()
+            except Exception:
+                # Поток не должен завершаться: иначе записи перестанут
+                # сбрасываться, а писатели будут ждать fsync вечно.
+                logger.exception("Journal write failed")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in map(_SEGMENT.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _read_snapshot(self) -> Tuple[_State, int]:
+        state = _State()
+        path = self.directory / SNAPSHOT_NAME
+        if not path.is_file():
+            return state, 0
+        with open(path, "rb") as f:
+            header = orjson.loads(f.readline())
+            for line in f:
+                entry = orjson.loads(line)
+                if "retro" in entry:
+                    state.retros[entry["retro"]["id"]] = (entry["retro"], entry["rev"])
+                else:
+                    state.items[entry["item"]["id"]] = entry["item"]
+        state.version = header["version"]
+        state.last_retro_id = header["last_retro_id"]
+        state.last_item_id = header["last_item_id"]
+        return state, header["segment"]
+
+    @staticmethod
+    def _replay(path: Path, state: _State) -> None:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Недописанная при сбое последняя строка.
+                    logger.warning("Skipping torn journal record in %s", path.name)
+                    break
+                state.apply(record)
+
+
+def open_journaled_stores(settings) -> Tuple[RetroStore, ItemStore]:
+    """In-memory хранилища, восстановленные из JOURNAL_DIR и пишущие в него."""
+    retros, items = RetroStore(), ItemStore()
+    journal = Journal(
+        Path(settings.JOURNAL_DIR),
+        retros,
+        items,
+        flush_interval=settings.JOURNAL_FLUSH_INTERVAL_MS / 1000,
+        snapshot_interval=settings.JOURNAL_SNAPSHOT_INTERVAL,
+        snapshot_records=settings.JOURNAL_SNAPSHOT_RECORDS,
+    )
+    journal.open()
+    atexit.register(journal.close)
+    return retros, items
@@ -1,54 +1,109 @@
 import logging
+import os
+from contextlib import asynccontextmanager
 from datetime import date
+from email.utils import formatdate
+from itertools import islice
 from pathlib import Path
-from typing import Annotated, List, Optional
-from uuid import uuid4
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Literal, Optional
 
-from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
+from . import rate_limit_storage  # noqa: F401  регистрирует схему shm://
+from .analytics import RetroAnalytics
+from .attachment_index import AttachmentIndex, memory_store_id
+from .attachments import (
+    IMMUTABLE_CACHE_CONTROL,
+    MAX_BATCH_BODY,
+    MAX_BATCH_FILES,
+    MAX_UPLOAD_BODY,
+    ContentHashCache,
+    media_type_for,
+    resolve_attachment,
+)
+from .blob_store import BlobStore
+from .body_limit import body_limit
+from .bulk import (
+    NDJSON_MEDIA_TYPE,
+    DuplexStreamingResponse,
+    import_records,
+    iter_ndjson_lines,
+    iter_records,
+    parse_json_array,
+)
+from .cache import ResponseCache
+from .compression import CompressionMiddleware
+from .conditional import etag_matches, if_match_revisions, list_etag, retro_etag
 from .config import settings
-from .secure_upload import secure_save
+from .executor import BoundedExecutor, ExecutorSaturated
+from .logs import RequestIdMiddleware, configure_logging, current_request_id
+from .metrics import PROMETHEUS_MEDIA_TYPE, SIZE_BUCKETS, Metrics, MetricsMiddleware
+from .models import (
+    AnalyticsReport,
+    AttachmentMetadata,
+    CreateRetroRequest,
+    Retro,
+    SearchHit,
+    SearchResults,
+)
+from .multipart_stream import iter_multipart
+from .pagination import MAX_PAGE_SIZE, cursor_key, decode_cursor, encode_cursor
+from .profiling import ProfiledRoute, ProfileRing, ProfilingMiddleware
+from .rate_limit import BYTES_PER_UNIT, CostLimitedRoute, CostLimiter, rate_cost
+from .repository import RevisionConflict, create_repositories
+from .search import SearchIndex, parse_query
+from .secure_upload import (
+    ReceivedFile,
+    SavedFile,
+    TooManyFiles,
+    checked_upload_root,
+    publish_upload,
+    receive_uploads,
+)
+from .upload_sessions import (
+    OffsetMismatch,
+    SessionBusy,
+    SessionNotFound,
+    UploadSession,
+    UploadSessions,
+)
 
-logging.basicConfig(level=logging.INFO)
+configure_logging(settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-TrimmedString = Annotated[
-    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=2048)
-]
-
-
-class RetroItem(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    what_went_well: TrimmedString = Field(description="Что прошло хорошо")
-    to_improve: TrimmedString = Field(description="Что можно улучшить")
-    actions: TrimmedString = Field(
-        description="Конкретные действия на следующий спринт"
-    )
-
 
-class Retro(BaseModel):
-    id: int
-    session_date: date
-    items: List[RetroItem]
-
-
-class CreateRetroRequest(BaseModel):
-    model_config = ConfigDict(extra="forbid")
-    session_date: date
-    items: List[RetroItem] = Field(max_length=20)
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Вложения открываются при старте приложения, а не при импорте app.main."""
+    open_uploads(UPLOAD_DIR)
+    try:
+        yield
+    finally:
+        close_uploads()
 
 
-app = FastAPI(title="SecDev Course App", version="0.1.0")
+app = FastAPI(title="SecDev Course App", version="0.1.0", lifespan=lifespan)
+app.router.route_class = (
+    ProfiledRoute if settings.PROFILING_ENABLED else CostLimitedRoute
+)
 
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy=settings.RATE_LIMIT_STRATEGY,
+)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.state.cost_limiter = CostLimiter(
+    settings.RATE_LIMIT_COST_BUDGET,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy=settings.RATE_LIMIT_STRATEGY,
+)
 
 origins = ["http://localhost"]
 
@@ -59,25 +114,65 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-_RETROS_DB: List[Retro] = []
+# Внутри метрик, чтобы задержка в гистограммах включала время сжатия.
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    cache_entries=settings.COMPRESSION_CACHE_ENTRIES,
+    cache_bytes=settings.COMPRESSION_CACHE_BYTES,
+)
+metrics = Metrics(settings.METRICS_DIR, settings.METRICS_HEARTBEAT_TTL)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=settings.PROFILING_TOKEN,
+        ring=ProfileRing(Path(settings.PROFILING_DIR), settings.PROFILING_MAX_FILES),
+    )
+# Последним, чтобы быть внешним: id запроса виден всем слоям и обработчикам.
+app.add_middleware(RequestIdMiddleware)
+
+_RETROS_DB, _ITEMS_DB = create_repositories(settings)
+response_cache = ResponseCache(
+    max_retros=settings.RESPONSE_CACHE_RETROS,
+    max_lists=settings.RESPONSE_CACHE_LISTS,
+    max_retro_bytes=settings.RESPONSE_CACHE_RETRO_BYTES,
+    max_list_bytes=settings.RESPONSE_CACHE_LIST_BYTES,
+)
+_RETROS_DB.subscribe(response_cache)
+search_index = SearchIndex()
+search_index.rebuild(_RETROS_DB, _RETROS_DB.version)
+_RETROS_DB.subscribe(search_index)
+retro_analytics = RetroAnalytics()
+retro_analytics.rebuild(_RETROS_DB, _RETROS_DB.version)
+_RETROS_DB.subscribe(retro_analytics)
 
 
 class ProblemDetailException(Exception):
     def __init__(
-        self, status: int, title: str, detail: str, type_: str = "about:blank"
+        self,
+        status: int,
+        title: str,
+        detail: str,
+        type_: str = "about:blank",
+        headers: Optional[Dict[str, str]] = None,
     ):
         self.status = status
         self.title = title
         self.detail = detail
         self.type_ = type_
+        self.headers = headers
 
 
 @app.exception_handler(ProblemDetailException)
 async def problem_detail_exception_handler(
     request: Request, exc: ProblemDetailException
 ):
-    correlation_id = str(uuid4())
+    correlation_id = current_request_id()
+    logger.info(
+        "Problem response",
+        extra={"status": exc.status, "title": exc.title, "path": request.url.path},
+    )
     return JSONResponse(
         status_code=exc.status,
         content={
@@ -87,12 +182,17 @@ async def problem_detail_exception_handler(
             "detail": exc.detail,
             "correlation_id": correlation_id,
         },
+        headers=exc.headers,
     )
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler_rfc7807(request: Request, exc: HTTPException):
-    correlation_id = str(uuid4())
+    correlation_id = current_request_id()
+    logger.info(
+        "HTTP exception",
+        extra={"status": exc.status_code, "path": request.url.path},
+    )
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -102,137 +202,684 @@ async def http_exception_handler_rfc7807(request: Request, exc: HTTPException):
             "detail": exc.detail,
             "correlation_id": correlation_id,
         },
+        headers=exc.headers,
     )
 
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return await problem_detail_exception_handler(
+        request,
+        ProblemDetailException(
+            title="service_unavailable",
+            detail="Too many file operations in progress, retry later",
+            status=503,
+            headers={"Retry-After": "1"},
+        ),
+    )
 
 
-_DB = {"items": []}
+@app.get("/health", openapi_extra=rate_cost(0))
+def health():
+    return {"status": "ok"}
 
 
-@app.post("/items")
+@app.post("/items", openapi_extra=rate_cost(1))
 def create_item(name: str):
     if not name or len(name) > 100:
         raise ProblemDetailException(
             title="validation_error", detail="name must be 1..100 chars", status=422
         )
-    item = {"id": len(_DB["items"]) + 1, "name": name}
-    _DB["items"].append(item)
-    return item
+    return _ITEMS_DB.create(name)
 
 
-@app.get("/items/{item_id}")
+@app.get("/items/{item_id}", openapi_extra=rate_cost(1))
 def get_item(item_id: int):
-    for it in _DB["items"]:
-        if it["id"] == item_id:
-            return it
-    raise ProblemDetailException(title="not_found", detail="item not found", status=404)
+    item = _ITEMS_DB.get(item_id)
+    if item is None:
+        raise ProblemDetailException(
+            title="not_found", detail="item not found", status=404
+        )
+    return item
 
 
 @limiter.limit("20/minute")
-@app.post("/retros", response_model=Retro, status_code=201)
-def create_retro(request_body: CreateRetroRequest, request: Request):
+@app.post("/retros", response_model=Retro, status_code=201, openapi_extra=rate_cost(1))
+def create_retro(
+    request_body: CreateRetroRequest, request: Request, response: Response
+):
     if request_body.session_date > date.today():
         raise ProblemDetailException(
             status=422,
             title="Validation Error",
             detail="Session date cannot be in the future",
         )
-    new_retro = Retro(
-        id=len(_RETROS_DB) + 1,
-        session_date=request_body.session_date,
-        items=request_body.items,
+    retro, revision = _RETROS_DB.create_with_revision(
+        request_body.session_date, request_body.items
     )
-    _RETROS_DB.append(new_retro)
-    return new_retro
+    response.headers["ETag"] = retro_etag(retro.id, revision)
+    return retro
 
 
-@app.get("/retros", response_model=List[Retro])
-def get_all_retros(from_date: Optional[date] = None, to_date: Optional[date] = None):
-    filtered_retros = _RETROS_DB
-    if from_date:
-        filtered_retros = [r for r in filtered_retros if r.session_date >= from_date]
-    if to_date:
-        filtered_retros = [r for r in filtered_retros if r.session_date <= to_date]
-    return filtered_retros
+def _ndjson_lines(retros: Iterable[Retro]) -> Iterator[bytes]:
+    for retro in retros:
+        yield retro.model_dump_json().encode() + b"\n"
 
 
-@app.get("/retros/{retro_id}", response_model=Retro)
-def get_retro_by_id(retro_id: int):
-    for retro in _RETROS_DB:
-        if retro.id == retro_id:
-            return retro
-    raise ProblemDetailException(
-        title="not_found", detail=f"Retro with id={retro_id} not found", status=404
+@app.post(
+    "/retros/bulk",
+    openapi_extra={
+        **rate_cost(10, BYTES_PER_UNIT),
+        **body_limit(settings.BULK_MAX_BODY_SIZE),
+    },
+)
+# Под @app.post: FastAPI регистрирует уже обернутый лимитом обработчик.
+@limiter.limit("5/minute")
+async def bulk_import_retros(request: Request):
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(NDJSON_MEDIA_TYPE):
+        records = iter_ndjson_lines(request.stream())
+    elif content_type.startswith("application/json"):
+        try:
+            records = iter_records(parse_json_array(await request.body()))
+        except ValueError as e:
+            raise ProblemDetailException(
+                title="validation_error", detail=str(e), status=422
+            )
+    else:
+        raise ProblemDetailException(
+            title="unsupported_media_type",
+            detail=f"Expected application/json or {NDJSON_MEDIA_TYPE}",
+            status=415,
+        )
+
+    # Валидация и вставка идут пачками в threadpool, пока тело еще читается;
+    # результат каждой пачки сразу уходит клиенту, в памяти держится одна пачка.
+    return DuplexStreamingResponse(
+        import_records(_RETROS_DB, records, date.today()),
+        media_type=NDJSON_MEDIA_TYPE,
     )
 
 
-@limiter.limit("20/minute")
-@app.put("/retros/{retro_id}", response_model=Retro)
-def update_retro(retro_id: int, request_body: CreateRetroRequest, request: Request):
-    global _RETROS_DB
-    for i, retro in enumerate(_RETROS_DB):
-        if retro.id == retro_id:
-            if request_body.session_date > date.today():
-                raise ProblemDetailException(
-                    title="validation_error",
-                    detail="Session date cannot be in the future",
-                    status=422,
-                )
-            updated_retro = Retro(
-                id=retro_id,
-                session_date=request_body.session_date,
-                items=request_body.items,
+# Полный список без limit может быть всей таблицей, поэтому дороже страницы.
+@app.get("/retros", response_model=List[Retro], openapi_extra=rate_cost(2))
+def get_all_retros(
+    request: Request,
+    response: Response,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError as e:
+            raise ProblemDetailException(
+                title="validation_error", detail=str(e), status=422
+            )
+
+    # Версию читаем до данных: при гонке с записью клиент получит более
+    # свежие данные со старым ETag и просто перечитает их при следующем опросе.
+    wants_ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    etag = list_etag(_RETROS_DB.version, f"{request.url.query}|{wants_ndjson}")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if limit is None and cursor is None and not wants_ndjson:
+        # Полный список по фильтру дат: отдаем готовые байты без повторной
+        # валидации response_model и JSON-кодирования.
+        key = (from_date, to_date)
+        version = _RETROS_DB.version
+        body = response_cache.get_list(key, version)
+        if body is None:
+            body = response_cache.put_list(
+                key, version, _RETROS_DB.range(from_date, to_date)
             )
-            _RETROS_DB[i] = updated_retro
-            return updated_retro
+        return Response(
+            content=body, media_type="application/json", headers={"ETag": etag}
+        )
+
+    retros: Iterable[Retro] = _RETROS_DB.range(from_date, to_date, after=after)
+    headers = {"ETag": etag}
+    if limit is not None:
+        page = list(islice(retros, limit + 1))
+        if len(page) > limit:
+            page = page[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(cursor_key(page[-1]))
+        retros = page
+
+    if wants_ndjson:
+        return StreamingResponse(
+            _ndjson_lines(retros), media_type=NDJSON_MEDIA_TYPE, headers=headers
+        )
+    response.headers.update(headers)
+    return list(retros)
+
+
+@app.get("/retros/search", response_model=SearchResults, openapi_extra=rate_cost(1))
+def search_retros(
+    q: str = Query(min_length=1, max_length=256),
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    if not parse_query(q):
+        raise ProblemDetailException(
+            title="validation_error", detail="Query has no searchable terms", status=422
+        )
+    # Записи других воркеров общего SQLite приходят не событиями.
+    search_index.sync(_RETROS_DB)
+    total, page = search_index.search(q, from_date, to_date, limit=limit, offset=offset)
+    hits = []
+    for retro_id, score in page:
+        retro = _RETROS_DB.get(retro_id)
+        if retro is not None:
+            hits.append(SearchHit(score=score, retro=retro))
+    return SearchResults(total=total, hits=hits)
+
+
+@app.get(
+    "/retros/analytics", response_model=AnalyticsReport, openapi_extra=rate_cost(2)
+)
+def get_retro_analytics(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    granularity: Literal["month", "quarter"] = "month",
+    top: int = Query(10, ge=1, le=100),
+):
+    retro_analytics.sync(_RETROS_DB)
+    return retro_analytics.report(from_date, to_date, granularity=granularity, top=top)
 
-    raise ProblemDetailException(
+
+def _retro_not_found(retro_id: int) -> ProblemDetailException:
+    return ProblemDetailException(
         title="not_found", detail=f"Retro with id={retro_id} not found", status=404
     )
 
 
+def _precondition_failed(retro_id: int) -> ProblemDetailException:
+    return ProblemDetailException(
+        title="precondition_failed",
+        detail=f"Retro with id={retro_id} was modified by another request",
+        status=412,
+    )
+
+
+@app.get("/retros/{retro_id}", response_model=Retro, openapi_extra=rate_cost(1))
+def get_retro_by_id(retro_id: int, request: Request):
+    revision = _RETROS_DB.revision(retro_id)
+    if revision is None:
+        raise _retro_not_found(retro_id)
+    etag = retro_etag(retro_id, revision)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get_retro(retro_id, revision)
+    if body is None:
+        retro = _RETROS_DB.get(retro_id)
+        if retro is None:
+            raise _retro_not_found(retro_id)
+        body = response_cache.put_retro(retro, revision)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@limiter.limit("20/minute")
+@app.put("/retros/{retro_id}", response_model=Retro, openapi_extra=rate_cost(1))
+def update_retro(
+    retro_id: int,
+    request_body: CreateRetroRequest,
+    request: Request,
+    response: Response,
+):
+    revision = _RETROS_DB.revision(retro_id)
+    if revision is None:
+        raise _retro_not_found(retro_id)
+    if request_body.session_date > date.today():
+        raise ProblemDetailException(
+            title="validation_error",
+            detail="Session date cannot be in the future",
+            status=422,
+        )
+
+    expected_revision = None
+    if_match = request.headers.get("if-match")
+    if if_match is not None:
+        allowed = if_match_revisions(if_match, retro_id)
+        if allowed is not None and revision not in allowed:
+            raise _precondition_failed(retro_id)
+        expected_revision = revision
+
+    try:
+        written = _RETROS_DB.update_with_revision(
+            retro_id,
+            request_body.session_date,
+            request_body.items,
+            expected_revision=expected_revision,
+        )
+    except RevisionConflict:
+        raise _precondition_failed(retro_id)
+    if written is None:
+        raise _retro_not_found(retro_id)
+    updated_retro, written_revision = written
+    response.headers["ETag"] = retro_etag(retro_id, written_revision)
+    return updated_retro
+
+
 @limiter.limit("20/minute")
-@app.delete("/retros/{retro_id}", status_code=204)
+@app.delete("/retros/{retro_id}", status_code=204, openapi_extra=rate_cost(1))
 def delete_retro(retro_id: int, request: Request):
-    global _RETROS_DB
-    retro_to_delete = None
-    for retro in _RETROS_DB:
-        if retro.id == retro_id:
-            retro_to_delete = retro
-            break
-    if retro_to_delete:
-        _RETROS_DB.remove(retro_to_delete)
-        return
-    else:
+    if _RETROS_DB.delete(retro_id) is None:
         raise ProblemDetailException(
             title="not_found", detail=f"Retro with id={retro_id} not found", status=404
         )
 
 
 UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+
+upload_executor = BoundedExecutor(
+    max_workers=settings.UPLOAD_WORKERS,
+    max_pending=settings.UPLOAD_QUEUE_LIMIT,
+    name="upload",
+)
+# Чтение вложений и состояния сессий — в своем пуле: всплеск загрузок не
+# должен отнимать у них место в очереди и отвечать на них 503.
+read_executor = BoundedExecutor(
+    max_workers=settings.ATTACHMENT_READ_WORKERS,
+    max_pending=settings.ATTACHMENT_READ_QUEUE_LIMIT,
+    name="attachment-read",
+)
+attachment_hashes = ContentHashCache()
+# Открываются в lifespan приложения (open_uploads), а не при импорте.
+blob_store: Optional[BlobStore] = None
+upload_sessions: Optional[UploadSessions] = None
+attachment_index: Optional[AttachmentIndex] = None
+# Ретро в памяти без журнала у каждого воркера свои, с пересекающимися id:
+# их вложения помечаются хранилищем этого процесса.
+_SHARED_RETROS = settings.STORAGE_BACKEND == "sqlite" or bool(settings.JOURNAL_DIR)
+
+
+def open_uploads(upload_dir: Path) -> None:
+    """
+    Открывает вложения в upload_dir: blob store, сессии загрузок и индекс
+    вложений, и запускает их фоновые проверки.
+    """
+    global UPLOAD_DIR, blob_store, upload_sessions, attachment_index
+    upload_dir.mkdir(exist_ok=True)
+    UPLOAD_DIR = upload_dir
+    blob_store = BlobStore(upload_dir) if settings.UPLOAD_STORAGE == "cas" else None
+    upload_sessions = UploadSessions(
+        upload_dir, ttl=settings.UPLOAD_SESSION_TTL, blob_store=blob_store
+    )
+    upload_sessions.start(settings.UPLOAD_SESSION_SWEEP_INTERVAL)
+    attachment_index = AttachmentIndex(
+        upload_dir,
+        blob_store,
+        store="" if _SHARED_RETROS else memory_store_id(),
+        orphan_grace=settings.ATTACHMENT_ORPHAN_GRACE,
+    )
+    _RETROS_DB.subscribe(attachment_index)
+    attachment_index.prune_missing(_RETROS_DB)
+    attachment_index.start(settings.ATTACHMENT_SWEEP_INTERVAL)
+
+
+def close_uploads() -> None:
+    """Останавливает то, что открыл open_uploads()."""
+    global blob_store, upload_sessions, attachment_index
+    _RETROS_DB.unsubscribe(attachment_index)
+    attachment_index.close()
+    upload_sessions.close()
+    if blob_store is not None:
+        blob_store.close()
+    blob_store = upload_sessions = attachment_index = None
+
+
+async def _index_attachment(retro_id: int, saved: SavedFile) -> None:
+    # Вызывается в том же slot(), что и сохранение: отказ после публикации
+    # файла оставил бы его без записи в индексе.
+    await upload_executor.run(attachment_index.add, retro_id, saved)
+    # Ретро могли удалить, пока файл загружался: каскад его уже не увидел.
+    if retro_id not in _RETROS_DB:
+        attachment_index.schedule_purge(retro_id)
+
+
+# Тело загрузок разбирается потоком в маршруте, а не FastAPI: описание для схемы.
+def _multipart_body(field: str, many: bool = False) -> dict:
+    file = {"type": "string", "format": "binary"}
+    schema = {"type": "array", "items": file} if many else file
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: schema},
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
+
+
+@app.post(
+    "/retros/{retro_id}/attachments",
+    openapi_extra={
+        **rate_cost(5, BYTES_PER_UNIT),
+        **body_limit(MAX_UPLOAD_BODY),
+        **_multipart_body("file"),
+    },
+)
+async def upload_attachment(retro_id: int, request: Request):
+    """
+    Загружает одно вложение (поле file). Тело разбирается по мере получения,
+    и запрос отклоняется, как только не совпала сигнатура или превышен размер.
+    """
+    if retro_id not in _RETROS_DB:
+        raise _retro_not_found(retro_id)
+    try:
+        async with upload_executor.slot():
+            received = await receive_uploads(
+                iter_multipart(request), "file", UPLOAD_DIR, upload_executor, blob_store
+            )
+            if not received:
+                raise ValueError("Field 'file' with a file is required")
+            saved = await publish_upload(received[0].upload, upload_executor)
+            await _index_attachment(retro_id, saved)
+    except ValueError as e:
+        raise ProblemDetailException(title="upload_failed", detail=str(e), status=422)
+    metrics.inc("upload_bytes_total", amount=saved.size)
+    metrics.observe("upload_size_bytes", "", saved.size, SIZE_BUCKETS)
+    return {"filename": saved.path.name, "content_type": received[0].part.content_type}
+
+
+@app.post(
+    "/retros/{retro_id}/attachments/batch",
+    openapi_extra={
+        **rate_cost(10, BYTES_PER_UNIT),
+        **body_limit(MAX_BATCH_BODY),
+        **_multipart_body("files", many=True),
+    },
+)
+async def upload_attachments_batch(retro_id: int, request: Request):
+    """
+    Загружает до MAX_BATCH_FILES файлов (поле files) одним multipart-запросом.
+    Каталог загрузок проверяется один раз на пачку, файлы пишутся по мере
+    получения тела, ошибка файла попадает только в его результат.
+    """
+    if retro_id not in _RETROS_DB:
+        raise _retro_not_found(retro_id)
+    try:
+        async with upload_executor.slot():
+            root = await upload_executor.run(checked_upload_root, UPLOAD_DIR)
+            received = await receive_uploads(
+                iter_multipart(request),
+                "files",
+                UPLOAD_DIR,
+                upload_executor,
+                blob_store,
+                root=root,
+                max_files=MAX_BATCH_FILES,
+                fail_fast=False,
+            )
+            results = []
+            for index, file in enumerate(received):
+                results.append(await _publish_batch_file(retro_id, index, file))
+    except TooManyFiles as e:
+        raise ProblemDetailException(
+            title="validation_error", detail=str(e), status=422
+        )
+    except ValueError as e:
+        raise ProblemDetailException(title="upload_failed", detail=str(e), status=422)
+    return {"results": results}
 
 
-@app.post("/retros/{retro_id}/attachments")
-async def upload_attachment(retro_id: int, file: UploadFile = File(...)):
-    retro_exists = any(r.id == retro_id for r in _RETROS_DB)
-    if not retro_exists:
+async def _publish_batch_file(retro_id: int, index: int, file: ReceivedFile) -> dict:
+    result = {"index": index, "name": file.part.filename}
+    if file.error is not None:
+        return {**result, "status": 422, "detail": file.error}
+    try:
+        saved = await publish_upload(file.upload, upload_executor)
+        await _index_attachment(retro_id, saved)
+    except ValueError as e:
+        return {**result, "status": 422, "detail": str(e)}
+    metrics.inc("upload_bytes_total", amount=saved.size)
+    metrics.observe("upload_size_bytes", "", saved.size, SIZE_BUCKETS)
+    return {
+        **result,
+        "status": 200,
+        "filename": saved.path.name,
+        "content_type": saved.mime_type,
+    }
+
+
+def _session_headers(session: UploadSession) -> Dict[str, str]:
+    return {
+        "Upload-Offset": str(session.offset),
+        "Upload-Length": str(session.length),
+        "Upload-Expires": formatdate(session.expires_at, usegmt=True),
+        "Cache-Control": "no-store",
+    }
+
+
+def _session_body(session: UploadSession) -> dict:
+    return {
+        "session_id": session.id,
+        "offset": session.offset,
+        "length": session.length,
+        "expires_at": session.expires_at,
+    }
+
+
+def _int_header(request: Request, name: str) -> int:
+    value = request.headers.get(name, "")
+    if not value.isdigit():
         raise ProblemDetailException(
-            title="not_found", detail=f"Retro with id={retro_id} not found", status=404
+            title="validation_error",
+            detail=f"{name} header must be a non-negative integer",
+            status=422,
         )
+    return int(value)
+
+
+def _upload_session(retro_id: int, session_id: str) -> UploadSession:
+    try:
+        session = upload_sessions.get(session_id)
+    except SessionNotFound:
+        session = None
+    if session is None or session.retro_id != retro_id:
+        raise ProblemDetailException(
+            title="not_found",
+            detail=f"Upload session {session_id} not found",
+            status=404,
+        )
+    return session
+
+
+def _session_busy(session_id: str) -> ProblemDetailException:
+    return ProblemDetailException(
+        title="conflict",
+        detail=f"Upload session {session_id} is being written by another request",
+        status=409,
+    )
+
+
+@app.post(
+    "/retros/{retro_id}/attachments/sessions",
+    status_code=201,
+    openapi_extra=rate_cost(1),
+)
+async def create_upload_session(retro_id: int, request: Request, response: Response):
+    """Начинает возобновляемую загрузку; размер файла — в заголовке Upload-Length."""
+    if retro_id not in _RETROS_DB:
+        raise _retro_not_found(retro_id)
+    length = _int_header(request, "Upload-Length")
+    try:
+        session = await upload_executor.submit(upload_sessions.create, retro_id, length)
+    except ValueError as e:
+        raise ProblemDetailException(title="upload_failed", detail=str(e), status=422)
+    response.headers.update(_session_headers(session))
+    response.headers["Location"] = (
+        f"/retros/{retro_id}/attachments/sessions/{session.id}"
+    )
+    return _session_body(session)
+
+
+@app.api_route(
+    "/retros/{retro_id}/attachments/sessions/{session_id}",
+    methods=["GET", "HEAD"],
+    openapi_extra=rate_cost(1),
+)
+async def get_upload_session(retro_id: int, session_id: str, request: Request):
+    """Состояние загрузки: с какого Upload-Offset продолжать."""
+    session = await read_executor.submit(_upload_session, retro_id, session_id)
+    headers = _session_headers(session)
+    if request.method == "HEAD":
+        return Response(status_code=200, headers=headers)
+    return JSONResponse(_session_body(session), headers=headers)
+
+
+@app.patch(
+    "/retros/{retro_id}/attachments/sessions/{session_id}",
+    openapi_extra={**rate_cost(5, BYTES_PER_UNIT), **body_limit(MAX_UPLOAD_BODY)},
+)
+async def upload_session_part(retro_id: int, session_id: str, request: Request):
+    """
+    Дописывает тело запроса с позиции Upload-Offset. Часть, на которой файл
+    получен целиком, проверяет и публикует его и возвращает имя вложения.
+    """
+    offset = _int_header(request, "Upload-Offset")
+    await upload_executor.submit(_upload_session, retro_id, session_id)
     try:
-        contents = await file.read()
-        saved_path = secure_save(UPLOAD_DIR, contents)
-        return {"filename": saved_path.name, "content_type": file.content_type}
+        async with upload_executor.slot():
+            write = await upload_executor.run(
+                upload_sessions.begin_write, session_id, offset
+            )
+            try:
+                async for chunk in request.stream():
+                    await upload_executor.run(write.write, chunk)
+            except ValueError:
+                await upload_executor.run(write.fail)
+                raise
+            except BaseException:
+                # Обрыв соединения: полученное остается, клиент продолжит с HEAD.
+                await upload_executor.run(write.abandon)
+                raise
+            saved = await upload_executor.run(write.finish)
+            if saved is not None:
+                await _index_attachment(retro_id, saved)
+    except OffsetMismatch as e:
+        raise ProblemDetailException(
+            title="conflict",
+            detail=str(e),
+            status=409,
+            headers={"Upload-Offset": str(e.offset)},
+        )
+    except SessionBusy:
+        raise _session_busy(session_id)
+    except SessionNotFound:
+        raise ProblemDetailException(
+            title="not_found",
+            detail=f"Upload session {session_id} not found",
+            status=404,
+        )
     except ValueError as e:
         raise ProblemDetailException(title="upload_failed", detail=str(e), status=422)
 
+    headers = _session_headers(write.session._replace(offset=write.offset))
+    if saved is None:
+        return Response(status_code=204, headers=headers)
+    metrics.inc("upload_bytes_total", amount=saved.size)
+    metrics.observe("upload_size_bytes", "", saved.size, SIZE_BUCKETS)
+    return JSONResponse(
+        {"filename": saved.path.name, "content_type": saved.mime_type},
+        headers={"Upload-Offset": str(saved.size)},
+    )
+
+
+@app.delete(
+    "/retros/{retro_id}/attachments/sessions/{session_id}",
+    status_code=204,
+    openapi_extra=rate_cost(1),
+)
+async def cancel_upload_session(retro_id: int, session_id: str):
+    await upload_executor.submit(_upload_session, retro_id, session_id)
+    try:
+        await upload_executor.submit(upload_sessions.cancel, session_id)
+    except SessionBusy:
+        raise _session_busy(session_id)
+    except SessionNotFound:
+        pass
+
+
+@app.get(
+    "/retros/{retro_id}/attachments",
+    response_model=List[AttachmentMetadata],
+    openapi_extra=rate_cost(1),
+)
+async def list_attachments(retro_id: int):
+    if retro_id not in _RETROS_DB:
+        raise _retro_not_found(retro_id)
+    records = await read_executor.submit(attachment_index.list, retro_id)
+    return [
+        AttachmentMetadata(
+            filename=r.name,
+            size=r.size,
+            content_type=r.mime_type,
+            sha256=r.sha256,
+            created_at=r.created_at,
+        )
+        for r in records
+    ]
+
+
+@app.get("/retros/{retro_id}/attachments/{name}", openapi_extra=rate_cost(2))
+async def download_attachment(retro_id: int, name: str, request: Request):
+    if retro_id not in _RETROS_DB:
+        raise ProblemDetailException(
+            title="not_found", detail=f"Retro with id={retro_id} not found", status=404
+        )
+    # Отдаем только вложения этого ретро, а не любой файл по известному имени.
+    async with read_executor.slot():
+        path = None
+        if await read_executor.run(attachment_index.owns, retro_id, name):
+            path = await read_executor.run(
+                resolve_attachment, UPLOAD_DIR, name, blob_store
+            )
+        if path is None:
+            raise ProblemDetailException(
+                title="not_found", detail=f"Attachment {name} not found", status=404
+            )
+        stat_result = await read_executor.run(os.stat, path)
+        etag = await read_executor.run(attachment_hashes.etag, path, stat_result)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # FileResponse сам обслуживает Range/If-Range и отдает файл через
+    # http.response.pathsend (sendfile) на серверах с поддержкой этого расширения.
+    return FileResponse(
+        path, media_type=media_type_for(name), headers=headers, stat_result=stat_result
+    )
+
+
+@app.get("/metrics", include_in_schema=False, openapi_extra=rate_cost(0))
+def get_metrics():
+    cache = response_cache.stats()
+    gauges = [
+        ("retro_store_size", "Retros in the store of this worker", "", len(_RETROS_DB)),
+        ("search_index_documents", "Retros in the search index", "", len(search_index)),
+    ]
+    gauges += [
+        ("response_cache", "Response cache statistics", f'stat="{name}"', value)
+        for name, value in cache.items()
+    ]
+    return Response(metrics.render(gauges), media_type=PROMETHEUS_MEDIA_TYPE)
+
 
-@app.get("/secret-info")
+@app.get("/secret-info", openapi_extra=rate_cost(1))
 def get_secret_info():
     key_length = len(settings.SECRET_KEY)
     logger.info(f"Sensitive info of length {key_length} is being used.")
@@ -0,0 +1,410 @@
+import atexit
+import fcntl
+import mmap
+import os
+import secrets
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1024, 16384, 65536, 262144, 1048576, 2097152, 5242880)
+
+# Семейства метрик, которые пишутся в файлы воркеров: имя -> (тип, описание).
+FAMILIES = {
+    "http_requests_total": ("counter", "HTTP requests by route and status"),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency"),
+    "http_requests_in_flight": ("gauge", "HTTP requests being processed"),
+    "rate_limit_rejections_total": ("counter", "Requests rejected with 429"),
+    "upload_bytes_total": ("counter", "Bytes of accepted attachments"),
+    "upload_size_bytes": ("histogram", "Size of accepted attachments"),
+}
+# Для живых значений (gauge) файлы завершившихся процессов не учитываются.
+_LIVE_GAUGES = {"http_requests_in_flight"}
+# Сюда переносятся значения завершившихся процессов, их файлы удаляются.
+MERGED_NAME = "merged.db"
+# Время последнего heartbeat процесса-владельца (unix time), не метрика.
+_HEARTBEAT = "\0heartbeat"
+_IN_FLIGHT = "http_requests_in_flight\0"
+# Метод из запроса попадает в метки, поэтому произвольные значения сводятся в OTHER.
+_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+_USED = struct.Struct("<Q")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _entries(buf, used: int) -> Iterator[Tuple[str, int, float]]:
+    """Записи файла: (ключ, смещение значения, значение)."""
+    pos = _USED.size
+    while pos < used:
+        (length,) = _KEY_LENGTH.unpack_from(buf, pos)
+        key = bytes(buf[pos + 4 : pos + 4 + length]).decode()
+        offset = _align(pos + 4 + length)
+        yield key, offset, _VALUE.unpack_from(buf, offset)[0]
+        pos = offset + _VALUE.size
+
+
+class _ValueFile:
+    """
+    Значения метрик одного процесса в mmap-файле.
+    Формат: [использовано u64] затем записи [длина u32][ключ][выравнивание][f64].
+    Пишет только процесс-владелец, остальные лишь читают при сборе.
+    """
+
+    def __init__(self, path: Path, initial_size: int = 65536) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if size < initial_size:
+            os.ftruncate(self._fd, initial_size)
+            size = initial_size
+        self._map = mmap.mmap(self._fd, size)
+        self._used = _USED.unpack_from(self._map, 0)[0] or _USED.size
+        # Индексы значений в массиве double поверх mmap (смещение / 8).
+        self._offsets = {
+            key: off // _VALUE.size for key, off, _ in _entries(self._map, self._used)
+        }
+        self._doubles = memoryview(self._map).cast("d")
+
+    def add(self, key: str, amount: float) -> None:
+        index = self._offsets.get(key)
+        if index is None:
+            index = self._allocate(key)
+        self._doubles[index] += amount
+
+    def set(self, key: str, value: float) -> None:
+        index = self._offsets.get(key)
+        if index is None:
+            index = self._allocate(key)
+        self._doubles[index] = value
+
+    def replaced(self) -> bool:
+        """Файл удален или заменен другим: запись в него уже никто не прочтет."""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        own = os.fstat(self._fd)
+        return (current.st_dev, current.st_ino) != (own.st_dev, own.st_ino)
+
+    def _allocate(self, key: str) -> int:
+        encoded = key.encode()
+        offset = _align(self._used + _KEY_LENGTH.size + len(encoded))
+        end = offset + _VALUE.size
+        if end > len(self._map):
+            size = max(end, 2 * len(self._map))
+            self._doubles.release()
+            os.ftruncate(self._fd, size)
+            self._map.resize(size)
+            self._doubles = memoryview(self._map).cast("d")
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + 4 : self._used + 4 + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, offset, 0.0)
+        # Счетчик занятого места обновляется последним: читатель не увидит
+        # недописанную запись.
+        self._used = end
+        _USED.pack_into(self._map, 0, end)
+        self._offsets[key] = offset // _VALUE.size
+        return self._offsets[key]
+
+    def close(self) -> None:
+        self._doubles.release()
+        self._map.close()
+        os.close(self._fd)
+
+
+def _read_file(path: Path) -> Dict[str, float]:
+    data = path.read_bytes()
+    if len(data) < _USED.size:
+        return {}
+    used = min(_USED.unpack_from(data, 0)[0], len(data))
+    return {key: value for key, _, value in _entries(data, used)}
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class Metrics:
+    """
+    Счетчики и гистограммы в формате Prometheus.
+
+    Каждый процесс пишет в свой файл metrics-<pid>-<случайный суффикс>.db
+    в METRICS_DIR, запись — сложение float в mmap под неконкурентной
+    блокировкой процесса. /metrics в любом воркере суммирует файлы всех
+    воркеров, поэтому при нескольких воркерах uvicorn значения не зависят от
+    того, кто ответил на scrape.
+
+    Процесс раз в heartbeat_ttl / 6 секунд пишет в свой файл время. Файл,
+    heartbeat которого старше heartbeat_ttl, считается файлом завершившегося
+    процесса: его живые значения (gauge) не учитываются, а новый процесс
+    переносит остальные в merged.db и удаляет файл, поэтому каталог не растет
+    с перезапусками воркеров. pid для этого не годится: у воркеров в разных
+    контейнерах свои пространства pid. Без каталога метрики пишутся во
+    временный каталог процесса и не суммируются между воркерами.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, heartbeat_ttl: float = 30.0
+    ) -> None:
+        if directory:
+            self.directory = Path(directory)
+            self.directory.mkdir(parents=True, exist_ok=True)
+        else:
+            self.directory = Path(tempfile.mkdtemp(prefix="secdev-metrics-"))
+            atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+        self.heartbeat_ttl = heartbeat_ttl
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._values: Optional[_ValueFile] = None
+        self._histograms: Dict[tuple, Tuple[str, ...]] = {}
+        self._request_keys: Dict[Tuple[str, str, int], tuple] = {}
+
+    def _file(self) -> _ValueFile:
+        pid = os.getpid()
+        if self._pid != pid:
+            # После fork у дочернего процесса должен быть свой файл, а потоки
+            # родителя в нем не работают.
+            self._values = self._open_file()
+            self._pid = pid
+            threading.Thread(
+                target=self._beat, args=(pid,), name="metrics-heartbeat", daemon=True
+            ).start()
+        return self._values
+
+    def _open_file(self) -> _ValueFile:
+        name = f"metrics-{os.getpid()}-{secrets.token_hex(4)}.db"
+        with self._locked(fcntl.LOCK_EX):
+            self._merge_expired()
+            # heartbeat пишется под той же блокировкой: перенос не примет
+            # только что созданный файл за брошенный.
+            values = _ValueFile(self.directory / name)
+            values.set(_HEARTBEAT, time.time())
+        return values
+
+    def _beat(self, pid: int) -> None:
+        while True:
+            time.sleep(self.heartbeat_ttl / 6)
+            with self._lock:
+                if self._pid != pid:
+                    return
+                if self._values.replaced():
+                    # Процесс стоял дольше heartbeat_ttl, и его файл уже
+                    # перенесен в merged.db: дальше пишем в новый.
+                    self._values.close()
+                    self._values = self._open_file()
+                else:
+                    self._values.set(_HEARTBEAT, time.time())
+
+    def _expired(self, values: Dict[str, float]) -> bool:
+        # Файл без heartbeat — от старой версии, его владелец уже перезапущен.
+        return values.get(_HEARTBEAT, 0.0) < time.time() - self.heartbeat_ttl
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        """flock каталога: перенос файлов исключает одновременный сбор."""
+        fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            os.close(fd)
+
+    def _merge_expired(self) -> None:
+        """Переносит файлы с истекшим heartbeat в merged.db; под LOCK_EX."""
+        expired = []
+        for path in self.directory.glob("metrics-*.db"):
+            values = _read_file(path)
+            if self._expired(values):
+                expired.append((path, values))
+        if not expired:
+            return
+        merged = _ValueFile(self.directory / MERGED_NAME)
+        try:
+            for path, values in expired:
+                values.pop(_HEARTBEAT, None)
+                for key, value in values.items():
+                    if key.split("\0", 1)[0] not in _LIVE_GAUGES:
+                        merged.add(key, value)
+                path.unlink()
+        finally:
+            merged.close()
+
+    def inc(self, name: str, labels: str = "", amount: float = 1.0) -> None:
+        with self._lock:
+            self._file().add(f"{name}\0{labels}", amount)
+
+    def observe(
+        self, name: str, labels: str, value: float, buckets: Tuple[float, ...]
+    ) -> None:
+        keys = self._histogram_keys(name, labels, buckets)
+        with self._lock:
+            values = self._file()
+            values.add(keys[0], 1)
+            values.add(keys[1], value)
+            values.add(keys[2 + bisect_left(buckets, value)], 1)
+
+    def record_request(
+        self, method: str, route: str, status: int, elapsed: float
+    ) -> None:
+        """Все метрики завершенного запроса за одно взятие блокировки."""
+        keys = self._request_keys.get((method, route, status))
+        if keys is None:
+            keys = self._request_keys[(method, route, status)] = (
+                f"http_requests_total\0{_labels(method=method, route=route, status=str(status))}",
+                self._histogram_keys(
+                    "http_request_duration_seconds",
+                    _labels(method=method, route=route),
+                    LATENCY_BUCKETS,
+                ),
+                f"rate_limit_rejections_total\0{_labels(route=route)}",
+            )
+        total, histogram, rejections = keys
+        bucket = histogram[2 + bisect_left(LATENCY_BUCKETS, elapsed)]
+        with self._lock:
+            values = self._file()
+            values.add(_IN_FLIGHT, -1)
+            values.add(total, 1)
+            values.add(histogram[0], 1)
+            values.add(histogram[1], elapsed)
+            values.add(bucket, 1)
+            if status == 429:
+                values.add(rejections, 1)
+
+    def _histogram_keys(
+        self, name: str, labels: str, buckets: Tuple[float, ...]
+    ) -> Tuple[str, ...]:
+        cache_key = (name, labels, buckets)
+        keys = self._histograms.get(cache_key)
+        if keys is None:
+            bounds = [repr(float(b)) for b in buckets] + ["+Inf"]
+            keys = self._histograms[cache_key] = (
+                f"{name}_count\0{labels}",
+                f"{name}_sum\0{labels}",
+                *(f"{name}_bucket\0{labels}\0{le}" for le in bounds),
+            )
+        return keys
+
+    def collect(self) -> Dict[str, float]:
+        """Суммирует значения всех файлов каталога."""
+        totals: Dict[str, float] = defaultdict(float)
+        with self._locked(fcntl.LOCK_SH):
+            merged = self.directory / MERGED_NAME
+            if merged.is_file():
+                for key, value in _read_file(merged).items():
+                    totals[key] += value
+            for path in self.directory.glob("metrics-*.db"):
+                values = _read_file(path)
+                alive = not self._expired(values)
+                values.pop(_HEARTBEAT, None)
+                for key, value in values.items():
+                    if alive or key.split("\0", 1)[0] not in _LIVE_GAUGES:
+                        totals[key] += value
+        return totals
+
+    def render(self, gauges: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+        """
+        Текст в формате Prometheus. gauges — значения, которые считаются
+        в момент запроса: (имя, описание, метки, значение).
+        """
+        samples: Dict[str, List[str]] = defaultdict(list)
+        buckets: Dict[Tuple[str, str], List[Tuple[float, float]]] = defaultdict(list)
+        for key, value in sorted(self.collect().items()):
+            sample, labels, *le = key.split("\0")
+            if le:
+                buckets[(sample, labels)].append((float(le[0]), value))
+                continue
+            samples[_family(sample)].append(_line(sample, labels, value))
+        for (sample, labels), counts in buckets.items():
+            counts.sort()
+            if counts[-1][0] != float("inf"):
+                counts.append((float("inf"), 0.0))
+            cumulative = 0.0
+            for bound, count in counts:
+                cumulative += count
+                bound_text = "+Inf" if bound == float("inf") else repr(bound)
+                le = f'le="{bound_text}"'
+                bucket_labels = f"{labels},{le}" if labels else le
+                samples[_family(sample)].append(
+                    _line(sample, bucket_labels, cumulative)
+                )
+
+        lines: List[str] = []
+        for family in sorted(samples):
+            kind, description = FAMILIES.get(family, ("untyped", family))
+            lines += [f"# HELP {family} {description}", f"# TYPE {family} {kind}"]
+            lines += samples[family]
+        declared = set()
+        for name, description, labels, value in gauges:
+            if name not in declared:
+                declared.add(name)
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            lines.append(_line(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _family(sample: str) -> str:
+    for suffix in ("_bucket", "_count", "_sum"):
+        base = sample[: -len(suffix)]
+        if sample.endswith(suffix) and FAMILIES.get(base, ("",))[0] == "histogram":
+            return base
+    return sample
+
+
+def _line(name: str, labels: str, value: float) -> str:
+    rendered = int(value) if float(value).is_integer() else value
+    return f"{name}{{{labels}}} {rendered}" if labels else f"{name} {rendered}"
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: число запросов и задержка по шаблону маршрута и
+    статусу, запросы в обработке и отказы 429.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.inc("http_requests_in_flight")
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            method = scope["method"]
+            metrics.record_request(
+                method if method in _METHODS else "OTHER",
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - started,
+            )
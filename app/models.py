@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from typing import Annotated, Dict, List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
+
+# Верхняя граница id ретро: индекс дат в памяти упаковывает id в 40 бит ключа.
+MAX_RETRO_ID = (1 << 40) - 1
+
+TrimmedString = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=2048)
+]
+
+
+class RetroItem(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    what_went_well: TrimmedString = Field(description="Что прошло хорошо")
+    to_improve: TrimmedString = Field(description="Что можно улучшить")
+    actions: TrimmedString = Field(
+        description="Конкретные действия на следующий спринт"
+    )
+
+
+class Retro(BaseModel):
+    id: int
+    session_date: date
+    items: List[RetroItem]
+
+
+class CreateRetroRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    session_date: date
+    items: List[RetroItem] = Field(max_length=20)
+
+
+class SearchHit(BaseModel):
+    score: float
+    retro: Retro
+
+
+class SearchResults(BaseModel):
+    total: int
+    hits: List[SearchHit]
+
+
+class AnalyticsBucket(BaseModel):
+    period: str
+    retros: int
+    items: int
+
+
+class TermCount(BaseModel):
+    term: str
+    count: int
+
+
+class AnalyticsReport(BaseModel):
+    granularity: Literal["month", "quarter"]
+    buckets: List[AnalyticsBucket]
+    top_terms: Dict[str, List[TermCount]]
+
+
+class AttachmentMetadata(BaseModel):
+    filename: str
+    size: int
+    content_type: str
+    sha256: str
+    created_at: datetime
@@ -0,0 +1,118 @@
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+# Заголовки одной части multipart: больше не бывает у честного клиента.
+MAX_PART_HEADERS_SIZE = 16 * 1024
+
+
+class MultipartError(ValueError):
+    """Тело запроса не является корректным multipart/form-data."""
+
+
+class Part(NamedTuple):
+    """Заголовки части multipart/form-data."""
+
+    field: str
+    filename: Optional[str]
+    content_type: Optional[str]
+
+
+# ("part", Part) — начало части, ("data", bytes) — очередной кусок ее содержимого.
+PartEvent = Tuple[str, Union[Part, bytes]]
+
+
+def multipart_boundary(request: Request) -> bytes:
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise MultipartError("Expected a multipart/form-data body")
+    return boundary
+
+
+def _part(headers: Dict[bytes, bytes]) -> Part:
+    disposition, options = parse_options_header(headers.get(b"content-disposition"))
+    if disposition != b"form-data" or b"name" not in options:
+        raise MultipartError("Part without form-data Content-Disposition")
+    filename = options.get(b"filename")
+    content_type = headers.get(b"content-type")
+    return Part(
+        options[b"name"].decode("latin-1"),
+        None if filename is None else filename.decode("utf-8", "replace"),
+        None if content_type is None else content_type.decode("latin-1"),
+    )
+
+
+async def iter_multipart(request: Request) -> AsyncIterator[PartEvent]:
+    """
+    Разбирает multipart/form-data по мере чтения request.stream(), не
+    накапливая тело: содержимое частей отдается кусками, как пришло из сети.
+    Обрезанное или испорченное тело — MultipartError.
+    """
+    boundary = multipart_boundary(request)
+    events: List[PartEvent] = []
+    headers: Dict[bytes, bytes] = {}
+    field = bytearray()
+    value = bytearray()
+    headers_size = 0
+    finished = False
+
+    def on_part_begin() -> None:
+        nonlocal headers_size
+        headers.clear()
+        headers_size = 0
+
+    def add_header_bytes(size: int) -> None:
+        nonlocal headers_size
+        headers_size += size
+        if headers_size > MAX_PART_HEADERS_SIZE:
+            raise MultipartError("Part headers are too large")
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        add_header_bytes(end - start)
+        field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        add_header_bytes(end - start)
+        value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(field).lower()] = bytes(value)
+        field.clear()
+        value.clear()
+
+    def on_headers_finished() -> None:
+        events.append(("part", _part(headers)))
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", bytes(data[start:end])))
+
+    def on_end() -> None:
+        nonlocal finished
+        finished = True
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_end": on_end,
+        },
+    )
+    async for chunk in request.stream():
+        try:
+            parser.write(chunk)
+        except MultipartParseError:
+            raise MultipartError("Malformed multipart body")
+        ready = events[:]
+        events.clear()
+        for event in ready:
+            yield event
+    if not finished:
+        raise MultipartError("Multipart body is truncated")
@@ -0,0 +1,34 @@
+import base64
+import binascii
+from datetime import date
+from typing import Tuple
+
+from .models import MAX_RETRO_ID, Retro
+
+MAX_PAGE_SIZE = 1000
+
+CursorKey = Tuple[date, int]
+
+
+def cursor_key(retro: Retro) -> CursorKey:
+    return (retro.session_date, retro.id)
+
+
+def encode_cursor(key: CursorKey) -> str:
+    """Кодирует ключ (session_date, id) в непрозрачный курсор."""
+    raw = f"{key[0].isoformat()}:{key[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> CursorKey:
+    """Декодирует курсор, выданный encode_cursor. Бросает ValueError при ошибке."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        day, raw_id = raw.split(":")
+        retro_id = int(raw_id)
+        if not 0 < retro_id <= MAX_RETRO_ID:
+            raise ValueError(raw_id)
+        return date.fromisoformat(day), retro_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,193 @@
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import itertools
+import json
+import pstats
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .rate_limit import CostLimitedRoute
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Профили синхронных обработчиков из потоков threadpool для текущего запроса.
+_worker_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar(
+    "worker_profiles", default=None
+)
+
+# Этапы запроса -> функции (суффикс пути, имя), чье накопленное время их образует.
+STAGES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "limiter": (
+        ("app/rate_limit.py", "charge"),
+        ("slowapi/extension.py", "_check_request_limit"),
+    ),
+    "validation": (("fastapi/dependencies/utils.py", "solve_dependencies"),),
+    "handler": (("fastapi/routing.py", "run_endpoint_function"),),
+    "serialization": (
+        ("fastapi/routing.py", "serialize_response"),
+        ("starlette/responses.py", "render"),
+    ),
+}
+
+
+def stage_breakdown(
+    stats: pstats.Stats, worker_seconds: float = 0.0
+) -> Dict[str, float]:
+    """Время этапов в мс по накопленному времени функций профиля."""
+    stages = dict.fromkeys(STAGES, 0.0)
+    for (filename, _, name), (_, _, _, cumulative, _) in stats.stats.items():
+        for stage, functions in STAGES.items():
+            if any(
+                filename.endswith(suffix) and name == fn for suffix, fn in functions
+            ):
+                stages[stage] += cumulative
+    # Синхронный обработчик выполнялся в потоке threadpool целиком.
+    stages["handler"] += worker_seconds
+    return {stage: round(seconds * 1000, 3) for stage, seconds in stages.items()}
+
+
+class ProfileRing:
+    """Кольцо из max_files профилей: <id>.prof (pstats) и <id>.json (сводка)."""
+
+    def __init__(self, directory: Path, max_files: int) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_files = max_files
+        existing = sorted(
+            self.directory.glob("profile-*.json"), key=lambda p: p.stat().st_mtime
+        )
+        start = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+        self._slots = itertools.count(start)
+
+    def next_id(self) -> str:
+        return f"profile-{next(self._slots) % self.max_files:03d}"
+
+    def write(self, profile_id: str, stats: pstats.Stats, summary: dict) -> None:
+        stats.dump_stats(str(self.directory / f"{profile_id}.prof"))
+        top = io.StringIO()
+        stats.stream = top
+        stats.sort_stats("cumulative").print_stats(25)
+        summary["top"] = top.getvalue().splitlines()
+        path = self.directory / f"{profile_id}.json"
+        path.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует отдельный запрос по заголовку X-Profile-Token.
+
+    Добавляется в приложение только при PROFILING_ENABLED, поэтому в
+    обычном режиме не стоит ничего. Профиль цикла событий объединяется с
+    профилями синхронных обработчиков из threadpool; конкурентные запросы
+    в том же цикле событий тоже попадают в профиль.
+    """
+
+    def __init__(self, app: ASGIApp, token: str, ring: ProfileRing) -> None:
+        self.app = app
+        self.token = token.encode()
+        self.ring = ring
+
+    def _requested(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.ring.next_id()
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        workers: List[cProfile.Profile] = []
+        reset = _worker_profiles.set(workers)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            wall = time.perf_counter() - started
+            _worker_profiles.reset(reset)
+            self._save(profile_id, scope, status, wall, profiler, workers)
+
+    def _save(
+        self,
+        profile_id: str,
+        scope: Scope,
+        status: int,
+        wall: float,
+        profiler: cProfile.Profile,
+        workers: List[cProfile.Profile],
+    ) -> None:
+        stats = pstats.Stats(profiler)
+        worker_seconds = 0.0
+        for worker in workers:
+            worker_stats = pstats.Stats(worker)
+            worker_seconds += worker_stats.total_tt
+            stats.add(worker_stats)
+        route = scope.get("route")
+        summary = {
+            "id": profile_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route.path if route is not None else None,
+            "status": status,
+            "wall_ms": round(wall * 1000, 3),
+            "stages_ms": stage_breakdown(pstats.Stats(profiler), worker_seconds),
+        }
+        self.ring.write(profile_id, stats, summary)
+
+
+def _profile_in_worker(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    def profiled_endpoint(*args, **kwargs):
+        sink = _worker_profiles.get()
+        if sink is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+            sink.append(profiler)
+
+    return profiled_endpoint
+
+
+class ProfiledRoute(CostLimitedRoute):
+    """
+    Маршрут, синхронный обработчик которого профилируется в потоке
+    threadpool, если запрос профилируется. Используется только при
+    PROFILING_ENABLED.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs) -> None:
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profile_in_worker(endpoint)
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,134 @@
+import math
+import time
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, Request, Response
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+from slowapi.util import get_remote_address
+from starlette.types import Message, Receive
+
+from .body_limit import BodyLimitedRoute
+
+RATE_LIMIT_EXTRA = "x-rate-limit-cost"
+# Тело загрузки списывается по единице бюджета на каждые 64 КиБ.
+BYTES_PER_UNIT = 64 * 1024
+# Стоимость маршрута, не объявившего свою через rate_cost().
+DEFAULT_COST = 1
+
+
+def rate_cost(cost: int, bytes_per_unit: Optional[int] = None) -> dict:
+    """
+    openapi_extra маршрута с его стоимостью в единицах бюджета клиента;
+    rate_cost(0) освобождает маршрут от лимита (проверки живости, метрики).
+    С bytes_per_unit тело запроса дополнительно списывается по единице
+    на каждые bytes_per_unit полученных байт — по мере чтения, а не после.
+    """
+    declared: Dict[str, int] = {"cost": cost}
+    if bytes_per_unit:
+        declared["bytes_per_unit"] = bytes_per_unit
+    return {RATE_LIMIT_EXTRA: declared}
+
+
+class RateLimitExhausted(HTTPException):
+    # HTTPException, чтобы FastAPI не превращал ошибку при чтении тела в 400.
+    def __init__(self, headers: Dict[str, str]) -> None:
+        super().__init__(
+            status_code=429,
+            detail="Rate limit exceeded: request cost is over the client budget",
+            headers={**headers, "Retry-After": headers["RateLimit-Reset"]},
+        )
+
+
+class CostLimiter:
+    """
+    Взвешенный лимит: у клиента бюджет единиц на окно (например 600/minute),
+    каждый маршрут списывает свою стоимость. Хранилище и стратегия те же,
+    что у slowapi (RATE_LIMIT_STORAGE_URI / RATE_LIMIT_STRATEGY).
+    """
+
+    def __init__(
+        self,
+        budget: str,
+        storage_uri: str = "memory://",
+        strategy: str = "fixed-window",
+        key_func: Callable[[Request], str] = get_remote_address,
+    ) -> None:
+        self.item = parse(budget)
+        self.storage = storage_from_string(storage_uri)
+        self.strategy = STRATEGIES[strategy](self.storage)
+        self.key_func = key_func
+
+    def charge(self, key: str, cost: int) -> None:
+        if cost and not self.strategy.hit(self.item, key, cost=cost):
+            raise RateLimitExhausted(self.headers(key))
+
+    def headers(self, key: str) -> Dict[str, str]:
+        reset_at, remaining = self.strategy.get_window_stats(self.item, key)
+        return {
+            "RateLimit-Limit": str(self.item.amount),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(max(0, math.ceil(reset_at - time.time()))),
+            "RateLimit-Policy": f"{self.item.amount};w={self.item.get_expiry()}",
+        }
+
+    def reset(self) -> None:
+        self.storage.reset()
+
+
+def _metered(receive: Receive, charge: Callable[[int], None], bytes_per_unit: int):
+    pending = 0
+
+    async def metered_receive() -> Message:
+        nonlocal pending
+        message = await receive()
+        if message["type"] == "http.request":
+            pending += len(message.get("body", b""))
+            units, pending = divmod(pending, bytes_per_unit)
+            if units:
+                charge(units)
+        return message
+
+    return metered_receive
+
+
+class CostLimitedRoute(BodyLimitedRoute):
+    """
+    Маршрут, списывающий объявленную через rate_cost() стоимость из бюджета
+    app.state.cost_limiter и добавляющий в ответ заголовки RateLimit-*.
+    Маршрут без объявления стоит DEFAULT_COST; в приложении без
+    cost_limiter маршруты не лимитируются. Предел тела (body_limit())
+    проверяет базовый BodyLimitedRoute.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        declared = (self.openapi_extra or {}).get(RATE_LIMIT_EXTRA)
+        if declared is None:
+            declared = {"cost": DEFAULT_COST}
+        cost = declared["cost"]
+        bytes_per_unit = declared.get("bytes_per_unit")
+        if not cost and not bytes_per_unit:
+            return handler
+
+        async def cost_limited_handler(request: Request) -> Response:
+            limiter: Optional[CostLimiter] = getattr(
+                request.app.state, "cost_limiter", None
+            )
+            if limiter is None:
+                return await handler(request)
+            key = limiter.key_func(request)
+            limiter.charge(key, cost)
+            if bytes_per_unit:
+                receive = _metered(
+                    request.receive,
+                    lambda units: limiter.charge(key, units),
+                    bytes_per_unit,
+                )
+                request = Request(request.scope, receive)
+            response = await handler(request)
+            response.headers.update(limiter.headers(key))
+            return response
+
+        return cost_limited_handler
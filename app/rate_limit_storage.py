@@ -0,0 +1,233 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from math import floor
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+
+_MAGIC = b"SDRLIM01"
+_HEADER = struct.Struct("<8sII")
+# fingerprint, expires_at, window, count, previous_count
+_SLOT = struct.Struct("<Qdqqq")
+_WAYS = 8
+
+
+def default_path() -> Path:
+    shm = Path("/dev/shm")
+    return (shm if shm.is_dir() else Path(tempfile.gettempdir())) / "secdev-ratelimit"
+
+
+def _fingerprint(key: str) -> int:
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    """
+    Хранилище лимитов в общем mmap-файле для всех воркеров одного хоста.
+
+    Таблица фиксированного размера: ключ хэшируется в корзину из 8 слотов,
+    слот занимает 40 байт независимо от числа запросов. Если свободного
+    или истекшего слота нет, вытесняется ключ с самым ранним сроком
+    истечения, поэтому память не растет от числа клиентов.
+    Запись сериализуется flock на файл (между процессами) и мьютексом
+    (между потоками процесса).
+
+    URI: shm:///dev/shm/secdev-ratelimit?slots=65536
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(
+        self,
+        uri: Optional[str] = None,
+        wrap_exceptions: bool = False,
+        slots: int = 65536,
+        **options,
+    ) -> None:
+        parsed = urlparse(uri or "shm://")
+        query = parse_qs(parsed.query)
+        self.path = Path(parsed.path) if parsed.path else default_path()
+        self._buckets = max(1, int(query.get("slots", [slots])[0]) // _WAYS)
+        self._size = _HEADER.size + self._buckets * _WAYS * _SLOT.size
+        self._lock = threading.Lock()
+        self._open()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _open(self) -> None:
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            expected = _HEADER.pack(_MAGIC, self._buckets, _WAYS)
+            if not header.strip(b"\0"):
+                # Новый файл: размечаем его под себя.
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, expected, 0)
+                header = expected
+            size = os.fstat(self._fd).st_size
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        if header != expected or size != self._size:
+            # Другие воркеры могут держать файл в mmap: переразметка испортила
+            # бы их таблицу, поэтому несовпадение — ошибка конфигурации.
+            os.close(self._fd)
+            raise ValueError(self._mismatch(header))
+        self._map = mmap.mmap(self._fd, self._size)
+
+    def _mismatch(self, header: bytes) -> str:
+        slots = self._buckets * _WAYS
+        if len(header) == _HEADER.size and header.startswith(_MAGIC):
+            _, buckets, ways = _HEADER.unpack(header)
+            found = f"is laid out for {buckets * ways} slots"
+        else:
+            found = "has an unknown layout"
+        return (
+            f"Rate limit file {self.path} {found}, expected {slots}: "
+            "use the same slots in every worker or remove the file"
+        )
+
+    @contextmanager
+    def _locked(self) -> Iterator[mmap.mmap]:
+        with self._lock:
+            if self._pid != os.getpid():
+                # После fork дескриптор общий с родителем, и flock не
+                # разделял бы процессы — открываем файл заново.
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _find(
+        self, buf: mmap.mmap, key: str, now: float, allocate: bool
+    ) -> Tuple[Optional[int], int, Optional[tuple]]:
+        """
+        Возвращает (смещение слота, отпечаток ключа, живая запись или None).
+        Без allocate для отсутствующего ключа смещение равно None.
+        """
+        fp = _fingerprint(key)
+        base = _HEADER.size + (fp % self._buckets) * _WAYS * _SLOT.size
+        free = victim = None
+        victim_expires = float("inf")
+        for offset in range(base, base + _WAYS * _SLOT.size, _SLOT.size):
+            record = _SLOT.unpack_from(buf, offset)
+            if record[0] == fp:
+                return offset, fp, record if record[1] > now else None
+            if record[0] == 0 or record[1] <= now:
+                if free is None:
+                    free = offset
+            elif record[1] < victim_expires:
+                victim, victim_expires = offset, record[1]
+        if not allocate:
+            return None, fp, None
+        return (free if free is not None else victim), fp, None
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        with self._locked() as buf:
+            offset, fp, record = self._find(buf, key, now, allocate=True)
+            if record is None:
+                expires_at, count = now + expiry, amount
+            else:
+                expires_at, count = record[1], record[3] + amount
+            _SLOT.pack_into(buf, offset, fp, expires_at, -1, count, 0)
+        return count
+
+    def get(self, key: str) -> int:
+        with self._locked() as buf:
+            _, _, record = self._find(buf, key, time.time(), allocate=False)
+        return 0 if record is None else record[3]
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._locked() as buf:
+            _, _, record = self._find(buf, key, now, allocate=False)
+        return now if record is None else record[1]
+
+    def clear(self, key: str) -> None:
+        with self._locked() as buf:
+            offset, _, _ = self._find(buf, key, time.time(), allocate=False)
+            if offset is not None:
+                _SLOT.pack_into(buf, offset, 0, 0.0, 0, 0, 0)
+
+    def reset(self) -> int:
+        now = time.time()
+        with self._locked() as buf:
+            live = 0
+            for offset in range(_HEADER.size, self._size, _SLOT.size):
+                fp, expires_at = struct.unpack_from("<Qd", buf, offset)
+                live += fp != 0 and expires_at > now
+            buf[_HEADER.size :] = bytes(self._size - _HEADER.size)
+        return live
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    @staticmethod
+    def _window(
+        record: Optional[tuple], expiry: int, now: float
+    ) -> Tuple[int, int, int]:
+        """Сдвигает окно записи к текущему: (номер окна, текущее, предыдущее)."""
+        window = int(now // expiry)
+        if record is None or record[2] < window - 1:
+            return window, 0, 0
+        if record[2] == window - 1:
+            return window, 0, record[3]
+        return window, record[3], record[4]
+
+    @staticmethod
+    def _ttls(previous: int, expiry: int, now: float) -> Tuple[float, float]:
+        remaining = (1 - (now / expiry) % 1) * expiry
+        return (remaining if previous else 0.0), remaining + expiry
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._locked() as buf:
+            offset, fp, record = self._find(buf, key, now, allocate=True)
+            window, current, previous = self._window(record, expiry, now)
+            previous_ttl, _ = self._ttls(previous, expiry, now)
+            if floor(previous * previous_ttl / expiry + current) + amount > limit:
+                return False
+            expires_at = (window + 2) * expiry
+            _SLOT.pack_into(
+                buf, offset, fp, expires_at, window, current + amount, previous
+            )
+        return True
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> Tuple[int, float, int, float]:
+        now = time.time()
+        with self._locked() as buf:
+            _, _, record = self._find(buf, key, now, allocate=False)
+        _, current, previous = self._window(record, expiry, now)
+        previous_ttl, current_ttl = self._ttls(previous, expiry, now)
+        return previous, previous_ttl, current, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
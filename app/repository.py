@@ -0,0 +1,269 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .models import Retro, RetroItem
+
+DateKey = Tuple[date, int]
+
+
+class RevisionConflict(Exception):
+    """Ретро изменилось с момента, когда клиент прочитал ожидаемую ревизию."""
+
+
+class RetroListener:
+    """Подписчик на изменения хранилища ретро (кэши, индексы, журнал)."""
+
+    def on_write(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        """
+        Вызывается после записи: old=None — создание, new=None — удаление.
+        revision — версия хранилища после записи.
+        """
+
+    def on_clear(self) -> None:
+        """Вызывается после полной очистки хранилища."""
+
+
+class RetroChange(NamedTuple):
+    """Последнее изменение ретро: retro=None — ретро удалено."""
+
+    retro_id: int
+    retro: Optional[Retro]
+    revision: int
+
+
+class CatchUpListener(RetroListener):
+    """
+    Подписчик, чье состояние — функция текущих ретро, а не последовательности
+    событий. Изменение ретро применяется, только если его ревизия новее уже
+    примененной для этого id: уведомления идут после commit и вне блокировок,
+    и опоздавшее событие не откатывает состояние. Удаленные id помнятся до
+    rebuild() по той же причине.
+
+    События приходят только о записях своего процесса. sync() догоняет
+    хранилище, общее для нескольких воркеров: если его version ушла вперед,
+    применяются изменения из changes_since(). Наследник реализует _put(),
+    _drop() и _reset() и читает свое состояние под self._lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._revisions: Dict[int, int] = {}
+        # События с ревизией не выше _floor уже учтены последним rebuild().
+        self._floor = 0
+        # Все записи до этой версии хранилища учтены.
+        self.version = 0
+
+    def on_write(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        retro_id = new.id if new is not None else old.id
+        self.apply(RetroChange(retro_id, new, revision))
+
+    def on_clear(self) -> None:
+        with self._lock:
+            self._revisions.clear()
+            self._reset()
+
+    def apply(self, change: RetroChange) -> None:
+        with self._lock:
+            applied = max(self._revisions.get(change.retro_id, 0), self._floor)
+            if change.revision <= applied:
+                return
+            self._revisions[change.retro_id] = change.revision
+            self._drop(change.retro_id)
+            if change.retro is not None:
+                self._put(change.retro)
+
+    def rebuild(self, retros: Iterable[Retro], version: int = 0) -> None:
+        """Заполняет состояние ретро из retros, прочитанных не раньше version."""
+        with self._lock:
+            self._revisions.clear()
+            self._reset()
+            for retro in retros:
+                self._put(retro)
+            self._floor = version
+            self.version = version
+
+    def sync(self, retros: "RetroRepository") -> None:
+        """Догоняет записи, сделанные в хранилище другими процессами."""
+        version = retros.version
+        if version <= self.version:
+            return
+        with self._sync_lock:
+            if version <= self.version:
+                return
+            changes = retros.changes_since(self.version)
+            if changes is None:
+                self.rebuild(retros, version)
+                return
+            for change in changes:
+                self.apply(change)
+            self.version = version
+
+    def _put(self, retro: Retro) -> None:
+        raise NotImplementedError
+
+    def _drop(self, retro_id: int) -> None:
+        raise NotImplementedError
+
+    def _reset(self) -> None:
+        raise NotImplementedError
+
+
+class RetroRepository(ABC):
+    """
+    Интерфейс хранилища ретро, за которым стоят эндпоинты /retros.
+
+    version монотонно растет при каждой записи; ревизия ретро — это version
+    на момент его последнего изменения. Обе величины служат основой ETag.
+    Подписчики (RetroListener) уведомляются после каждой успешной записи.
+    """
+
+    def __init__(self) -> None:
+        self._listeners: List[RetroListener] = []
+
+    def subscribe(self, listener: RetroListener) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: RetroListener) -> None:
+        self._listeners.remove(listener)
+
+    def _notify(
+        self, old: Optional[Retro], new: Optional[Retro], revision: int
+    ) -> None:
+        for listener in self._listeners:
+            listener.on_write(old, new, revision)
+
+    def _notify_clear(self) -> None:
+        for listener in self._listeners:
+            listener.on_clear()
+
+    @abstractmethod
+    def create_with_revision(
+        self, session_date: date, items: List[RetroItem]
+    ) -> Tuple[Retro, int]:
+        """Создает ретро, выделяя ему новый id. Возвращает его и записанную ревизию."""
+
+    def create(self, session_date: date, items: List[RetroItem]) -> Retro:
+        return self.create_with_revision(session_date, items)[0]
+
+    def create_many(
+        self, records: Iterable[Tuple[date, List[RetroItem]]]
+    ) -> List[Retro]:
+        """Создает пачку ретро; реализации могут делать это одной транзакцией."""
+        return [self.create(session_date, items) for session_date, items in records]
+
+    @abstractmethod
+    def get(self, retro_id: int) -> Optional[Retro]: ...
+
+    def changes_since(self, version: int) -> Optional[Iterator[RetroChange]]:
+        """
+        Изменения с ревизией больше version, которые могли пройти мимо
+        подписчиков этого процесса; None — восстановить их нельзя (хранилище
+        очищали), нужен полный rebuild. Хранилище одного процесса уведомляет
+        обо всех своих записях, поэтому по умолчанию таких изменений нет.
+        """
+        return iter(())
+
+    @abstractmethod
+    def revision(self, retro_id: int) -> Optional[int]: ...
+
+    @property
+    @abstractmethod
+    def version(self) -> int: ...
+
+    @abstractmethod
+    def update_with_revision(
+        self,
+        retro_id: int,
+        session_date: date,
+        items: List[RetroItem],
+        expected_revision: Optional[int] = None,
+    ) -> Optional[Tuple[Retro, int]]:
+        """
+        Заменяет содержимое ретро. Возвращает новую версию и записанную ревизию
+        или None, если id нет. Ревизию для ETag берут отсюда, а не повторным
+        чтением revision(): его может опередить следующая запись.
+        Если задан expected_revision и текущая ревизия другая, бросает RevisionConflict.
+        """
+
+    def update(
+        self,
+        retro_id: int,
+        session_date: date,
+        items: List[RetroItem],
+        expected_revision: Optional[int] = None,
+    ) -> Optional[Retro]:
+        written = self.update_with_revision(
+            retro_id, session_date, items, expected_revision
+        )
+        return None if written is None else written[0]
+
+    @abstractmethod
+    def delete(self, retro_id: int) -> Optional[Retro]:
+        """Удаляет ретро. Возвращает удаленную запись или None, если id нет."""
+
+    @abstractmethod
+    def range(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        after: Optional[DateKey] = None,
+    ) -> Iterator[Retro]:
+        """
+        Итерирует ретро в порядке (session_date, id) в границах [from_date, to_date].
+        Если задан after, выдача начинается строго после этого ключа (keyset-пагинация).
+        """
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    def __contains__(self, retro_id: object) -> bool:
+        return isinstance(retro_id, int) and self.get(retro_id) is not None
+
+    def __iter__(self) -> Iterator[Retro]:
+        return self.range()
+
+
+class ItemRepository(ABC):
+    """Интерфейс хранилища демо-сущности /items."""
+
+    @abstractmethod
+    def create(self, name: str) -> dict: ...
+
+    @abstractmethod
+    def get(self, item_id: int) -> Optional[dict]: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+def create_repositories(settings) -> Tuple[RetroRepository, ItemRepository]:
+    """Создает хранилища согласно settings.STORAGE_BACKEND."""
+    backend = settings.STORAGE_BACKEND
+    if backend == "memory":
+        if settings.JOURNAL_DIR:
+            from .journal import open_journaled_stores
+
+            return open_journaled_stores(settings)
+        from .store import ItemStore, RetroStore
+
+        return RetroStore(), ItemStore()
+    if backend == "sqlite":
+        from . import sqlite_store
+
+        db = sqlite_store.SQLiteDatabase(
+            settings.SQLITE_PATH, pool_size=settings.SQLITE_POOL_SIZE
+        )
+        return sqlite_store.SQLiteRetroRepository(
+            db
+        ), sqlite_store.SQLiteItemRepository(db)
+    raise ValueError(f"Unknown storage backend: {backend}")
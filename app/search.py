@@ -0,0 +1,178 @@
+import heapq
+import math
+import re
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import Retro
+from .repository import CatchUpListener
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_OR_KEYWORDS = {"or", "или", "|"}
+_AND_KEYWORDS = {"and", "и", "&"}
+
+STOPWORDS = frozenset(
+    "a an the of to in on at for is are was were be it this that with by as "
+    "в во на по с со к ко о об от до из за для не но а же ли бы что как это то так".split()
+)
+
+# Окончания для облегченного стемминга: самые длинные проверяются первыми.
+_RU_ENDINGS = sorted(
+    "ами ями ого его ому ему ыми ими иях ах ях ов ев ей ой ий ый их ых ая яя ое ее ые ие "
+    "ом ем ам ям ую юю ть ся а я о е ы и у ю ь".split(),
+    key=len,
+    reverse=True,
+)
+_EN_ENDINGS = ("ing", "ies", "ed", "es", "s")
+_CYRILLIC = re.compile(r"[а-я]")
+
+
+def _stem(word: str) -> str:
+    """Отбрасывает типичное окончание, оставляя основу не короче 3 символов."""
+    endings = _RU_ENDINGS if _CYRILLIC.search(word) else _EN_ENDINGS
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def tokenize(text: str, stem: bool = True) -> List[str]:
+    """Разбивает русский/английский текст на нормализованные термы."""
+    terms = []
+    for match in _WORD.finditer(text):
+        word = match.group().casefold().replace("ё", "е")
+        if word in STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(_stem(word) if stem else word)
+    return terms
+
+
+def parse_query(query: str) -> List[List[str]]:
+    """
+    Разбирает запрос в дизъюнкцию конъюнкций: "flaky tests OR ci" ->
+    [["flaky", "test"], ["ci"]]. Слова без оператора объединяются через AND.
+    """
+    groups: List[List[str]] = [[]]
+    for word in query.split():
+        lowered = word.casefold()
+        if lowered in _OR_KEYWORDS:
+            if groups[-1]:
+                groups.append([])
+            continue
+        if lowered in _AND_KEYWORDS:
+            continue
+        groups[-1].extend(tokenize(word))
+    return [group for group in groups if group]
+
+
+def retro_text(retro: Retro) -> Iterable[str]:
+    for item in retro.items:
+        yield item.what_went_well
+        yield item.to_improve
+        yield item.actions
+
+
+class SearchIndex(CatchUpListener):
+    """
+    Инвертированный индекс по тексту пунктов ретро с ранжированием BM25.
+
+    Обновляется инкрементально как CatchUpListener: записи своего процесса
+    приходят событиями, записи других воркеров общего SQLite подтягивает
+    sync() перед запросом. Стоимость запроса зависит от длины списков
+    вхождений термов запроса, а не от размера всего корпуса.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self._doc_dates: Dict[int, date] = {}
+        self._doc_lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def search(
+        self,
+        query: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[int, List[Tuple[int, float]]]:
+        """Возвращает (число совпадений, [(retro_id, score)]) для страницы выдачи."""
+        groups = parse_query(query)
+        with self._lock:
+            matched: Set[int] = set()
+            for group in groups:
+                matched |= self._match_all(group)
+            if from_date is not None or to_date is not None:
+                matched = {
+                    doc
+                    for doc in matched
+                    if (from_date is None or self._doc_dates[doc] >= from_date)
+                    and (to_date is None or self._doc_dates[doc] <= to_date)
+                }
+            terms = {term for group in groups for term in group}
+            scored = ((self._score(doc, terms), doc) for doc in matched)
+            top = heapq.nlargest(offset + limit, scored, key=lambda s: (s[0], -s[1]))
+        return len(matched), [(doc, round(score, 6)) for score, doc in top[offset:]]
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def _put(self, retro: Retro) -> None:
+        terms = Counter(term for text in retro_text(retro) for term in tokenize(text))
+        self._doc_terms[retro.id] = tuple(terms)
+        self._doc_dates[retro.id] = retro.session_date
+        self._doc_lengths[retro.id] = sum(terms.values())
+        self._total_length += self._doc_lengths[retro.id]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[retro.id] = tf
+
+    def _reset(self) -> None:
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._doc_dates.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0
+
+    def _drop(self, retro_id: int) -> None:
+        terms = self._doc_terms.pop(retro_id, None)
+        if terms is None:
+            return
+        del self._doc_dates[retro_id]
+        self._total_length -= self._doc_lengths.pop(retro_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[retro_id]
+            if not postings:
+                del self._postings[term]
+
+    def _match_all(self, terms: List[str]) -> Set[int]:
+        postings = sorted((self._postings.get(t, {}) for t in set(terms)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        matched = set(postings[0])
+        for other in postings[1:]:
+            matched.intersection_update(other)
+            if not matched:
+                break
+        return matched
+
+    def _score(self, doc: int, terms: Set[str]) -> float:
+        n_docs = len(self._doc_terms)
+        avg_length = self._total_length / n_docs if n_docs else 0.0
+        length = self._doc_lengths[doc]
+        score = 0.0
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings or doc not in postings:
+                continue
+            tf = postings[doc]
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = tf + self.K1 * (1 - self.B + self.B * length / (avg_length or 1))
+            score += idf * tf * (self.K1 + 1) / norm
+        return score
@@ -1,8 +1,17 @@
+import hashlib
+import os
+import tempfile
 import uuid
 from pathlib import Path
-from typing import Union
+from typing import AsyncIterator, BinaryIO, List, NamedTuple, Optional, Union
+
+from .blob_store import BlobStore
+from .executor import BoundedExecutor
+from .multipart_stream import Part, PartEvent
 
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 MB
+CHUNK_SIZE = 64 * 1024  # 64 KB
+PUBLISHED_FILE_MODE = 0o644
 
 PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
 JPEG_SOI = b"\xff\xd8"
@@ -13,6 +22,9 @@ ALLOWED_MIME_TYPES = {
     "image/jpeg": ".jpg",
 }
 
+_HEAD_SIZE = len(PNG_SIGNATURE)
+_TAIL_SIZE = len(JPEG_EOI)
+
 
 def sniff_mime_type(data: bytes) -> Union[str, None]:
     """Определяет MIME-тип по сигнатуре файла (magic bytes)."""
@@ -23,26 +35,36 @@ def sniff_mime_type(data: bytes) -> Union[str, None]:
     return None
 
 
-def secure_save(upload_dir: Path, data: bytes) -> Path:
-    """
-    Безопасно сохраняет файл, выполняя все необходимые проверки.
-    Возвращает путь к сохраненному файлу.
-    """
-    if len(data) > MAX_FILE_SIZE:
-        raise ValueError("File is too large")
+def _sniff_prefix(head: bytes) -> Union[str, None]:
+    """Определяет кандидата в MIME-тип по первым байтам (без проверки конца JPEG)."""
+    if head.startswith(PNG_SIGNATURE):
+        return "image/png"
+    if head.startswith(JPEG_SOI):
+        return "image/jpeg"
+    return None
 
-    mime_type = sniff_mime_type(data)
-    if not mime_type or mime_type not in ALLOWED_MIME_TYPES:
-        raise ValueError("Invalid file type")
 
+def resolve_upload_root(upload_dir: Path) -> Path:
     try:
-        resolved_root = upload_dir.resolve(strict=True)
+        return upload_dir.resolve(strict=True)
     except FileNotFoundError:
         raise ValueError("Upload directory does not exist")
 
-    ext = ALLOWED_MIME_TYPES[mime_type]
-    secure_filename = f"{uuid.uuid4()}{ext}"
-    file_path = (resolved_root / secure_filename).resolve()
+
+def checked_upload_root(upload_dir: Path) -> Path:
+    """
+    Разрешает каталог загрузок и проверяет, что ни он, ни его родители не
+    симлинки. Для пачки файлов делается один раз: файлы с сгенерированными
+    именами кладутся прямо в этот каталог.
+    """
+    root = resolve_upload_root(upload_dir)
+    if any(p.is_symlink() for p in (root, *root.parents)):
+        raise ValueError("Saving through symlinks is forbidden")
+    return root
+
+
+def _target_path(resolved_root: Path, name: str) -> Path:
+    file_path = (resolved_root / name).resolve()
 
     if not str(file_path).startswith(str(resolved_root)):
         raise ValueError("Path traversal attempt detected")
@@ -50,5 +72,243 @@ def secure_save(upload_dir: Path, data: bytes) -> Path:
     if any(p.is_symlink() for p in file_path.parents):
         raise ValueError("Saving through symlinks is forbidden")
 
-    file_path.write_bytes(data)
     return file_path
+
+
+class SavedFile(NamedTuple):
+    """Опубликованное вложение и его метаданные."""
+
+    path: Path
+    size: int
+    mime_type: str
+    sha256: str
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StreamingUpload:
+    """
+    Потоковое сохранение загрузки: в памяти только переданный кусок и
+    несколько байт начала и конца файла.
+
+    Сигнатура проверяется по первым байтам, лимит MAX_FILE_SIZE — по мере
+    чтения, маркер конца JPEG — по небольшому буферу хвоста. Данные пишутся
+    во временный файл в upload_dir и атомарно переименовываются в commit().
+    Если задан blob_store, файл сохраняется по SHA-256, посчитанному на лету.
+    """
+
+    def __init__(
+        self,
+        upload_dir: Path,
+        max_size: int = MAX_FILE_SIZE,
+        blob_store: Optional[BlobStore] = None,
+        part: Optional[Path] = None,
+        root: Optional[Path] = None,
+    ) -> None:
+        self.upload_dir = upload_dir
+        self.max_size = max_size
+        self.blob_store = blob_store
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.mime_type: Optional[str] = None
+        self._head = b""
+        self._tail = b""
+        # root — уже проверенный checked_upload_root() каталог пачки загрузок.
+        self._root = root
+        self._root_checked = root is not None
+        self.saved: Optional[SavedFile] = None
+        self._tmp: Optional[BinaryIO] = None
+        if part is not None:
+            self._resume(part)
+
+    def _resume(self, part: Path) -> None:
+        """
+        Продолжает запись в уже начатый файл part (возобновляемая загрузка).
+        Состояние восстанавливается по началу и концу файла без чтения
+        целиком; SHA-256 тогда считается один раз в commit().
+        """
+        if self._root is None:
+            self._root = resolve_upload_root(self.upload_dir)
+        self._tmp = open(part, "ab")
+        self.size = self._tmp.tell()
+        self.sha256 = None
+        with open(part, "rb") as f:
+            self._head = f.read(_HEAD_SIZE)
+            f.seek(max(0, self.size - _TAIL_SIZE))
+            self._tail = f.read(_TAIL_SIZE)
+        if len(self._head) == _HEAD_SIZE:
+            self.mime_type = _sniff_prefix(self._head)
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise ValueError("File is too large")
+
+        if len(self._head) < _HEAD_SIZE:
+            self._head += chunk[: _HEAD_SIZE - len(self._head)]
+            if len(self._head) == _HEAD_SIZE:
+                self.mime_type = _sniff_prefix(self._head)
+                if self.mime_type not in ALLOWED_MIME_TYPES:
+                    raise ValueError("Invalid file type")
+        self._tail = (self._tail + chunk)[-_TAIL_SIZE:]
+
+        if self._tmp is None:
+            if self._root is None:
+                self._root = resolve_upload_root(self.upload_dir)
+            self._tmp = tempfile.NamedTemporaryFile(
+                dir=self._root, prefix=".upload-", suffix=".part", delete=False
+            )
+        self._tmp.write(chunk)
+        if self.sha256 is not None:
+            self.sha256.update(chunk)
+
+    def commit(self) -> Path:
+        """Завершает загрузку финальными проверками и атомарно публикует файл."""
+        if len(self._head) < _HEAD_SIZE:
+            # Файл короче PNG-сигнатуры: head содержит его целиком.
+            self.mime_type = sniff_mime_type(self._head)
+        elif self.mime_type == "image/jpeg" and not self._tail.endswith(JPEG_EOI):
+            self.mime_type = None
+        if (
+            not self.mime_type
+            or self.mime_type not in ALLOWED_MIME_TYPES
+            or self._tmp is None
+        ):
+            raise ValueError("Invalid file type")
+
+        ext = ALLOWED_MIME_TYPES[self.mime_type]
+        self._tmp.flush()
+        # NamedTemporaryFile создается с 0600, а опубликованные файлы отдает и
+        # внешний статический сервер.
+        os.fchmod(self._tmp.fileno(), PUBLISHED_FILE_MODE)
+        if self.sha256 is None:
+            digest = _file_sha256(Path(self._tmp.name))
+        else:
+            digest = self.sha256.hexdigest()
+
+        if self.blob_store is not None:
+            _target_path(self._root, str(self.blob_store.path_for(digest, ext)))
+            file_path = self.blob_store.put(self._tmp, digest, ext, self.size)
+        else:
+            name = f"{uuid.uuid4()}{ext}"
+            if self._root_checked:
+                file_path = self._root / name
+            else:
+                file_path = _target_path(self._root, name)
+            os.fsync(self._tmp.fileno())
+            self._tmp.close()
+            os.replace(self._tmp.name, file_path)
+        self._tmp = None
+        self.saved = SavedFile(file_path, self.size, self.mime_type, digest)
+        return file_path
+
+    def close(self) -> None:
+        """Закрывает файл, оставляя его для следующей части загрузки."""
+        if self._tmp is not None:
+            self._tmp.close()
+            self._tmp = None
+
+    def abort(self) -> None:
+        """Удаляет временный файл незавершенной загрузки."""
+        if self._tmp is not None:
+            self._tmp.close()
+            Path(self._tmp.name).unlink(missing_ok=True)
+            self._tmp = None
+
+    def __enter__(self) -> "StreamingUpload":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.abort()
+
+
+def secure_save(
+    upload_dir: Path, data: bytes, blob_store: Optional[BlobStore] = None
+) -> Path:
+    """
+    Безопасно сохраняет файл, выполняя все необходимые проверки.
+    Возвращает путь к сохраненному файлу.
+    """
+    with StreamingUpload(upload_dir, blob_store=blob_store) as upload:
+        upload.write(data)
+        return upload.commit()
+
+
+class TooManyFiles(ValueError):
+    def __init__(self, max_files: int) -> None:
+        super().__init__(f"At most {max_files} files per request")
+
+
+class ReceivedFile(NamedTuple):
+    """Файл из multipart-запроса: незавершенная загрузка или ее ошибка."""
+
+    part: Part
+    upload: Optional[StreamingUpload]
+    error: Optional[str]
+
+
+async def receive_uploads(
+    events: AsyncIterator[PartEvent],
+    field: str,
+    upload_dir: Path,
+    executor: BoundedExecutor,
+    blob_store: Optional[BlobStore] = None,
+    root: Optional[Path] = None,
+    max_files: int = 1,
+    fail_fast: bool = True,
+) -> List[ReceivedFile]:
+    """
+    Пишет файлы поля field из потока multipart во временные файлы по мере
+    чтения тела, держа в памяти только текущий кусок. Сигнатура проверяется
+    по первым байтам файла, MAX_FILE_SIZE — по ходу записи.
+    С fail_fast первая ошибка файла прерывает чтение тела; иначе она попадает
+    в результат этого файла, а остаток его содержимого пропускается.
+    Вызывать внутри executor.slot(); опубликовать загрузки — publish_upload().
+    При исключении временные файлы удаляются.
+    """
+    received: List[ReceivedFile] = []
+    current: Optional[StreamingUpload] = None
+    try:
+        async for kind, payload in events:
+            if kind == "part":
+                current = None
+                if payload.field != field or payload.filename is None:
+                    continue
+                if len(received) == max_files:
+                    raise TooManyFiles(max_files)
+                current = StreamingUpload(upload_dir, blob_store=blob_store, root=root)
+                received.append(ReceivedFile(payload, current, None))
+            elif current is not None:
+                try:
+                    await executor.run(current.write, payload)
+                except ValueError as e:
+                    await executor.run(current.abort)
+                    if fail_fast:
+                        raise
+                    received[-1] = ReceivedFile(received[-1].part, None, str(e))
+                    current = None
+    except BaseException:
+        for file in received:
+            if file.upload is not None:
+                await executor.run(file.upload.abort)
+        raise
+    return received
+
+
+async def publish_upload(
+    upload: StreamingUpload, executor: BoundedExecutor
+) -> SavedFile:
+    """Завершает загрузку из receive_uploads(); при ошибке удаляет временный файл."""
+    try:
+        await executor.run(upload.commit)
+        return upload.saved
+    finally:
+        await executor.run(upload.abort)
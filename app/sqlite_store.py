@@ -0,0 +1,425 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .models import Retro, RetroItem
+from .repository import ItemRepository, RetroChange, RetroRepository, RevisionConflict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS retros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_date TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_retros_session_date ON retros (session_date, id);
+CREATE TABLE IF NOT EXISTS retro_items (
+    retro_id INTEGER NOT NULL REFERENCES retros (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    what_went_well TEXT NOT NULL,
+    to_improve TEXT NOT NULL,
+    actions TEXT NOT NULL,
+    PRIMARY KEY (retro_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+-- Ревизии удалений и последней очистки: по ним подписчики других воркеров
+-- догоняют записи, о которых им не пришло событий (changes_since).
+CREATE TABLE IF NOT EXISTS retro_deletions (
+    id INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_retro_deletions_revision ON retro_deletions (revision);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('cleared', 0);
+"""
+
+# Диапазон INTEGER в SQLite. Id вне его sqlite3 не может передать в запрос
+# (OverflowError), а в таблицах таких строк нет: такой id просто не найден.
+_MIN_ROW_ID, _MAX_ROW_ID = -(1 << 63), (1 << 63) - 1
+
+
+def _storable(row_id: int) -> bool:
+    return _MIN_ROW_ID <= row_id <= _MAX_ROW_ID
+
+
+# Запросы — константы, чтобы sqlite3 переиспользовал подготовленные выражения
+# из кэша соединения (cached_statements) вместо повторного разбора SQL.
+_INSERT_RETRO = "INSERT INTO retros (session_date, revision) VALUES (?, ?)"
+_UPDATE_RETRO = "UPDATE retros SET session_date = ?, revision = ? WHERE id = ?"
+_DELETE_RETRO = "DELETE FROM retros WHERE id = ?"
+_SELECT_REVISION = "SELECT revision FROM retros WHERE id = ?"
+_SELECT_VERSION = "SELECT value FROM meta WHERE key = 'version'"
+_SELECT_CLEARED = "SELECT value FROM meta WHERE key = 'cleared'"
+_SET_CLEARED = "UPDATE meta SET value = ? WHERE key = 'cleared'"
+_INSERT_DELETION = "INSERT OR REPLACE INTO retro_deletions (id, revision) VALUES (?, ?)"
+_SELECT_CHANGED = (
+    "SELECT id, session_date, revision FROM retros WHERE revision > ? "
+    "ORDER BY revision LIMIT ?"
+)
+_SELECT_DELETED = (
+    "SELECT id, revision FROM retro_deletions WHERE revision > ? "
+    "ORDER BY revision LIMIT ?"
+)
+_BUMP_VERSION = (
+    "UPDATE meta SET value = value + ? WHERE key = 'version' RETURNING value"
+)
+_SELECT_RETRO = "SELECT id, session_date FROM retros WHERE id = ?"
+_COUNT_RETROS = "SELECT COUNT(*) FROM retros"
+_INSERT_ITEM = (
+    "INSERT INTO retro_items (retro_id, position, what_went_well, to_improve, actions) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_DELETE_ITEMS = "DELETE FROM retro_items WHERE retro_id = ?"
+_SELECT_ITEMS = (
+    "SELECT what_went_well, to_improve, actions FROM retro_items "
+    "WHERE retro_id = ? ORDER BY position"
+)
+_SELECT_RANGE = (
+    "SELECT id, session_date FROM retros "
+    "WHERE session_date >= ? AND session_date <= ? AND (session_date, id) > (?, ?) "
+    "ORDER BY session_date, id LIMIT ?"
+)
+_INSERT_DEMO_ITEM = "INSERT INTO items (name) VALUES (?)"
+_SELECT_DEMO_ITEM = "SELECT id, name FROM items WHERE id = ?"
+
+_MIN_KEY = ("", 0)
+_MAX_DATE = "9999-12-31"
+
+
+class SQLiteDatabase:
+    """
+    Файл SQLite в режиме WAL с ограниченным пулом соединений.
+
+    WAL позволяет нескольким процессам (воркерам uvicorn) читать параллельно
+    с единственным писателем; busy_timeout сглаживает конкуренцию за запись.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(
+            maxsize=pool_size
+        )
+        self._slots = threading.BoundedSemaphore(pool_size)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(retros)")}
+        if "revision" not in columns:
+            conn.execute(
+                "ALTER TABLE retros ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+            )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_retros_revision ON retros (revision)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Берет соединение из пула, создавая его лениво, пока пул не заполнен."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("SQLite connection pool exhausted")
+        try:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._pool.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция на запись: BEGIN IMMEDIATE сразу берет write-lock."""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SQLiteRetroRepository(RetroRepository):
+    """Хранилище ретро в SQLite; пункты ретро лежат в дочерней таблице retro_items."""
+
+    def __init__(self, db: SQLiteDatabase, batch_size: int = 500) -> None:
+        super().__init__()
+        self.db = db
+        self.batch_size = batch_size
+
+    @property
+    def version(self) -> int:
+        with self.db.connection() as conn:
+            return conn.execute(_SELECT_VERSION).fetchone()[0]
+
+    def revision(self, retro_id: int) -> Optional[int]:
+        if not _storable(retro_id):
+            return None
+        with self.db.connection() as conn:
+            row = conn.execute(_SELECT_REVISION, (retro_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def create_with_revision(
+        self, session_date: date, items: List[RetroItem]
+    ) -> Tuple[Retro, int]:
+        with self.db.transaction() as conn:
+            revision = self._bump(conn)
+            cur = conn.execute(_INSERT_RETRO, (session_date.isoformat(), revision))
+            retro_id = cur.lastrowid
+            self._insert_items(conn, retro_id, items)
+        retro = Retro(id=retro_id, session_date=session_date, items=items)
+        self._notify(None, retro, revision)
+        return retro, revision
+
+    def create_many(
+        self, records: Iterable[Tuple[date, List[RetroItem]]]
+    ) -> List[Retro]:
+        records = list(records)
+        if not records:
+            return []
+        created = []
+        with self.db.transaction() as conn:
+            revision = self._bump(conn, len(records)) - len(records)
+            for session_date, items in records:
+                revision += 1
+                retro_id = conn.execute(
+                    _INSERT_RETRO, (session_date.isoformat(), revision)
+                ).lastrowid
+                self._insert_items(conn, retro_id, items)
+                created.append(
+                    (
+                        Retro(id=retro_id, session_date=session_date, items=items),
+                        revision,
+                    )
+                )
+        for retro, revision in created:
+            self._notify(None, retro, revision)
+        return [retro for retro, _ in created]
+
+    def get(self, retro_id: int) -> Optional[Retro]:
+        if not _storable(retro_id):
+            return None
+        with self.db.connection() as conn:
+            return self._load(conn, retro_id)
+
+    def update_with_revision(
+        self,
+        retro_id: int,
+        session_date: date,
+        items: List[RetroItem],
+        expected_revision: Optional[int] = None,
+    ) -> Optional[Tuple[Retro, int]]:
+        if not _storable(retro_id):
+            return None
+        with self.db.transaction() as conn:
+            row = conn.execute(_SELECT_REVISION, (retro_id,)).fetchone()
+            if row is None:
+                return None
+            if expected_revision is not None and row[0] != expected_revision:
+                raise RevisionConflict(retro_id)
+            # Старая версия нужна только подписчикам (например, для декремента счетчиков).
+            old = self._load(conn, retro_id) if self._listeners else None
+            revision = self._bump(conn)
+            conn.execute(_UPDATE_RETRO, (session_date.isoformat(), revision, retro_id))
+            conn.execute(_DELETE_ITEMS, (retro_id,))
+            self._insert_items(conn, retro_id, items)
+        retro = Retro(id=retro_id, session_date=session_date, items=items)
+        self._notify(old, retro, revision)
+        return retro, revision
+
+    def delete(self, retro_id: int) -> Optional[Retro]:
+        if not _storable(retro_id):
+            return None
+        with self.db.transaction() as conn:
+            retro = self._load(conn, retro_id)
+            if retro is None:
+                return None
+            conn.execute(_DELETE_RETRO, (retro_id,))
+            revision = self._bump(conn)
+            conn.execute(_INSERT_DELETION, (retro_id, revision))
+        self._notify(retro, None, revision)
+        return retro
+
+    def changes_since(self, version: int) -> Optional[Iterator[RetroChange]]:
+        with self.db.connection() as conn:
+            if conn.execute(_SELECT_CLEARED).fetchone()[0] > version:
+                return None
+        return self._changes(version)
+
+    def _changes(self, version: int) -> Iterator[RetroChange]:
+        # Созданные и измененные ретро, затем удаленные: id не переиспользуются
+        # (AUTOINCREMENT), поэтому порядок между ними не важен.
+        after = version
+        while True:
+            with self.db.connection() as conn:
+                rows = conn.execute(
+                    _SELECT_CHANGED, (after, self.batch_size)
+                ).fetchall()
+                items = self._load_items(conn, [row[0] for row in rows])
+            for row in rows:
+                retro = self._build(row, items.get(row[0], []))
+                yield RetroChange(row[0], retro, row[2])
+            if len(rows) < self.batch_size:
+                break
+            after = rows[-1][2]
+        after = version
+        while True:
+            with self.db.connection() as conn:
+                rows = conn.execute(
+                    _SELECT_DELETED, (after, self.batch_size)
+                ).fetchall()
+            for retro_id, revision in rows:
+                yield RetroChange(retro_id, None, revision)
+            if len(rows) < self.batch_size:
+                return
+            after = rows[-1][1]
+
+    def range(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        after: Optional[Tuple[date, int]] = None,
+    ) -> Iterator[Retro]:
+        # Читаем пачками по keyset-курсору: соединение не удерживается,
+        # пока потребитель (например, потоковый ответ) обрабатывает выдачу.
+        low = from_date.isoformat() if from_date else ""
+        high = to_date.isoformat() if to_date else _MAX_DATE
+        key = (after[0].isoformat(), after[1]) if after else _MIN_KEY
+        while True:
+            with self.db.connection() as conn:
+                rows = conn.execute(
+                    _SELECT_RANGE, (low, high, *key, self.batch_size)
+                ).fetchall()
+                items = self._load_items(conn, [row[0] for row in rows])
+            for row in rows:
+                yield self._build(row, items.get(row[0], []))
+            if len(rows) < self.batch_size:
+                return
+            key = (rows[-1][1], rows[-1][0])
+
+    def clear(self) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM retro_items")
+            conn.execute("DELETE FROM retros")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'retros'")
+            conn.execute("DELETE FROM retro_deletions")
+            conn.execute(_SET_CLEARED, (self._bump(conn),))
+        self._notify_clear()
+
+    def __len__(self) -> int:
+        with self.db.connection() as conn:
+            return conn.execute(_COUNT_RETROS).fetchone()[0]
+
+    def _load(self, conn: sqlite3.Connection, retro_id: int) -> Optional[Retro]:
+        row = conn.execute(_SELECT_RETRO, (retro_id,)).fetchone()
+        if row is None:
+            return None
+        return self._build(row, conn.execute(_SELECT_ITEMS, (retro_id,)).fetchall())
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, count: int = 1) -> int:
+        """Увеличивает версию хранилища внутри текущей транзакции."""
+        return conn.execute(_BUMP_VERSION, (count,)).fetchall()[0][0]
+
+    @staticmethod
+    def _insert_items(
+        conn: sqlite3.Connection, retro_id: int, items: List[RetroItem]
+    ) -> None:
+        conn.executemany(
+            _INSERT_ITEM,
+            (
+                (retro_id, pos, item.what_went_well, item.to_improve, item.actions)
+                for pos, item in enumerate(items)
+            ),
+        )
+
+    @staticmethod
+    def _load_items(
+        conn: sqlite3.Connection, retro_ids: Sequence[int]
+    ) -> Dict[int, list]:
+        if not retro_ids:
+            return {}
+        placeholders = ",".join("?" * len(retro_ids))
+        rows = conn.execute(
+            "SELECT retro_id, what_went_well, to_improve, actions FROM retro_items "
+            f"WHERE retro_id IN ({placeholders}) ORDER BY retro_id, position",
+            retro_ids,
+        )
+        items: Dict[int, list] = {}
+        for retro_id, *fields in rows:
+            items.setdefault(retro_id, []).append(fields)
+        return items
+
+    @staticmethod
+    def _build(row: Sequence, item_rows: Sequence[Sequence[str]]) -> Retro:
+        return Retro(
+            id=row[0],
+            session_date=date.fromisoformat(row[1]),
+            items=[
+                RetroItem(what_went_well=w, to_improve=t, actions=a)
+                for w, t, a in item_rows
+            ],
+        )
+
+
+class SQLiteItemRepository(ItemRepository):
+    """Хранилище демо-сущности /items в той же базе SQLite."""
+
+    def __init__(self, db: SQLiteDatabase) -> None:
+        self.db = db
+
+    def create(self, name: str) -> dict:
+        with self.db.transaction() as conn:
+            item_id = conn.execute(_INSERT_DEMO_ITEM, (name,)).lastrowid
+        return {"id": item_id, "name": name}
+
+    def get(self, item_id: int) -> Optional[dict]:
+        if not _storable(item_id):
+            return None
+        with self.db.connection() as conn:
+            row = conn.execute(_SELECT_DEMO_ITEM, (item_id,)).fetchone()
+        return None if row is None else {"id": row[0], "name": row[1]}
+
+    def clear(self) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'items'")
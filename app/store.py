@@ -0,0 +1,403 @@
+import itertools
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .models import MAX_RETRO_ID, Retro, RetroItem
+from .repository import DateKey, ItemRepository, RetroRepository, RevisionConflict
+
+# Ключ индекса дат — одно целое: порядковый номер даты в старших битах, id в
+# младших. Сортировка по нему совпадает с сортировкой по (session_date, id).
+_ID_BITS = MAX_RETRO_ID.bit_length()
+_ID_MASK = MAX_RETRO_ID
+
+
+def _date_key(ordinal: int, retro_id: int) -> int:
+    return (ordinal << _ID_BITS) | retro_id
+
+
+class _Record:
+    """
+    Компактная форма ретро в памяти: порядковый номер даты, ревизия и плоский
+    кортеж интернированных строк (what_went_well, to_improve, actions, ...).
+    Модели Pydantic из нее собираются только при выдаче наружу.
+    """
+
+    __slots__ = ("ordinal", "revision", "texts")
+
+    def __init__(self, ordinal: int, revision: int, texts: Tuple[str, ...]) -> None:
+        self.ordinal = ordinal
+        self.revision = revision
+        self.texts = texts
+
+    @classmethod
+    def of(cls, retro: Retro, revision: int) -> "_Record":
+        texts = []
+        for item in retro.items:
+            texts += (
+                sys.intern(item.what_went_well),
+                sys.intern(item.to_improve),
+                sys.intern(item.actions),
+            )
+        return cls(retro.session_date.toordinal(), revision, tuple(texts))
+
+    def to_retro(self, retro_id: int) -> Retro:
+        # Данные провалидированы при записи, поэтому модели собираются без
+        # повторной валидации.
+        texts = self.texts
+        items = [
+            RetroItem.model_construct(
+                what_went_well=texts[i], to_improve=texts[i + 1], actions=texts[i + 2]
+            )
+            for i in range(0, len(texts), 3)
+        ]
+        return Retro.model_construct(
+            id=retro_id, session_date=date.fromordinal(self.ordinal), items=items
+        )
+
+    def to_json(self, retro_id: int) -> dict:
+        """То же, что to_retro(retro_id).model_dump(mode="json"), без моделей."""
+        texts = self.texts
+        return {
+            "id": retro_id,
+            "session_date": date.fromordinal(self.ordinal).isoformat(),
+            "items": [
+                {
+                    "what_went_well": texts[i],
+                    "to_improve": texts[i + 1],
+                    "actions": texts[i + 2],
+                }
+                for i in range(0, len(texts), 3)
+            ],
+        }
+
+
+# Размер части снимка. Запись копирует только затронутые части и список
+# частей (n / _CHUNK ссылок), а не все хранилище.
+_CHUNK_BITS = 10
+_CHUNK = 1 << _CHUNK_BITS
+
+
+class _Snapshot(NamedTuple):
+    """
+    Неизменяемое состояние хранилища; после публикации не меняется.
+
+    Записи разбиты на словари по старшим битам id, индекс дат — на
+    отсортированные массивы длиной до 2 * _CHUNK; maxes хранит последний
+    ключ каждого массива для бинарного поиска.
+    """
+
+    shards: Dict[int, Dict[int, _Record]]
+    chunks: Tuple[array, ...]
+    maxes: array
+    size: int
+    version: int
+
+    def record(self, retro_id: int) -> Optional[_Record]:
+        shard = self.shards.get(retro_id >> _CHUNK_BITS)
+        return None if shard is None else shard.get(retro_id)
+
+    def records(self) -> Iterator[Tuple[int, _Record]]:
+        for shard in self.shards.values():
+            yield from shard.items()
+
+    def keys(self, lo: int, hi: Optional[int]) -> Iterator[int]:
+        """Ключи индекса дат в [lo, hi) по возрастанию."""
+        chunks = self.chunks
+        i = bisect_left(self.maxes, lo)
+        pos = bisect_left(chunks[i], lo) if i < len(chunks) else 0
+        for chunk in itertools.islice(chunks, i, None):
+            end = len(chunk) if hi is None else bisect_left(chunk, hi)
+            yield from itertools.islice(chunk, pos, end)
+            if end < len(chunk):
+                return
+            pos = 0
+
+
+_EMPTY = _Snapshot({}, (), array("q"), 0, 0)
+
+
+class _Change:
+    """
+    Правка снимка под блокировкой записи. Каждая затронутая часть копируется
+    один раз, остальные разделяются с опубликованным снимком.
+    """
+
+    def __init__(self, snapshot: _Snapshot) -> None:
+        self.shards = dict(snapshot.shards)
+        self.chunks = list(snapshot.chunks)
+        self.maxes = snapshot.maxes[:]
+        self.size = snapshot.size
+        # id частей, созданных этой правкой: их можно менять на месте.
+        self._own = set()
+
+    def put(self, retro_id: int, record: _Record) -> Optional[_Record]:
+        shard = self._shard(retro_id)
+        old = shard.get(retro_id)
+        shard[retro_id] = record
+        if old is None:
+            self.size += 1
+            self._insert(_date_key(record.ordinal, retro_id))
+        elif old.ordinal != record.ordinal:
+            self._remove(_date_key(old.ordinal, retro_id))
+            self._insert(_date_key(record.ordinal, retro_id))
+        return old
+
+    def pop(self, retro_id: int) -> _Record:
+        shard = self._shard(retro_id)
+        record = shard.pop(retro_id)
+        if not shard:
+            del self.shards[retro_id >> _CHUNK_BITS]
+        self.size -= 1
+        self._remove(_date_key(record.ordinal, retro_id))
+        return record
+
+    def publish(self, version: int) -> _Snapshot:
+        return _Snapshot(
+            self.shards, tuple(self.chunks), self.maxes, self.size, version
+        )
+
+    def _shard(self, retro_id: int) -> Dict[int, _Record]:
+        key = retro_id >> _CHUNK_BITS
+        shard = self.shards.get(key)
+        if shard is None or id(shard) not in self._own:
+            shard = {} if shard is None else dict(shard)
+            self.shards[key] = shard
+            self._own.add(id(shard))
+        return shard
+
+    def _chunk(self, i: int) -> array:
+        chunk = self.chunks[i]
+        if id(chunk) not in self._own:
+            chunk = self.chunks[i] = chunk[:]
+            self._own.add(id(chunk))
+        return chunk
+
+    def _insert(self, key: int) -> None:
+        if not self.chunks:
+            self.chunks.append(array("q"))
+            self.maxes.append(key)
+        i = min(bisect_left(self.maxes, key), len(self.chunks) - 1)
+        chunk = self._chunk(i)
+        insort(chunk, key)
+        self.maxes[i] = chunk[-1]
+        if len(chunk) > 2 * _CHUNK:
+            tail = chunk[_CHUNK:]
+            del chunk[_CHUNK:]
+            self._own.add(id(tail))
+            self.chunks.insert(i + 1, tail)
+            self.maxes[i] = chunk[-1]
+            self.maxes.insert(i + 1, tail[-1])
+
+    def _remove(self, key: int) -> None:
+        i = bisect_left(self.maxes, key)
+        chunk = self._chunk(i)
+        del chunk[bisect_left(chunk, key)]
+        if chunk:
+            self.maxes[i] = chunk[-1]
+        else:
+            del self.chunks[i]
+            del self.maxes[i]
+
+
+class RetroStore(RetroRepository):
+    """
+    In-memory хранилище ретро с индексами.
+
+    Поиск по id — O(1) через словарь, выборка по диапазону дат —
+    O(log n + k) через отсортированный индекс (session_date, id).
+
+    Синхронные маршруты выполняются в threadpool, поэтому запись идет под
+    блокировкой и публикует новый снимок одним присваиванием; снимок разбит
+    на части (см. _Snapshot), и запись копирует только те, что меняет.
+    Чтения берут текущий снимок без блокировок и не ждут писателей;
+    id выдает атомарный монотонный счетчик.
+
+    Ретро хранятся не моделями Pydantic, а записями _Record, индекс дат —
+    массивами int64 (8 байт на ретро); модели собираются при чтении.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._snapshot = _EMPTY
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        # Вызывается после записи вне блокировки: журнал ждет в нем fsync.
+        self.on_commit: Optional[Callable[[], None]] = None
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def revision(self, retro_id: int) -> Optional[int]:
+        record = self._snapshot.record(retro_id)
+        return None if record is None else record.revision
+
+    def create_with_revision(
+        self, session_date: date, items: List[RetroItem]
+    ) -> Tuple[Retro, int]:
+        return self._create_many([(session_date, items)])[0]
+
+    def create_many(
+        self, records: Iterable[Tuple[date, List[RetroItem]]]
+    ) -> List[Retro]:
+        return [retro for retro, _ in self._create_many(records)]
+
+    def _create_many(
+        self, records: Iterable[Tuple[date, List[RetroItem]]]
+    ) -> List[Tuple[Retro, int]]:
+        retros = [
+            Retro(id=next(self._ids), session_date=session_date, items=items)
+            for session_date, items in records
+        ]
+        with self._write_lock:
+            change = _Change(self._snapshot)
+            version = self._snapshot.version
+            created = []
+            for retro in retros:
+                version += 1
+                change.put(retro.id, _Record.of(retro, version))
+                created.append((retro, version))
+            self._snapshot = change.publish(version)
+            for retro, revision in created:
+                self._notify(None, retro, revision)
+        self._committed()
+        return created
+
+    def get(self, retro_id: int) -> Optional[Retro]:
+        record = self._snapshot.record(retro_id)
+        return None if record is None else record.to_retro(retro_id)
+
+    def update_with_revision(
+        self,
+        retro_id: int,
+        session_date: date,
+        items: List[RetroItem],
+        expected_revision: Optional[int] = None,
+    ) -> Optional[Tuple[Retro, int]]:
+        retro = Retro(id=retro_id, session_date=session_date, items=items)
+        with self._write_lock:
+            snapshot = self._snapshot
+            old = snapshot.record(retro_id)
+            if old is None:
+                return None
+            if expected_revision is not None and old.revision != expected_revision:
+                raise RevisionConflict(retro_id)
+            version = snapshot.version + 1
+            change = _Change(snapshot)
+            change.put(retro_id, _Record.of(retro, version))
+            self._snapshot = change.publish(version)
+            self._notify(old.to_retro(retro_id), retro, version)
+        self._committed()
+        return retro, version
+
+    def delete(self, retro_id: int) -> Optional[Retro]:
+        with self._write_lock:
+            snapshot = self._snapshot
+            if snapshot.record(retro_id) is None:
+                return None
+            change = _Change(snapshot)
+            retro = change.pop(retro_id).to_retro(retro_id)
+            self._snapshot = change.publish(snapshot.version + 1)
+            self._notify(retro, None, snapshot.version + 1)
+        self._committed()
+        return retro
+
+    def range(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        after: Optional[DateKey] = None,
+    ) -> Iterator[Retro]:
+        snapshot = self._snapshot
+        lo = 0 if from_date is None else from_date.toordinal() << _ID_BITS
+        if after is not None:
+            lo = max(lo, _date_key(after[0].toordinal(), after[1]) + 1)
+        hi = None if to_date is None else (to_date.toordinal() + 1) << _ID_BITS
+        for key in snapshot.keys(lo, hi):
+            retro_id = key & _ID_MASK
+            yield snapshot.record(retro_id).to_retro(retro_id)
+
+    def clear(self) -> None:
+        with self._write_lock:
+            self._snapshot = _EMPTY._replace(version=self._snapshot.version + 1)
+            self._ids = itertools.count(1)
+            self._notify_clear()
+        self._committed()
+
+    def export(self) -> Tuple[Iterator[Tuple[dict, int]], int]:
+        """
+        Согласованное состояние: (записи [(ретро в JSON-виде, ревизия)], версия).
+        Берется только ссылка на неизменяемый снимок, поэтому вызов стоит O(1);
+        записи собираются из него лениво, при обходе.
+        """
+        snapshot = self._snapshot
+        entries = (
+            (record.to_json(retro_id), record.revision)
+            for retro_id, record in snapshot.records()
+        )
+        return entries, snapshot.version
+
+    def restore(
+        self, entries: Iterable[Tuple[Retro, int]], version: int, last_id: int
+    ) -> None:
+        """Загружает состояние из снимка/журнала без уведомления слушателей."""
+        shards: Dict[int, Dict[int, _Record]] = {}
+        keys = []
+        for retro, revision in entries:
+            record = _Record.of(retro, revision)
+            shards.setdefault(retro.id >> _CHUNK_BITS, {})[retro.id] = record
+            keys.append(_date_key(record.ordinal, retro.id))
+        keys.sort()
+        chunks = tuple(
+            array("q", keys[i : i + _CHUNK]) for i in range(0, len(keys), _CHUNK)
+        )
+        maxes = array("q", (chunk[-1] for chunk in chunks))
+        size = sum(len(shard) for shard in shards.values())
+        with self._write_lock:
+            self._snapshot = _Snapshot(shards, chunks, maxes, size, version)
+            self._ids = itertools.count(last_id + 1)
+
+    def _committed(self) -> None:
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def __contains__(self, retro_id: object) -> bool:
+        return isinstance(retro_id, int) and self._snapshot.record(retro_id) is not None
+
+    def __len__(self) -> int:
+        return self._snapshot.size
+
+
+class ItemStore(ItemRepository):
+    """In-memory хранилище демо-сущности /items."""
+
+    def __init__(self) -> None:
+        self._by_id: Dict[int, dict] = {}
+        self._ids = itertools.count(1)
+        self.on_create: Optional[Callable[[dict], None]] = None
+
+    def create(self, name: str) -> dict:
+        # next() у itertools.count атомарен, вставка в dict — тоже.
+        item = {"id": next(self._ids), "name": name}
+        self._by_id[item["id"]] = item
+        if self.on_create is not None:
+            self.on_create(item)
+        return item
+
+    def export(self) -> List[dict]:
+        return list(self._by_id.copy().values())
+
+    def restore(self, items: Iterable[dict], last_id: int) -> None:
+        self._by_id = {item["id"]: item for item in items}
+        self._ids = itertools.count(last_id + 1)
+
+    def get(self, item_id: int) -> Optional[dict]:
+        return self._by_id.get(item_id)
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._ids = itertools.count(1)
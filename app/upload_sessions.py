@@ -0,0 +1,291 @@
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import NamedTuple, Optional, Set
+
+import orjson
+
+from .blob_store import BlobStore
+from .secure_upload import MAX_FILE_SIZE, SavedFile, StreamingUpload
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR_NAME = ".sessions"
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class SessionNotFound(LookupError):
+    """Сессии нет: неверный id, истек срок или загрузка уже завершена."""
+
+
+class SessionBusy(Exception):
+    """В сессию уже пишет другой запрос."""
+
+
+class OffsetMismatch(Exception):
+    """Клиент прислал часть не с того смещения, на котором остановилась сессия."""
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(f"Expected Upload-Offset {offset}")
+        self.offset = offset
+
+
+class UploadSession(NamedTuple):
+    id: str
+    retro_id: int
+    length: int
+    offset: int
+    expires_at: float
+
+
+class SessionWrite:
+    """
+    Запись одной части (PATCH) в сессию. Держит эксклюзивную блокировку файла
+    сессии, поэтому параллельный PATCH той же сессии в любом воркере получит
+    SessionBusy. Методы блокирующие — вызывать в executor.
+    """
+
+    def __init__(self, sessions: "UploadSessions", session: UploadSession) -> None:
+        self.sessions = sessions
+        self.session = session
+        try:
+            self._lock_fd = os.open(sessions.part_path(session.id), os.O_RDONLY)
+        except FileNotFoundError:
+            raise SessionNotFound(session.id)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            if os.fstat(self._lock_fd).st_nlink == 0:
+                # Сессию удалили между открытием файла и блокировкой.
+                raise SessionNotFound(session.id)
+            self.upload = StreamingUpload(
+                sessions.upload_dir,
+                max_size=session.length,
+                blob_store=sessions.blob_store,
+                part=sessions.part_path(session.id),
+            )
+        except BlockingIOError:
+            self._release()
+            raise SessionBusy(session.id)
+        except BaseException:
+            self._release()
+            raise
+
+    @property
+    def offset(self) -> int:
+        return self.upload.size
+
+    @property
+    def complete(self) -> bool:
+        return self.upload.size == self.session.length
+
+    def write(self, chunk: bytes) -> None:
+        """Дописывает байты; сигнатура и лимит размера проверяются сразу."""
+        self.upload.write(chunk)
+
+    def finish(self) -> Optional[SavedFile]:
+        """
+        Завершает часть. Если получены все байты, выполняет финальные
+        проверки и атомарно публикует файл; иначе продлевает срок сессии.
+        """
+        try:
+            if self.complete:
+                try:
+                    self.upload.commit()
+                except ValueError:
+                    self.upload.close()
+                    raise
+                finally:
+                    self.sessions._remove(self.session.id)
+                return self.upload.saved
+            self.upload.close()
+            self.session = self.sessions._touch(self.session, self.upload.size)
+            return None
+        finally:
+            self._release()
+
+    def fail(self) -> None:
+        """Отменяет сессию целиком: файл не прошел проверки."""
+        try:
+            self.upload.close()
+            self.sessions._remove(self.session.id)
+        finally:
+            self._release()
+
+    def abandon(self) -> None:
+        """Оставляет записанное (обрыв соединения): клиент продолжит с offset."""
+        try:
+            self.upload.close()
+            self.session = self.sessions._touch(self.session, self.upload.size)
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if self._lock_fd >= 0:
+            os.close(self._lock_fd)
+            self._lock_fd = -1
+
+
+class UploadSessions:
+    """
+    Возобновляемые загрузки вложений.
+
+    Сессия — это файл <id>.part в upload_dir/.sessions, куда дописываются
+    части, и <id>.json с ретро, объявленной длиной и сроком жизни. Состояние
+    целиком на диске, поэтому части могут приходить в разные воркеры и
+    переживают перезапуск. Проверки те же, что у обычной загрузки
+    (StreamingUpload): сигнатура — как только пришли первые байты, размер —
+    по мере записи, конец JPEG и атомарная публикация — на последней части.
+    Брошенные сессии удаляет фоновый поток после ttl без активности.
+    """
+
+    def __init__(
+        self,
+        upload_dir: Path,
+        ttl: float = 3600.0,
+        max_size: int = MAX_FILE_SIZE,
+        blob_store: Optional[BlobStore] = None,
+    ) -> None:
+        self.upload_dir = upload_dir
+        self.directory = upload_dir / SESSIONS_DIR_NAME
+        self.directory.mkdir(exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.blob_store = blob_store
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def part_path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.part"
+
+    def _meta_path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.json"
+
+    def create(self, retro_id: int, length: int) -> UploadSession:
+        if length <= 0:
+            raise ValueError("Upload-Length must be positive")
+        if length > self.max_size:
+            raise ValueError("File is too large")
+        session = UploadSession(
+            uuid.uuid4().hex, retro_id, length, 0, time.time() + self.ttl
+        )
+        # Сначала метаданные: sweep считает сессию без них осиротевшей.
+        self._write_meta(session)
+        self.part_path(session.id).touch(exist_ok=False)
+        return session
+
+    def get(self, session_id: str) -> UploadSession:
+        if not _SESSION_ID.match(session_id):
+            raise SessionNotFound(session_id)
+        try:
+            meta = orjson.loads(self._meta_path(session_id).read_bytes())
+            offset = self.part_path(session_id).stat().st_size
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            raise SessionNotFound(session_id)
+        if meta["expires_at"] < time.time():
+            raise SessionNotFound(session_id)
+        return UploadSession(
+            session_id, meta["retro_id"], meta["length"], offset, meta["expires_at"]
+        )
+
+    def begin_write(self, session_id: str, offset: int) -> SessionWrite:
+        """Открывает запись части, начиная с offset."""
+        write = SessionWrite(self, self.get(session_id))
+        if write.offset != offset:
+            write.abandon()
+            raise OffsetMismatch(write.offset)
+        return write
+
+    def cancel(self, session_id: str) -> None:
+        """Удаляет сессию. Если в нее сейчас пишут, бросает SessionBusy."""
+        self.get(session_id)
+        self._remove_locked(session_id)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Удаляет истекшие и осиротевшие сессии. Возвращает их число."""
+        now = time.time() if now is None else now
+        removed = 0
+        for session_id in self._session_ids():
+            try:
+                meta = orjson.loads(self._meta_path(session_id).read_bytes())
+                expired = meta["expires_at"] < now
+            except (FileNotFoundError, orjson.JSONDecodeError):
+                expired = True
+            if not expired:
+                continue
+            try:
+                self._remove_locked(session_id)
+                removed += 1
+            except (SessionNotFound, SessionBusy):
+                pass
+        return removed
+
+    def start(self, interval: float) -> None:
+        """Запускает фоновую очистку раз в interval секунд."""
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="upload-sessions", daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(
+                        "Removed expired upload sessions", extra={"count": removed}
+                    )
+            except OSError:
+                logger.exception("Upload session sweep failed")
+
+    def _session_ids(self) -> Set[str]:
+        return {
+            path.stem
+            for path in self.directory.iterdir()
+            if path.suffix in (".part", ".json") and _SESSION_ID.match(path.stem)
+        }
+
+    def _touch(self, session: UploadSession, offset: int) -> UploadSession:
+        session = session._replace(offset=offset, expires_at=time.time() + self.ttl)
+        self._write_meta(session)
+        return session
+
+    def _write_meta(self, session: UploadSession) -> None:
+        meta = {
+            "retro_id": session.retro_id,
+            "length": session.length,
+            "expires_at": session.expires_at,
+        }
+        tmp = self.directory / f".{session.id}.json.tmp"
+        tmp.write_bytes(orjson.dumps(meta))
+        os.replace(tmp, self._meta_path(session.id))
+
+    def _remove(self, session_id: str) -> None:
+        self._meta_path(session_id).unlink(missing_ok=True)
+        self.part_path(session_id).unlink(missing_ok=True)
+
+    def _remove_locked(self, session_id: str) -> None:
+        """Удаляет сессию под блокировкой файла части, как SessionWrite."""
+        try:
+            fd = os.open(self.part_path(session_id), os.O_RDONLY)
+        except FileNotFoundError:
+            self._meta_path(session_id).unlink(missing_ok=True)
+            raise SessionNotFound(session_id)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SessionBusy(session_id)
+        else:
+            self._remove(session_id)
+        finally:
+            os.close(fd)
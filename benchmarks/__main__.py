@@ -0,0 +1,100 @@
+"""
+Набор бенчмарков: микробенчмарки, память хранилища и нагрузка по смесям запросов.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --baseline results.json --threshold 0.2 --store-sizes 1000,100000
+
+С --baseline результаты сравниваются с прошлым прогоном, и при ухудшении
+больше чем на threshold процесс завершается с кодом 1.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Dict, List
+
+from . import load, memory, micro
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], threshold: float
+) -> List[str]:
+    """
+    Список регрессий: метрики, ухудшившиеся больше чем на threshold.
+    При нулевом базовом значении регрессия — любое ухудшение.
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        worse = current["value"] - previous["value"]
+        if current["better"] == "higher":
+            worse = -worse
+        if previous["value"]:
+            change = worse / abs(previous["value"])
+        else:
+            change = float("inf") if worse > 0 else 0.0
+        if change > threshold:
+            regressions.append(
+                f"{name}: {previous['value']:.3f} -> {current['value']:.3f} "
+                f"{current['unit']} ({change:+.0%})"
+            )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--suite", choices=["all", "micro", "memory", "load"], default="all"
+    )
+    parser.add_argument(
+        "--store-sizes", default="1000", help="например 1000,100000,1000000"
+    )
+    parser.add_argument("--mixes", default=",".join(load.MIXES))
+    parser.add_argument("--duration", type=float, default=5.0, help="секунд на смесь")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="множитель итераций micro"
+    )
+    parser.add_argument(
+        "--memory-retros", type=int, default=10000, help="ретро в замере памяти"
+    )
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results: Dict[str, dict] = {}
+    if args.suite in ("all", "micro"):
+        results.update(micro.run(args.scale))
+    if args.suite in ("all", "memory"):
+        results.update(memory.run(args.memory_retros))
+    if args.suite in ("all", "load"):
+        sizes = [int(size) for size in args.store_sizes.split(",")]
+        mixes = args.mixes.split(",")
+        results.update(load.run(sizes, mixes, args.duration, args.concurrency))
+
+    for name, result in sorted(results.items()):
+        print(f"{name:55} {result['value']:12.3f} {result['unit']}")
+    with open(args.output, "w") as f:
+        meta = {"python": platform.python_version(), "timestamp": time.time()}
+        json.dump({"meta": meta, "results": results}, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:", *regressions, sep="\n  ")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
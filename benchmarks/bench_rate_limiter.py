@@ -0,0 +1,45 @@
+"""
+Сравнение хранилищ лимитов: memory:// (limits.MemoryStorage) и shm://.
+
+    python -m benchmarks.bench_rate_limiter --hits 100000 --keys 1000
+"""
+
+import argparse
+import tempfile
+import time
+
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import STRATEGIES
+
+from app.rate_limit_storage import SharedMemoryStorage
+
+
+def bench(storage, strategy: str, hits: int, keys: int) -> float:
+    limiter = STRATEGIES[strategy](storage)
+    item = parse("1000000/minute")
+    identifiers = [f"10.0.{i // 256}.{i % 256}" for i in range(keys)]
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, identifiers[i % keys])
+    return (time.perf_counter() - started) / hits * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hits", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy in ("fixed-window", "sliding-window-counter"):
+            for name, storage in [
+                ("memory", MemoryStorage()),
+                ("shm", SharedMemoryStorage(f"shm://{tmp}/{strategy}")),
+            ]:
+                per_hit = bench(storage, strategy, args.hits, args.keys)
+                print(f"{strategy:24} {name:8} {per_hit:8.2f} us/hit")
+
+
+if __name__ == "__main__":
+    main()
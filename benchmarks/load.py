@@ -0,0 +1,184 @@
+"""
+Нагрузочный генератор: асинхронные клиенты httpx поверх ASGITransport
+гоняют смесь запросов по приложению с заранее заполненным хранилищем.
+"""
+
+import asyncio
+import logging
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import httpx
+
+from app.logs import access_logger
+from app.models import RetroItem
+from app.rate_limit import CostLimiter
+
+from .micro import PNG_100K
+
+ITEM = RetroItem(
+    what_went_well="Релиз прошел без откатов",
+    to_improve="Flaky tests in CI",
+    actions="Добавить ретраи",
+)
+NEW_RETRO = {"session_date": "2024-01-01", "items": [ITEM.model_dump()] * 3}
+
+# Смеси операций: имя -> [(операция, вес)].
+MIXES: Dict[str, List[Tuple[str, int]]] = {
+    "crud": [
+        ("get_retro", 50),
+        ("list_page", 20),
+        ("create_retro", 15),
+        ("update_retro", 10),
+        ("delete_retro", 5),
+    ],
+    "upload": [("upload_100k", 70), ("get_retro", 30)],
+}
+
+
+def prefill(store, size: int, batch: int = 10000) -> None:
+    store.clear()
+    start = date(2000, 1, 1)
+    for offset in range(0, size, batch):
+        records = [
+            (start + timedelta(days=i % 9000), [ITEM])
+            for i in range(offset, min(size, offset + batch))
+        ]
+        store.create_many(records)
+
+
+async def _operation(client: httpx.AsyncClient, name: str, max_id: int) -> int:
+    retro_id = random.randint(1, max_id)
+    if name == "get_retro":
+        response = await client.get(f"/retros/{retro_id}")
+    elif name == "list_page":
+        response = await client.get("/retros", params={"limit": 100})
+    elif name == "create_retro":
+        response = await client.post("/retros", json=NEW_RETRO)
+    elif name == "update_retro":
+        response = await client.put(f"/retros/{retro_id}", json=NEW_RETRO)
+    elif name == "delete_retro":
+        response = await client.delete(f"/retros/{retro_id}")
+    else:
+        files = {"file": ("bench.png", PNG_100K, "image/png")}
+        response = await client.post(f"/retros/{retro_id}/attachments", files=files)
+    return response.status_code
+
+
+async def _run_mix(
+    app, mix: str, max_id: int, duration: float, concurrency: int
+) -> Dict[str, List[float]]:
+    names, weights = zip(*MIXES[mix])
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors = 0
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            status = await _operation(client, name, max_id)
+            latencies[name].append(time.perf_counter() - started)
+            # 404 — удаленный другим клиентом id, это ожидаемо.
+            errors += status >= 500
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    latencies["_errors"] = [errors]
+    return latencies
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@contextmanager
+def _temporary_uploads(main) -> Iterator[None]:
+    """
+    Открывает вложения приложения (blob store, сессии загрузок, индекс) во
+    временном каталоге и потом закрывает их: prefill и удаления бенчмарка не
+    трогают uploads/ и его индекс.
+    """
+    names = ("UPLOAD_DIR", "blob_store", "upload_sessions", "attachment_index")
+    originals = {name: getattr(main, name) for name in names}
+    directory = Path(tempfile.mkdtemp(prefix="bench-"))
+    main.open_uploads(directory)
+    try:
+        yield
+    finally:
+        main.close_uploads()
+        for name, value in originals.items():
+            setattr(main, name, value)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextmanager
+def _quiet_access_log() -> Iterator[None]:
+    """Строка access-лога на каждый запрос нагрузки — лишний вывод и время."""
+    level = access_logger.level
+    access_logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        access_logger.setLevel(level)
+
+
+def run(
+    store_sizes: List[int], mixes: List[str], duration: float, concurrency: int
+) -> Dict[str, dict]:
+    from app import main
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Бюджет стоимости не должен ограничивать сам бенчмарк.
+    main.app.state.cost_limiter = CostLimiter("1000000000/minute")
+    results: Dict[str, dict] = {}
+    with _temporary_uploads(main), _quiet_access_log():
+        try:
+            for size in store_sizes:
+                for mix in mixes:
+                    prefill(main._RETROS_DB, size)
+                    latencies = asyncio.run(
+                        _run_mix(main.app, mix, size, duration, concurrency)
+                    )
+                    results.update(
+                        _summarize(f"load.{mix}@{size}", latencies, duration)
+                    )
+        finally:
+            # Очистка внутри: ее запрос на удаление вложений получает
+            # временный индекс, а не индекс uploads/.
+            main._RETROS_DB.clear()
+    return results
+
+
+def _summarize(
+    prefix: str, latencies: Dict[str, List[float]], duration: float
+) -> Dict[str, dict]:
+    errors = latencies.pop("_errors")[0]
+    total = sum(len(v) for v in latencies.values())
+    results = {
+        f"{prefix}.rps": {
+            "value": total / duration,
+            "unit": "req/s",
+            "better": "higher",
+        },
+        f"{prefix}.errors": {"value": errors, "unit": "count", "better": "lower"},
+    }
+    for name, values in latencies.items():
+        for q in (0.5, 0.99) if values else ():
+            results[f"{prefix}.{name}.p{int(q * 100)}"] = {
+                "value": _percentile(values, q) * 1000,
+                "unit": "ms",
+                "better": "lower",
+            }
+    return results
@@ -0,0 +1,82 @@
+"""
+Память на одно ретро: прежняя раскладка (модели Pydantic в словаре и
+индекс из кортежей) против компактных записей RetroStore.
+"""
+
+import gc
+import tracemalloc
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from app.models import Retro, RetroItem
+from app.store import RetroStore
+
+ITEMS_PER_RETRO = 5
+
+
+def _fresh(*parts: str) -> str:
+    # Новый объект строки на каждый вызов, как после разбора JSON запроса.
+    return "".join(parts)
+
+
+def _records(count: int) -> Iterator[Tuple[date, List[RetroItem]]]:
+    start = date(2024, 1, 1)
+    for n in range(count):
+        items = [
+            RetroItem(
+                what_went_well=f"Релиз {n}.{i} прошел без откатов",
+                to_improve=_fresh("Flaky tests ", "in CI"),
+                actions=_fresh("Добавить ретраи и карантин ", f"для теста {i}"),
+            )
+            for i in range(ITEMS_PER_RETRO)
+        ]
+        yield start + timedelta(days=n % 730), items
+
+
+def _models_layout(count: int) -> object:
+    by_id: Dict[int, Tuple[Retro, int]] = {}
+    index = []
+    for retro_id, (session_date, items) in enumerate(_records(count), 1):
+        retro = Retro(id=retro_id, session_date=session_date, items=items)
+        by_id[retro_id] = (retro, retro_id)
+        index.append((session_date, retro_id))
+    index.sort()
+    return by_id, index
+
+
+def _compact_layout(count: int) -> object:
+    store = RetroStore()
+    batch = []
+    for record in _records(count):
+        batch.append(record)
+        if len(batch) == 1000:
+            store.create_many(batch)
+            batch = []
+    store.create_many(batch)
+    return store
+
+
+def measure(build: Callable[[int], object], count: int) -> float:
+    """Байт на ретро, которые удерживает построенная структура."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        layout = build(count)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del layout
+    return (after - before) / count
+
+
+def run(count: int = 10000) -> Dict[str, dict]:
+    results = {}
+    for name, build in (("models", _models_layout), ("compact", _compact_layout)):
+        results[f"memory.bytes_per_retro.{name}"] = {
+            "value": measure(build, count),
+            "unit": "B/retro",
+            "better": "lower",
+        }
+    return results
@@ -0,0 +1,53 @@
+"""Микробенчмарки горячих функций: время одной операции в микросекундах."""
+
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from app.models import CreateRetroRequest
+from app.secure_upload import PNG_SIGNATURE, secure_save, sniff_mime_type
+
+PNG_100K = PNG_SIGNATURE + b"\0" * (100 * 1024)
+
+RETRO_PAYLOAD = {
+    "session_date": "2024-01-01",
+    "items": [
+        {
+            "what_went_well": f"  Релиз {i} прошел без откатов  ",
+            "to_improve": "Flaky tests in CI",
+            "actions": "Добавить ретраи и карантин для нестабильных тестов",
+        }
+        for i in range(20)
+    ],
+}
+
+
+def timeit(fn: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Лучшее из repeat прогонов, мкс на вызов."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1e6
+
+
+def run(scale: float = 1.0) -> Dict[str, dict]:
+    results = {}
+
+    def record(name: str, fn: Callable[[], object], number: int) -> None:
+        value = timeit(fn, max(1, int(number * scale)))
+        results[f"micro.{name}"] = {"value": value, "unit": "us/op", "better": "lower"}
+
+    record("sniff_mime_type", lambda: sniff_mime_type(PNG_100K), 100000)
+    record(
+        "create_retro_request_20_items",
+        lambda: CreateRetroRequest.model_validate(RETRO_PAYLOAD),
+        5000,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        upload_dir = Path(tmp)
+        record("secure_save_100k", lambda: secure_save(upload_dir, PNG_100K), 200)
+    return results
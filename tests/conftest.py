@@ -5,3 +5,33 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]  # корень репозитория
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+import pytest  # noqa: E402
+
+from app.main import app, limiter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limits():
+    """Лимиты общие для TestClient, поэтому сбрасываются перед каждым тестом."""
+    app.state.cost_limiter.reset()
+    limiter.reset()
+
+
+@pytest.fixture
+def upload_dir(tmp_path_factory):
+    """
+    Каталог загрузок приложения во временном каталоге. TestClient без with
+    не запускает lifespan, поэтому вложения открываются здесь: тесты не
+    пишут в uploads/.
+    """
+    from app import main
+
+    names = ("UPLOAD_DIR", "blob_store", "upload_sessions", "attachment_index")
+    originals = {name: getattr(main, name) for name in names}
+    directory = tmp_path_factory.mktemp("uploads")
+    main.open_uploads(directory)
+    yield directory
+    main.close_uploads()
+    for name, value in originals.items():
+        setattr(main, name, value)
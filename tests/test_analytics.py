@@ -0,0 +1,200 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.analytics import TERM_FIELDS, RetroAnalytics, period_of
+from app.main import _RETROS_DB, app, retro_analytics
+from app.models import Retro, RetroItem
+from app.search import tokenize
+from app.sqlite_store import SQLiteDatabase, SQLiteRetroRepository
+
+client = TestClient(app)
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _create(session_date: str, *pairs) -> int:
+    items = [
+        {"what_went_well": "-", "to_improve": improve, "actions": action}
+        for improve, action in pairs
+    ]
+    response = client.post(
+        "/retros", json={"session_date": session_date, "items": items}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _analytics(**params):
+    response = client.get("/retros/analytics", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_monthly_and_quarterly_counts():
+    _create("2024-01-10", ("flaky tests", "fix ci"))
+    _create("2024-01-20", ("flaky tests", "add retries"), ("slow deploy", "cache"))
+    _create("2024-04-01")
+
+    monthly = _analytics()
+    assert monthly["buckets"] == [
+        {"period": "2024-01", "retros": 2, "items": 3},
+        {"period": "2024-04", "retros": 1, "items": 0},
+    ]
+
+    quarterly = _analytics(granularity="quarter")
+    assert [b["period"] for b in quarterly["buckets"]] == ["2024-Q1", "2024-Q2"]
+
+
+def test_top_terms_and_date_range():
+    _create("2024-01-10", ("flaky tests", "fix ci"))
+    _create("2024-02-10", ("flaky build", "fix ci"))
+    _create("2024-03-10", ("slow review", "pair"))
+
+    body = _analytics(from_date="2024-01-01", to_date="2024-02-28", top=1)
+
+    assert [b["period"] for b in body["buckets"]] == ["2024-01", "2024-02"]
+    assert body["top_terms"]["to_improve"] == [{"term": "flaky", "count": 2}]
+    assert body["top_terms"]["actions"][0]["count"] == 2
+
+
+def test_update_and_delete_are_applied_incrementally():
+    retro_id = _create("2024-01-10", ("flaky tests", "fix ci"))
+    client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-05-05", "items": []},
+    )
+    assert _analytics()["buckets"] == [{"period": "2024-05", "retros": 1, "items": 0}]
+    assert _analytics()["top_terms"]["to_improve"] == []
+
+    client.delete(f"/retros/{retro_id}")
+    assert _analytics()["buckets"] == []
+
+
+def test_incremental_state_matches_rebuild():
+    """Инкрементальные агрегаты совпадают с пересчетом с нуля."""
+    for day in ["2024-01-10", "2024-01-11", "2024-02-01"]:
+        _create(day, ("flaky tests", "fix ci"), ("медленный деплой", "кэш"))
+    client.delete(f"/retros/{_create('2024-01-10', ('x y', 'z'))}")
+
+    fresh = RetroAnalytics()
+    fresh.rebuild(_RETROS_DB)
+
+    assert fresh.report() == retro_analytics.report()
+
+
+def test_invalid_granularity_is_422():
+    response = client.get("/retros/analytics", params={"granularity": "week"})
+    assert response.status_code == 422
+
+
+def _naive_report(retros, from_date, to_date, granularity, top):
+    buckets = {}
+    terms = {name: Counter() for name in TERM_FIELDS}
+    for retro in sorted(retros, key=lambda r: r.session_date):
+        if not (from_date or date.min) <= retro.session_date <= (to_date or date.max):
+            continue
+        period = period_of(retro.session_date, granularity)
+        bucket = buckets.setdefault(period, {"period": period, "retros": 0, "items": 0})
+        bucket["retros"] += 1
+        bucket["items"] += len(retro.items)
+        for name in TERM_FIELDS:
+            for item in retro.items:
+                terms[name].update(tokenize(getattr(item, name), stem=False))
+    return list(buckets.values()), {
+        name: sorted(counter.values(), reverse=True)[:top]
+        for name, counter in terms.items()
+    }
+
+
+def test_report_from_year_and_month_tables_matches_day_scan():
+    """Диапазоны с целыми годами, месяцами и краями дают тот же итог, что и проход по дням."""
+    rng = random.Random(7)
+    words = ["flaky", "deploy", "review", "ci", "cache", "pair", "docs"]
+    retros = [
+        Retro(
+            id=i,
+            session_date=date(2021, 1, 1) + timedelta(days=rng.randrange(3 * 366)),
+            items=[
+                RetroItem(
+                    what_went_well="-",
+                    to_improve=" ".join(rng.sample(words, 2)),
+                    actions=rng.choice(words),
+                )
+                for _ in range(rng.randrange(3))
+            ],
+        )
+        for i in range(1, 400)
+    ]
+    analytics = RetroAnalytics()
+    analytics.rebuild(retros)
+    ranges = [(None, None), (date(2022, 1, 1), date(2022, 12, 31))]
+    for _ in range(30):
+        a, b = sorted(
+            date(2020, 12, 1) + timedelta(days=rng.randrange(3 * 366 + 60))
+            for _ in "ab"
+        )
+        ranges.append((a, b))
+
+    for from_date, to_date in ranges:
+        for granularity in ("month", "quarter"):
+            report = analytics.report(from_date, to_date, granularity, top=50)
+            buckets, counts = _naive_report(retros, from_date, to_date, granularity, 50)
+            assert [b.model_dump() for b in report.buckets] == buckets
+            assert {
+                name: [t.count for t in top] for name, top in report.top_terms.items()
+            } == counts
+
+
+def _item(improve: str) -> RetroItem:
+    return RetroItem(what_went_well="-", to_improve=improve, actions="-")
+
+
+def _counts(analytics: RetroAnalytics) -> tuple:
+    report = analytics.report()
+    return (
+        [(b.period, b.retros, b.items) for b in report.buckets],
+        {t.term: t.count for t in report.top_terms["to_improve"]},
+    )
+
+
+def test_analytics_ignores_events_older_than_applied_revision():
+    analytics = RetroAnalytics()
+    old = Retro(id=1, session_date=date(2024, 1, 1), items=[_item("flaky")])
+    new = Retro(id=1, session_date=date(2024, 2, 1), items=[_item("slow")])
+
+    analytics.on_write(None, new, 5)
+    analytics.on_write(None, old, 3)
+    analytics.on_write(old, new, 5)
+
+    assert _counts(analytics) == ([("2024-02", 1, 1)], {"slow": 1})
+
+    analytics.on_write(new, None, 7)
+    analytics.on_write(old, new, 6)
+
+    assert _counts(analytics) == ([], {})
+
+
+def test_analytics_syncs_writes_of_other_workers(tmp_path):
+    path = str(tmp_path / "retros.sqlite3")
+    mine = SQLiteRetroRepository(SQLiteDatabase(path), batch_size=2)
+    other = SQLiteRetroRepository(SQLiteDatabase(path), batch_size=2)
+    analytics = RetroAnalytics()
+    analytics.rebuild(mine, mine.version)
+    mine.subscribe(analytics)
+    day = date(2024, 1, 1)
+
+    mine.create(day, [_item("flaky")])
+    created = [other.create(day, [_item("flaky")]).id for _ in range(3)]
+    other.update(created[0], date(2024, 2, 1), [_item("slow"), _item("slow")])
+    other.delete(created[1])
+    analytics.sync(mine)
+
+    assert _counts(analytics) == (
+        [("2024-01", 2, 2), ("2024-02", 1, 2)],
+        {"flaky": 2, "slow": 2},
+    )
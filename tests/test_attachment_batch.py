@@ -0,0 +1,94 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.attachments import MAX_BATCH_FILES
+from app.main import app
+from app.secure_upload import (
+    JPEG_EOI,
+    JPEG_SOI,
+    PNG_SIGNATURE,
+    StreamingUpload,
+    checked_upload_root,
+)
+
+client = TestClient(app)
+
+PNG = PNG_SIGNATURE + bytes(range(256)) * 4
+JPEG = JPEG_SOI + b"\1" * 512 + JPEG_EOI
+
+
+@pytest.fixture(autouse=True)
+def _uploads(upload_dir):
+    yield
+
+
+def _retro() -> int:
+    return client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+
+
+def test_batch_returns_result_per_file_and_bad_file_does_not_fail_batch():
+    """Плохой файл получает свою ошибку, остальные сохраняются."""
+    retro_id = _retro()
+    files = [
+        ("files", ("a.png", PNG, "image/png")),
+        ("files", ("b.gif", b"GIF89a" + b"\0" * 64, "image/gif")),
+        ("files", ("c.jpg", JPEG, "image/jpeg")),
+    ]
+
+    response = client.post(f"/retros/{retro_id}/attachments/batch", files=files)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert [r["status"] for r in results] == [200, 422, 200]
+    assert results[1] == {
+        "index": 1,
+        "name": "b.gif",
+        "status": 422,
+        "detail": "Invalid file type",
+    }
+    assert results[0]["content_type"] == "image/png"
+    assert results[2]["content_type"] == "image/jpeg"
+    for result, body in ((results[0], PNG), (results[2], JPEG)):
+        download = client.get(f"/retros/{retro_id}/attachments/{result['filename']}")
+        assert download.content == body
+
+
+def test_batch_rejects_too_many_files_and_unknown_retro():
+    retro_id = _retro()
+    files = [
+        ("files", (f"{i}.png", PNG, "image/png")) for i in range(MAX_BATCH_FILES + 1)
+    ]
+
+    assert (
+        client.post(f"/retros/{retro_id}/attachments/batch", files=files).status_code
+        == 422
+    )
+    assert (
+        client.post("/retros/999999/attachments/batch", files=files[:1]).status_code
+        == 404
+    )
+
+
+def test_checked_upload_root_resolves_existing_directory(tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    link = tmp_path / "link"
+    link.symlink_to(real)
+
+    assert checked_upload_root(link) == real.resolve()
+    with pytest.raises(ValueError, match="does not exist"):
+        checked_upload_root(tmp_path / "missing")
+
+
+def test_streaming_upload_with_checked_root_writes_into_it(tmp_path):
+    root = checked_upload_root(tmp_path)
+
+    with StreamingUpload(tmp_path / "ignored", root=root) as upload:
+        upload.write(PNG)
+        path = upload.commit()
+
+    assert path.parent == root
+    assert path.read_bytes() == PNG
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import sqlite3
+import subprocess
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.attachment_index import AttachmentIndex, memory_store_id
+from app.blob_store import BlobStore
+from app.main import app
+from app.secure_upload import PNG_SIGNATURE, SavedFile, secure_save
+
+client = TestClient(app)
+
+PNG = PNG_SIGNATURE + bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def _uploads(upload_dir):
+    yield
+
+
+def _retro() -> int:
+    return client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+
+
+def _upload(retro_id: int, body: bytes = PNG) -> str:
+    response = client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", body, "image/png")}
+    )
+    assert response.status_code == 200
+    return response.json()["filename"]
+
+
+def _saved(directory, body: bytes = PNG) -> SavedFile:
+    path = secure_save(directory, body)
+    return SavedFile(path, len(body), "image/png", hashlib.sha256(body).hexdigest())
+
+
+def test_list_attachments_returns_metadata_of_this_retro_only():
+    retro_id, other_id = _retro(), _retro()
+    first = _upload(retro_id)
+    batch = client.post(
+        f"/retros/{retro_id}/attachments/batch",
+        files=[("files", ("b.png", PNG + b"\1", "image/png"))],
+    )
+    second = batch.json()["results"][0]["filename"]
+
+    response = client.get(f"/retros/{retro_id}/attachments")
+
+    assert response.status_code == 200
+    listed = response.json()
+    assert [a["filename"] for a in listed] == [first, second]
+    assert listed[0]["size"] == len(PNG)
+    assert listed[0]["content_type"] == "image/png"
+    assert listed[0]["sha256"] == hashlib.sha256(PNG).hexdigest()
+    assert client.get(f"/retros/{other_id}/attachments").json() == []
+    assert client.get("/retros/999999/attachments").status_code == 404
+
+
+def test_download_requires_attachment_of_this_retro():
+    """Вложение чужого ретро не отдается даже по известному имени."""
+    retro_id, other_id = _retro(), _retro()
+    name = _upload(retro_id)
+
+    assert client.get(f"/retros/{retro_id}/attachments/{name}").status_code == 200
+    assert client.get(f"/retros/{other_id}/attachments/{name}").status_code == 404
+
+
+def test_delete_retro_removes_files_in_background():
+    retro_id = _retro()
+    names = [_upload(retro_id), _upload(retro_id, PNG + b"\2")]
+
+    assert client.delete(f"/retros/{retro_id}").status_code == 204
+    main.attachment_index.wait_idle()
+
+    for name in names:
+        assert not (main.UPLOAD_DIR / name).exists()
+    assert main.attachment_index.list(retro_id) == []
+
+
+def test_purge_keeps_attachments_added_after_request(tmp_path):
+    index = AttachmentIndex(tmp_path)
+    old = _saved(tmp_path)
+    index.add(1, old)
+    cutoff = time.time()
+    new = _saved(tmp_path, PNG + b"\1")
+    index.add(1, new)
+
+    assert index.purge([("", 1, cutoff)]) == 1
+
+    assert not old.path.exists()
+    assert new.path.exists()
+    assert [r.name for r in index.list(1)] == [new.path.name]
+    index.close()
+
+
+def test_sweep_reconciles_index_with_disk(tmp_path):
+    legacy = tmp_path / f"{uuid.uuid4()}.png"
+    legacy.write_bytes(PNG)
+    os.utime(legacy, (0, 0))
+    index = AttachmentIndex(tmp_path, orphan_grace=60)
+    indexed, vanished = _saved(tmp_path), _saved(tmp_path, PNG + b"\1")
+    index.add(1, indexed)
+    index.add(1, vanished)
+    vanished.path.unlink()
+    orphan = tmp_path / f"{uuid.uuid4()}.png"
+    orphan.write_bytes(PNG)
+    stale_part = tmp_path / ".upload-abc.part"
+    stale_part.write_bytes(b"x")
+    later = time.time() + 120
+    for path in (indexed.path, orphan, stale_part):
+        os.utime(path, (later - 90, later - 90))
+
+    stats = index.sweep(now=later)
+
+    assert stats == {"missing_rows": 1, "orphan_files": 1, "stale_parts": 1, "blobs": 0}
+    assert [r.name for r in index.list(1)] == [indexed.path.name]
+    assert indexed.path.exists()
+    assert legacy.exists()
+    assert not orphan.exists()
+    assert not stale_part.exists()
+    index.close()
+
+
+def test_cascade_releases_shared_blobs(tmp_path):
+    blobs = BlobStore(tmp_path)
+    index = AttachmentIndex(tmp_path, blobs)
+    digest = hashlib.sha256(PNG).hexdigest()
+    for retro_id in (1, 1, 2):
+        path = secure_save(tmp_path, PNG, blob_store=blobs)
+        index.add(retro_id, SavedFile(path, len(PNG), "image/png", digest))
+
+    assert blobs.refcount(digest) == 2
+    index.purge([("", 1, time.time())])
+    assert blobs.refcount(digest) == 1
+    assert path.exists()
+    index.purge([("", 2, time.time())])
+    assert not path.exists()
+    index.close()
+    blobs.close()
+
+
+def test_prune_missing_drops_attachments_of_unknown_retros(tmp_path):
+    """После перезапуска id ретро могут выдаться заново — старые вложения удаляются."""
+    index = AttachmentIndex(tmp_path)
+    stale, live = _saved(tmp_path), _saved(tmp_path, PNG + b"\1")
+    index.add(1, stale)
+    index.add(2, live)
+
+    assert index.prune_missing({2}) == 1
+    index.start(sweep_interval=3600)
+    index.wait_idle()
+
+    assert index.list(1) == []
+    assert not stale.path.exists()
+    assert live.path.exists()
+    index.close()
+
+
+def test_stores_with_same_retro_ids_do_not_see_or_purge_each_other(tmp_path):
+    """Воркеры с ретро в памяти выдают одинаковые id: вложения не смешиваются."""
+    first = AttachmentIndex(tmp_path, store=memory_store_id())
+    second = AttachmentIndex(tmp_path, store=memory_store_id())
+    mine, theirs = _saved(tmp_path), _saved(tmp_path, PNG + b"\1")
+    first.add(1, mine)
+    second.add(1, theirs)
+
+    assert [r.name for r in first.list(1)] == [mine.path.name]
+    assert not first.owns(1, theirs.path.name)
+    first.purge([(first.store, 1, time.time())])
+
+    assert not mine.path.exists()
+    assert theirs.path.exists()
+    assert [r.name for r in second.list(1)] == [theirs.path.name]
+    first.close()
+    second.close()
+
+
+def test_prune_missing_drops_only_dead_memory_stores(tmp_path):
+    finished = subprocess.Popen(["true"])
+    finished.wait()
+    dead = AttachmentIndex(tmp_path, store=f"memory-{finished.pid}-abcd")
+    live = AttachmentIndex(tmp_path, store=f"memory-{os.getppid()}-abcd")
+    shared = AttachmentIndex(tmp_path)
+    orphaned, kept = _saved(tmp_path), _saved(tmp_path, PNG + b"\1")
+    dead.add(1, orphaned)
+    live.add(1, kept)
+
+    assert shared.prune_missing(set()) == 1
+    shared.start(sweep_interval=3600)
+    shared.wait_idle()
+
+    assert not orphaned.path.exists()
+    assert kept.path.exists()
+    assert [r.name for r in live.list(1)] == [kept.path.name]
+    for index in (dead, live, shared):
+        index.close()
+
+
+def test_index_without_store_column_is_migrated(tmp_path):
+    saved = _saved(tmp_path)
+    conn = sqlite3.connect(tmp_path / ".attachments.sqlite3")
+    conn.executescript(
+        """
+        CREATE TABLE attachments (
+            retro_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mime_type TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (retro_id, name)
+        ) WITHOUT ROWID;
+        CREATE INDEX ix_attachments_name ON attachments (name);
+        """
+    )
+    conn.execute(
+        "INSERT INTO attachments VALUES (1, ?, ?, 'image/png', ?, 0)",
+        (saved.path.name, saved.size, saved.sha256),
+    )
+    conn.commit()
+    conn.close()
+
+    index = AttachmentIndex(tmp_path)
+
+    assert [r.name for r in index.list(1)] == [saved.path.name]
+    index.close()
@@ -0,0 +1,77 @@
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.secure_upload import PNG_SIGNATURE
+
+client = TestClient(app)
+
+PNG = PNG_SIGNATURE + bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def _uploads(upload_dir):
+    yield
+
+
+def _upload() -> tuple:
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    response = client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", PNG, "image/png")}
+    )
+    assert response.status_code == 200
+    return retro_id, response.json()["filename"]
+
+
+def test_download_returns_file_with_strong_etag():
+    retro_id, name = _upload()
+
+    response = client.get(f"/retros/{retro_id}/attachments/{name}")
+
+    assert response.status_code == 200
+    assert response.content == PNG
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["etag"] == f'"{hashlib.sha256(PNG).hexdigest()}"'
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_download_if_none_match_returns_304():
+    retro_id, name = _upload()
+    etag = client.get(f"/retros/{retro_id}/attachments/{name}").headers["etag"]
+
+    response = client.get(
+        f"/retros/{retro_id}/attachments/{name}", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_download_range_request_returns_partial_content():
+    retro_id, name = _upload()
+
+    response = client.get(
+        f"/retros/{retro_id}/attachments/{name}", headers={"Range": "bytes=8-15"}
+    )
+
+    assert response.status_code == 206
+    assert response.content == PNG[8:16]
+    assert response.headers["content-range"] == f"bytes 8-15/{len(PNG)}"
+
+
+def test_download_unknown_or_malformed_name_is_404():
+    retro_id, _ = _upload()
+
+    for name in [
+        "00000000-0000-0000-0000-000000000000.png",
+        "..main.py",
+        "x.txt",
+    ]:
+        response = client.get(f"/retros/{retro_id}/attachments/{name}")
+        assert response.status_code == 404
+        assert response.json()["title"] == "not_found"
@@ -0,0 +1,45 @@
+from benchmarks import memory
+from benchmarks.__main__ import compare
+
+
+def _result(value: float, better: str = "lower") -> dict:
+    return {"value": value, "unit": "ms", "better": better}
+
+
+def test_compare_reports_only_regressions_past_threshold():
+    baseline = {
+        "latency": _result(10.0),
+        "rps": _result(1000.0, "higher"),
+        "faster": _result(10.0),
+    }
+    results = {
+        "latency": _result(12.5),
+        "rps": _result(700.0, "higher"),
+        "faster": _result(5.0),
+        "new_metric": _result(1.0),
+    }
+
+    regressions = compare(results, baseline, threshold=0.2)
+
+    assert [line.split(":")[0] for line in regressions] == ["latency", "rps"]
+    assert compare(results, baseline, threshold=0.5) == []
+
+
+def test_compare_treats_any_increase_over_zero_baseline_as_regression():
+    baseline = {"errors": _result(0.0), "same": _result(0.0), "rps": _result(0.0)}
+    results = {
+        "errors": _result(50.0),
+        "same": _result(0.0),
+        "rps": _result(10.0, "higher"),
+    }
+
+    regressions = compare(results, baseline, threshold=0.2)
+
+    assert [line.split(":")[0] for line in regressions] == ["errors"]
+
+
+def test_memory_benchmark_reports_bytes_per_retro():
+    results = memory.run(200)
+
+    compact = results["memory.bytes_per_retro.compact"]["value"]
+    assert 0 < compact < results["memory.bytes_per_retro.models"]["value"]
@@ -0,0 +1,47 @@
+import hashlib
+from pathlib import Path
+
+from app.blob_store import BlobStore
+from app.secure_upload import PNG_SIGNATURE, secure_save
+
+PNG = PNG_SIGNATURE + b"same screenshot"
+
+
+def _objects(root: Path):
+    return [p for p in (root / "objects").rglob("*") if p.is_file()]
+
+
+def test_duplicate_upload_reuses_existing_blob(tmp_path: Path):
+    store = BlobStore(tmp_path)
+
+    first = secure_save(tmp_path, PNG, blob_store=store)
+    second = secure_save(tmp_path, PNG, blob_store=store)
+
+    digest = hashlib.sha256(PNG).hexdigest()
+    assert first == second
+    assert first.name == f"{digest}.png"
+    assert first.parent == tmp_path.resolve() / "objects" / digest[:2] / digest[2:4]
+    assert store.refcount(digest) == 2
+    assert _objects(tmp_path) == [first]
+    assert not list(tmp_path.glob(".upload-*"))
+
+
+def test_garbage_collection_removes_only_unreferenced_blobs(tmp_path: Path):
+    store = BlobStore(tmp_path)
+    kept = secure_save(tmp_path, PNG, blob_store=store)
+    dropped = secure_save(tmp_path, PNG_SIGNATURE + b"other", blob_store=store)
+    dropped_digest = dropped.name.split(".")[0]
+
+    assert store.release(dropped_digest) == 0
+    assert store.collect_garbage() == 1
+
+    assert _objects(tmp_path) == [kept]
+    assert store.lookup(dropped.name) is None
+    assert store.lookup(kept.name) == kept
+
+
+def test_lookup_rejects_names_outside_blob_namespace(tmp_path: Path):
+    store = BlobStore(tmp_path)
+
+    assert store.lookup("../../etc/passwd") is None
+    assert store.lookup("not-a-digest.png") is None
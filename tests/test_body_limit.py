@@ -0,0 +1,123 @@
+import asyncio
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.attachments import MAX_UPLOAD_BODY
+from app.body_limit import BodyLimitedRoute, body_limit
+from app.main import app
+from app.secure_upload import PNG_SIGNATURE
+
+client = TestClient(app)
+
+
+def _limited_app(max_bytes: int) -> FastAPI:
+    limited = FastAPI()
+    limited.router.route_class = BodyLimitedRoute
+
+    @limited.post("/upload", openapi_extra=body_limit(max_bytes))
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return limited
+
+
+def _call(asgi_app, chunks, headers, path="/upload"):
+    """Вызывает приложение напрямую и считает, сколько частей тела оно прочитало."""
+    received = []
+    sent = []
+
+    async def receive():
+        if len(received) < len(chunks):
+            received.append(chunks[len(received)])
+            more = len(received) < len(chunks)
+            return {"type": "http.request", "body": received[-1], "more_body": more}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    asyncio.run(asgi_app(scope, receive, send))
+    return sent[0]["status"], len(received)
+
+
+def _multipart(size: int, head: bytes = b"") -> bytes:
+    return (
+        b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n"
+        + head
+        + b"x" * (size - len(head))
+        + b"\r\n--b--\r\n"
+    )
+
+
+def test_chunked_body_is_cut_off_at_limit():
+    """Без Content-Length тело читается только до предела, а не целиком."""
+    body = _multipart(100_000)
+    chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+    headers = {"content-type": "multipart/form-data; boundary=b"}
+
+    status, read = _call(_limited_app(10_000), chunks, headers)
+
+    assert status == 413
+    assert read <= 11
+    assert _call(_limited_app(200_000), chunks, headers) == (200, len(chunks))
+
+
+def test_declared_content_length_over_limit_is_rejected_before_reading():
+    body = _multipart(100_000)
+    headers = {
+        "content-type": "multipart/form-data; boundary=b",
+        "content-length": str(len(body)),
+    }
+
+    assert _call(_limited_app(10_000), [body], headers) == (413, 0)
+
+
+def test_upload_endpoint_rejects_body_over_limit(upload_dir):
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    data = PNG_SIGNATURE + b"\0" * MAX_UPLOAD_BODY
+
+    response = client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", data, "image/png")}
+    )
+
+    assert response.status_code == 413
+    assert response.json()["status"] == 413
+
+
+def test_upload_endpoint_rejects_bad_signature_before_reading_body(upload_dir):
+    """Тело загрузки разбирается потоком: плохой файл не дочитывается до конца."""
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    body = _multipart(1_000_000)
+    chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+    headers = {"content-type": "multipart/form-data; boundary=b"}
+    path = f"/retros/{retro_id}/attachments"
+
+    status, read = _call(app, chunks, headers, path)
+
+    assert status == 422
+    assert read <= 2
+    assert not list(upload_dir.glob(".upload-*"))
+
+    good = _multipart(1_000_000, head=PNG_SIGNATURE)
+    chunks = [good[i : i + 1000] for i in range(0, len(good), 1000)]
+    assert _call(app, chunks, headers, path) == (200, len(chunks))
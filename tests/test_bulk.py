@@ -0,0 +1,119 @@
+import asyncio
+import json
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.body_limit import BODY_LIMIT_EXTRA
+from app.bulk import BULK_BATCH_SIZE, MAX_NDJSON_LINE, import_records
+from app.config import settings
+from app.main import _RETROS_DB, app
+
+client = TestClient(app)
+
+ITEM = {"what_went_well": "a", "to_improve": "b", "actions": "c"}
+TODAY = date(2024, 6, 1)
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _results(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_bulk_ndjson_import_reports_each_record():
+    lines = [
+        json.dumps({"session_date": "2024-01-01", "items": [ITEM]}),
+        json.dumps({"session_date": "2999-01-01", "items": []}),
+        "{not json",
+        json.dumps({"session_date": "2024-01-02", "items": [], "extra": 1}),
+        json.dumps({"session_date": "2024-01-03", "items": []}),
+    ]
+
+    response = client.post(
+        "/retros/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    results = _results(response)
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in results] == [201, 422, 422, 422, 201]
+    assert results[1]["detail"] == "Session date cannot be in the future"
+    assert results[3]["errors"][0]["type"] == "extra_forbidden"
+    assert len(_RETROS_DB) == 2
+    assert _RETROS_DB.get(results[0]["id"]).items[0].actions == "c"
+
+
+def test_bulk_json_array_import_in_batches():
+    records = [{"session_date": "2024-02-01", "items": []} for _ in range(1200)]
+
+    response = client.post("/retros/bulk", json=records)
+
+    assert response.status_code == 200
+    results = _results(response)
+    assert len(results) == 1200
+    assert all(r["status"] == 201 for r in results)
+    assert len({r["id"] for r in results}) == 1200
+    assert len(_RETROS_DB) == 1200
+
+
+def test_bulk_import_is_rate_limited():
+    statuses = [client.post("/retros/bulk", json=[]).status_code for _ in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+
+
+def test_bulk_rejects_non_array_json():
+    response = client.post("/retros/bulk", json={"session_date": "2024-01-01"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Expected a JSON array of retros"
+
+
+def test_bulk_rejects_unsupported_media_type():
+    response = client.post(
+        "/retros/bulk", content=b"x", headers={"Content-Type": "text/plain"}
+    )
+
+    assert response.status_code == 415
+    assert response.json()["title"] == "unsupported_media_type"
+
+
+def test_bulk_results_are_yielded_per_batch():
+    """Результаты уходят клиенту после каждой пачки, а не в конце импорта."""
+
+    async def records():
+        for _ in range(BULK_BATCH_SIZE * 2 + 1):
+            yield {"session_date": "2024-02-01", "items": []}
+
+    async def collect():
+        return [chunk async for chunk in import_records(_RETROS_DB, records(), TODAY)]
+
+    chunks = asyncio.run(collect())
+
+    assert [len(c.splitlines()) for c in chunks] == [BULK_BATCH_SIZE] * 2 + [1]
+
+
+def test_bulk_oversized_ndjson_record_ends_stream_with_error_line():
+    lines = [json.dumps({"session_date": "2024-01-01", "items": []})] * 2
+    body = "\n".join(lines) + "\n" + "x" * (MAX_NDJSON_LINE + 1)
+
+    response = client.post(
+        "/retros/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    results = _results(response)
+    assert [r["status"] for r in results] == [201, 201, 413]
+    assert results[2]["index"] == 2
+    assert len(_RETROS_DB) == 2
+
+
+def test_bulk_declares_body_limit():
+    route = next(r for r in app.routes if getattr(r, "path", "") == "/retros/bulk")
+
+    assert route.openapi_extra[BODY_LIMIT_EXTRA] == settings.BULK_MAX_BODY_SIZE
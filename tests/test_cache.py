@@ -0,0 +1,102 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.cache import ResponseCache
+from app.main import _RETROS_DB, app, response_cache
+from app.models import Retro, RetroItem
+
+client = TestClient(app)
+
+ITEM = {"what_went_well": "a", "to_improve": "b", "actions": "c"}
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _create(session_date: str = "2024-01-01") -> int:
+    response = client.post(
+        "/retros", json={"session_date": session_date, "items": [ITEM]}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_single_retro_is_served_from_cache_filled_on_write():
+    retro_id = _create()
+    before = response_cache.stats()
+
+    response = client.get(f"/retros/{retro_id}")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "id": retro_id,
+        "session_date": "2024-01-01",
+        "items": [ITEM],
+    }
+    after = response_cache.stats()
+    assert after["retro_hits"] == before["retro_hits"] + 1
+    assert after["retro_misses"] == before["retro_misses"]
+
+
+def test_update_replaces_cached_bytes():
+    retro_id = _create()
+    client.get(f"/retros/{retro_id}")
+
+    client.put(f"/retros/{retro_id}", json={"session_date": "2024-02-02", "items": []})
+
+    assert client.get(f"/retros/{retro_id}").json()["session_date"] == "2024-02-02"
+
+
+def test_list_cache_hits_until_next_write():
+    _create("2024-01-01")
+    client.get("/retros")
+    before = response_cache.stats()
+
+    assert len(client.get("/retros").json()) == 1
+    assert response_cache.stats()["list_hits"] == before["list_hits"] + 1
+
+    _create("2024-01-02")
+    assert len(client.get("/retros").json()) == 2
+    assert response_cache.stats()["list_misses"] == before["list_misses"] + 1
+
+
+def test_list_cache_is_keyed_by_date_range():
+    _create("2024-01-01")
+    _create("2024-03-01")
+
+    assert len(client.get("/retros", params={"from_date": "2024-02-01"}).json()) == 1
+    assert len(client.get("/retros", params={"to_date": "2024-02-01"}).json()) == 1
+    assert len(client.get("/retros").json()) == 2
+
+
+def test_cache_stats_are_exported_only_through_metrics():
+    assert client.get("/cache/stats").status_code == 404
+
+    body = client.get("/metrics").text
+
+    assert 'response_cache{stat="list_bytes"}' in body
+    assert 'response_cache{stat="retro_hits"}' in body
+
+
+def test_list_cache_is_bounded_by_bytes():
+    """Списки вытесняются по суммарному объему, а не только по числу записей."""
+    cache = ResponseCache(max_lists=100, max_list_bytes=300)
+    retros = [
+        Retro(id=i, session_date=date(2024, 1, 1), items=[RetroItem(**ITEM)])
+        for i in range(1, 3)
+    ]
+
+    for day in range(1, 6):
+        cache.put_list((date(2024, 1, day), None), 1, retros)
+
+    stats = cache.stats()
+    assert 0 < stats["list_bytes"] <= 300
+    assert stats["list_entries"] < 5
+    assert cache.get_list((date(2024, 1, 5), None), 1) is not None
+    assert cache.get_list((date(2024, 1, 1), None), 1) is None
+
+    cache.put_list((None, None), 2, retros * 10)
+    assert cache.get_list((None, None), 2) is None
+    assert cache.stats()["list_bytes"] <= 300
@@ -0,0 +1,200 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import choose_encoding
+from app.main import _RETROS_DB, app
+from app.secure_upload import PNG_SIGNATURE
+
+client = TestClient(app)
+
+ITEM = {
+    "what_went_well": "Релиз прошел без откатов",
+    "to_improve": "Flaky tests in CI",
+    "actions": "Добавить ретраи и карантин для нестабильных тестов",
+}
+
+
+@pytest.fixture(autouse=True)
+def _clean_store():
+    _RETROS_DB.clear()
+    yield
+    _RETROS_DB.clear()
+
+
+def _fill(count: int = 20) -> None:
+    for _ in range(count):
+        response = client.post(
+            "/retros", json={"session_date": "2024-01-01", "items": [ITEM] * 5}
+        )
+        assert response.status_code == 201
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("br") is None
+    assert choose_encoding("*") == compression.available_encodings()[0]
+    assert choose_encoding("") is None
+
+
+def test_large_list_is_gzipped_and_small_response_is_not():
+    _fill()
+
+    response = client.get("/retros", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(response.json()) == 20
+    assert "content-encoding" not in small.headers
+
+
+def test_compressed_bytes_are_reused_for_same_etag(monkeypatch):
+    _fill()
+    calls = []
+    original = compression._compressor
+
+    def counting(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(compression, "_compressor", counting)
+
+    first = client.get("/retros", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/retros", headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["etag"] == second.headers["etag"]
+    assert first.content == second.content
+    assert len(calls) == 1
+
+
+def test_ndjson_stream_is_compressed_incrementally():
+    _fill()
+
+    with client.stream(
+        "GET",
+        "/retros",
+        headers={"Accept": "application/x-ndjson", "Accept-Encoding": "gzip"},
+    ) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(raw).splitlines()
+    assert len(lines) == 20
+    assert json.loads(lines[0])["items"][0]["to_improve"] == "Flaky tests in CI"
+
+
+def test_png_attachment_is_not_recompressed(upload_dir):
+    _fill(1)
+    retro_id = client.get("/retros").json()[0]["id"]
+    png = PNG_SIGNATURE + b"\0" * 4096
+    uploaded = client.post(
+        f"/retros/{retro_id}/attachments",
+        files={"file": ("a.png", png, "image/png")},
+    )
+    name = uploaded.json()["filename"]
+
+    response = client.get(
+        f"/retros/{retro_id}/attachments/{name}", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.content == png
+
+
+def test_zstd_is_preferred_when_available():
+    pytest.importorskip("zstandard")
+    _fill()
+
+    response = client.get("/retros", headers={"Accept-Encoding": "gzip, zstd"})
+
+    assert response.headers["content-encoding"] == "zstd"
+    assert len(response.json()) == 20
+
+
+def test_compression_cache_is_bounded_by_bytes():
+    middleware = compression.CompressionMiddleware(
+        app, cache_entries=100, cache_bytes=1000
+    )
+    for n in range(5):
+        middleware.remember(("/retros", str(n), "gzip"), b"x" * 300)
+    middleware.remember(("/retros", "big", "gzip"), b"x" * 1001)
+
+    assert middleware.cache_size == 900
+    assert middleware.cached(("/retros", "1", "gzip")) is None
+    assert middleware.cached(("/retros", "4", "gzip")) == b"x" * 300
+    assert middleware.cached(("/retros", "big", "gzip")) is None
+
+
+def test_large_body_is_compressed_off_the_event_loop(monkeypatch):
+    offloaded = []
+    original = compression.run_in_threadpool
+
+    async def recording(fn, stream, data, final):
+        offloaded.append(len(data))
+        return await original(fn, stream, data, final)
+
+    monkeypatch.setattr(compression, "run_in_threadpool", recording)
+    _fill(100)
+
+    large = client.get("/retros", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/retros?limit=2", headers={"Accept-Encoding": "gzip"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert small.headers["content-encoding"] == "gzip"
+    assert len(offloaded) == 1
+    assert offloaded[0] >= 64 * 1024
+
+
+def test_streamed_chunks_are_flushed_for_the_client():
+    """Каждый кусок потокового ответа распаковывается сразу, без конца потока."""
+    stream = compression._compressor("gzip", 6, 3)
+    reader = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    for line in (b'{"id": 1}\n', b'{"id": 2}\n'):
+        chunk = compression._feed(
+            stream, line, compression._flush_mode("gzip", final=False)
+        )
+        assert reader.decompress(chunk) == line
+
+
+def test_compressed_response_has_its_own_etag():
+    _fill()
+    identity = client.get("/retros", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/retros", headers={"Accept-Encoding": "gzip"})
+    etag = compressed.headers["etag"]
+
+    assert etag == identity.headers["etag"][:-1] + '-gzip"'
+    not_modified = client.get(
+        "/retros", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert client.get("/retros", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_if_match_accepts_etag_of_compressed_response():
+    response = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": [ITEM] * 10}
+    )
+    retro_id = response.json()["id"]
+    etag = client.get(
+        f"/retros/{retro_id}", headers={"Accept-Encoding": "gzip"}
+    ).headers["etag"]
+    assert etag.endswith('-gzip"')
+
+    response = client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-01-02", "items": []},
+        headers={"If-Match": etag},
+    )
+
+    assert response.status_code == 200
@@ -0,0 +1,119 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import _RETROS_DB, app
+
+client = TestClient(app)
+
+ITEM = {"what_went_well": "a", "to_improve": "b", "actions": "c"}
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _create() -> tuple:
+    response = client.post("/retros", json={"session_date": "2024-01-01", "items": []})
+    assert response.status_code == 201
+    return response.json()["id"], response.headers["ETag"]
+
+
+def test_get_retro_returns_304_when_etag_matches():
+    retro_id, etag = _create()
+
+    response = client.get(f"/retros/{retro_id}")
+    assert response.headers["ETag"] == etag
+
+    response = client.get(f"/retros/{retro_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_retro_etag_changes_after_update():
+    retro_id, etag = _create()
+
+    response = client.put(
+        f"/retros/{retro_id}", json={"session_date": "2024-01-02", "items": [ITEM]}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.get(f"/retros/{retro_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["session_date"] == "2024-01-02"
+
+
+def test_list_etag_tracks_store_version():
+    _create()
+    etag = client.get("/retros").headers["ETag"]
+
+    assert client.get("/retros", headers={"If-None-Match": etag}).status_code == 304
+    assert (
+        client.get(
+            "/retros?from_date=2024-01-01", headers={"If-None-Match": etag}
+        ).status_code
+        == 200
+    )
+
+    retro_id, _ = _create()
+    client.delete(f"/retros/{retro_id}")
+    assert client.get("/retros", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_put_with_matching_if_match_succeeds():
+    retro_id, etag = _create()
+
+    response = client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-01-02", "items": []},
+        headers={"If-Match": etag},
+    )
+
+    assert response.status_code == 200
+
+
+def test_put_with_stale_if_match_returns_412():
+    """Негативный тест: второй писатель со старым ETag получает 412."""
+    retro_id, etag = _create()
+    client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-01-02", "items": []},
+        headers={"If-Match": etag},
+    )
+
+    response = client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-01-03", "items": []},
+        headers={"If-Match": etag},
+    )
+
+    assert response.status_code == 412
+    assert response.json()["title"] == "precondition_failed"
+    assert client.get(f"/retros/{retro_id}").json()["session_date"] == "2024-01-02"
+
+
+def test_put_etag_is_revision_it_wrote(monkeypatch):
+    """Запись другого клиента сразу после PUT не попадает в его ETag."""
+    retro_id, _ = _create()
+    update = _RETROS_DB.update_with_revision
+
+    def update_then_concurrent_write(*args, **kwargs):
+        written = update(*args, **kwargs)
+        update(retro_id, date(2024, 1, 3), [])
+        return written
+
+    monkeypatch.setattr(
+        _RETROS_DB, "update_with_revision", update_then_concurrent_write
+    )
+    response = client.put(
+        f"/retros/{retro_id}", json={"session_date": "2024-01-02", "items": [ITEM]}
+    )
+    monkeypatch.undo()
+
+    response = client.put(
+        f"/retros/{retro_id}",
+        json={"session_date": "2024-01-04", "items": []},
+        headers={"If-Match": response.headers["ETag"]},
+    )
+    assert response.status_code == 412
@@ -23,6 +23,16 @@ def test_not_found_error_format():
     assert "item not found" in body["detail"]
 
 
+def test_get_item_returns_created_item():
+    created = client.post("/items", params={"name": "board"}).json()
+
+    response = client.get(f"/items/{created['id']}")
+
+    assert response.status_code == 200
+    assert response.json() == created
+    assert response.json()["name"] == "board"
+
+
 def test_validation_error_format_on_retro():
     """Проверяет формат ошибки 422 Unprocessable Entity на эндпоинте ретро."""
     response = client.post(
@@ -45,3 +55,18 @@ def test_validation_error_format_on_retro():
     assert body["status"] == 422
     assert body["title"] == "Validation Error"
     assert "Session date cannot be in the future" in body["detail"]
+
+
+def test_ids_beyond_storage_range_are_not_found(upload_dir):
+    """Огромный id — 404 на любом бэкенде, а не OverflowError и 500."""
+    huge = "99999999999999999999"
+    retro = {"session_date": "2024-01-01", "items": []}
+
+    assert client.get(f"/retros/{huge}").status_code == 404
+    assert client.put(f"/retros/{huge}", json=retro).status_code == 404
+    assert client.delete(f"/retros/{huge}").status_code == 404
+    assert client.get(f"/items/{huge}").status_code == 404
+    upload = client.post(
+        f"/retros/{huge}/attachments", files={"file": ("a.png", b"x", "image/png")}
+    )
+    assert upload.status_code == 404
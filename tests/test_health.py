@@ -9,3 +9,18 @@ def test_health_ok():
     r = client.get("/health")
     assert r.status_code == 200
     assert r.json() == {"status": "ok"}
+
+
+def test_uploads_are_opened_by_lifespan_not_import(tmp_path, monkeypatch):
+    from app import main
+
+    assert main.attachment_index is None
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path / "uploads")
+
+    with TestClient(app) as started:
+        assert started.get("/health").status_code == 200
+        assert main.attachment_index is not None
+        assert (tmp_path / "uploads" / ".attachments.sqlite3").exists()
+
+    assert main.attachment_index is None
+    assert main.upload_sessions is None
@@ -0,0 +1,158 @@
+import os
+import time
+from datetime import date
+
+import pytest
+
+from app.journal import SNAPSHOT_NAME, Journal
+from app.models import RetroItem
+from app.store import ItemStore, RetroStore, _Record
+
+ITEM = RetroItem(what_went_well="a", to_improve="b", actions="c")
+
+
+def _open(path, **options):
+    retros, items = RetroStore(), ItemStore()
+    journal = Journal(path, retros, items, snapshot_interval=3600, **options)
+    journal.open()
+    return journal, retros, items
+
+
+def test_journal_restores_state_after_restart(tmp_path):
+    journal, retros, items = _open(tmp_path)
+    first = retros.create(date(2024, 1, 1), [ITEM])
+    second = retros.create(date(2024, 1, 2), [])
+    retros.update(first.id, date(2024, 2, 1), [ITEM, ITEM])
+    retros.delete(second.id)
+    items.create("widget")
+    version, revision = retros.version, retros.revision(first.id)
+    journal.close()
+
+    journal, restored, restored_items = _open(tmp_path)
+
+    assert len(restored) == 1
+    assert restored.get(first.id) == retros.get(first.id)
+    assert restored.revision(first.id) == revision
+    assert restored.version == version
+    assert restored_items.get(1) == {"id": 1, "name": "widget"}
+    # Удаленный последний id не выдается повторно.
+    assert restored.create(date(2024, 3, 1), []).id == second.id + 1
+    assert restored_items.create("gadget")["id"] == 2
+    journal.close()
+
+
+def test_snapshot_compacts_journal_and_replays_only_tail(tmp_path):
+    journal, retros, _ = _open(tmp_path)
+    for day in range(1, 6):
+        retros.create(date(2024, 1, day), [ITEM])
+    journal.snapshot()
+    tail = retros.create(date(2024, 2, 1), [])
+    journal.close()
+
+    segments = sorted(p.name for p in tmp_path.glob("journal-*.ndjson"))
+    assert (tmp_path / SNAPSHOT_NAME).is_file()
+    assert len(segments) == 1
+    assert (tmp_path / segments[0]).read_bytes().count(b"\n") == 1
+
+    journal, restored, _ = _open(tmp_path)
+    assert [r.id for r in restored.range()] == [1, 2, 3, 4, 5, tail.id]
+    journal.close()
+
+
+def test_snapshot_serializes_retros_outside_journal_lock(tmp_path, monkeypatch):
+    """Писатели не ждут, пока снимок собирает записи всех ретро."""
+    journal, retros, _ = _open(tmp_path)
+    created = [retros.create(date(2024, 1, day), [ITEM, ITEM]) for day in (1, 2)]
+    locked = []
+    to_json = _Record.to_json
+
+    def tracking_to_json(record, retro_id):
+        locked.append(journal._lock.locked())
+        return to_json(record, retro_id)
+
+    monkeypatch.setattr(_Record, "to_json", tracking_to_json)
+    journal.snapshot()
+
+    assert locked == [False, False]
+    exported, _ = retros.export()
+    assert [retro for retro, _ in exported] == [
+        retro.model_dump(mode="json") for retro in created
+    ]
+    journal.close()
+
+
+def test_records_overlapping_snapshot_are_idempotent(tmp_path):
+    """Записи, уже вошедшие в снимок, при повторном проигрывании ничего не ломают."""
+    journal, retros, _ = _open(tmp_path)
+    retro = retros.create(date(2024, 1, 1), [ITEM])
+    journal.flush()
+    segment = next(tmp_path.glob("journal-*.ndjson"))
+    overlap = segment.read_bytes()
+    journal.snapshot()
+    retros.delete(retro.id)
+    journal.close()
+    current = sorted(tmp_path.glob("journal-*.ndjson"))[-1]
+    current.write_bytes(overlap + current.read_bytes())
+
+    journal, restored, _ = _open(tmp_path)
+    assert len(restored) == 0
+    journal.close()
+
+
+def test_torn_tail_record_is_skipped(tmp_path):
+    journal, retros, _ = _open(tmp_path)
+    retros.create(date(2024, 1, 1), [ITEM])
+    journal.close()
+    segment = sorted(tmp_path.glob("journal-*.ndjson"))[-1]
+    with open(segment, "ab") as f:
+        f.write(b'{"op": "put", "rev"')
+
+    journal, restored, _ = _open(tmp_path)
+    assert len(restored) == 1
+    journal.close()
+
+
+def test_group_commit_flushes_in_background(tmp_path):
+    journal, retros, _ = _open(tmp_path, flush_interval=0.001)
+    retros.create(date(2024, 1, 1), [])
+    for _ in range(200):
+        if any(p.stat().st_size for p in tmp_path.glob("journal-*.ndjson")):
+            break
+        time.sleep(0.01)
+
+    assert any(p.stat().st_size for p in tmp_path.glob("journal-*.ndjson"))
+    journal.close()
+
+
+def test_write_returns_after_its_batch_is_fsynced(tmp_path):
+    journal, retros, items = _open(tmp_path, flush_interval=0.05)
+    retros.create(date(2024, 1, 1), [])
+    items.create("widget")
+
+    segment = sorted(tmp_path.glob("journal-*.ndjson"))[-1]
+    assert segment.read_bytes().count(b"\n") == 2
+    journal.close()
+
+
+def test_failed_batch_is_reported_and_thread_keeps_running(tmp_path, monkeypatch):
+    journal, retros, _ = _open(tmp_path, flush_interval=0.001)
+    real_fsync = os.fsync
+    failures = iter([RuntimeError("disk"), OSError("disk")])
+
+    def fsync(fd):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            retros.create(date(2024, 1, 1), [])
+
+    retro = retros.create(date(2024, 1, 2), [])
+    journal.close()
+
+    journal, restored, _ = _open(tmp_path)
+    assert restored.get(retro.id) == retro
+    journal.close()
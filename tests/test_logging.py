@@ -0,0 +1,72 @@
+import json
+import logging
+from logging.handlers import QueueHandler
+
+from fastapi.testclient import TestClient
+
+from app.logs import JsonFormatter, RequestIdFilter, request_id_var
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_generated_request_id_is_correlation_id():
+    """Id запроса возвращается в заголовке и совпадает с correlation_id ошибки."""
+    response = client.get("/items/999")
+
+    assert response.status_code == 404
+    request_id = response.headers["x-request-id"]
+    assert len(request_id) == 32
+    assert response.json()["correlation_id"] == request_id
+
+
+def test_client_request_id_is_propagated():
+    response = client.get("/retros/987654", headers={"X-Request-ID": "trace-42.a"})
+
+    assert response.status_code == 404
+    assert response.headers["x-request-id"] == "trace-42.a"
+    assert response.json()["correlation_id"] == "trace-42.a"
+
+
+def test_invalid_client_request_id_is_replaced():
+    response = client.get("/health", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] != "bad id\twith spaces"
+    assert len(response.headers["x-request-id"]) == 32
+
+
+def test_access_log_has_timing(caplog):
+    with caplog.at_level(logging.INFO, logger="app.access"):
+        response = client.get("/health", headers={"X-Request-ID": "access-1"})
+
+    records = [r for r in caplog.records if r.name == "app.access"]
+    assert records
+    record = records[-1]
+    assert response.status_code == 200
+    assert record.status == 200
+    assert record.path == "/health"
+    assert record.duration_ms >= 0
+
+
+def test_root_logger_goes_through_queue():
+    assert any(isinstance(h, QueueHandler) for h in logging.getLogger().handlers)
+
+
+def test_json_formatter_includes_request_id_and_extra():
+    token = request_id_var.set("req-1")
+    try:
+        record = logging.makeLogRecord(
+            {"name": "app", "levelname": "INFO", "msg": "hello %s", "args": ("x",)}
+        )
+        record.duration_ms = 1.5
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "hello x"
+    assert entry["request_id"] == "req-1"
+    assert entry["duration_ms"] == 1.5
+    assert entry["level"] == "INFO"
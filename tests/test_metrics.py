@@ -0,0 +1,131 @@
+import multiprocessing
+import os
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import LATENCY_BUCKETS, MERGED_NAME, Metrics
+from app.secure_upload import PNG_SIGNATURE
+
+client = TestClient(app)
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_counts_requests_by_route_template():
+    before = client.get("/metrics").text
+    key = 'http_requests_total{method="GET",route="/retros/{retro_id}",status="404"}'
+    client.get("/retros/424242")
+    client.get("/retros/434343")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert _sample(response.text, key) == _sample(before, key) + 2
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "http_requests_in_flight 1" in response.text
+    assert "retro_store_size " in response.text
+
+
+def test_upload_sizes_are_recorded(upload_dir):
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    before = _sample(client.get("/metrics").text, "upload_bytes_total")
+    data = PNG_SIGNATURE + b"\0" * 1000
+
+    client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", data, "image/png")}
+    )
+
+    text = client.get("/metrics").text
+    assert _sample(text, "upload_bytes_total") == before + len(data)
+    assert 'upload_size_bytes_bucket{le="+Inf"}' in text
+
+
+def test_histogram_buckets_are_cumulative(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    for value in (0.0005, 0.003, 0.003, 10.0):
+        metrics.observe(
+            "http_request_duration_seconds", 'route="/x"', value, LATENCY_BUCKETS
+        )
+
+    text = metrics.render()
+
+    prefix = 'http_request_duration_seconds_bucket{route="/x",'
+    assert _sample(text, prefix + 'le="0.001"}') == 1
+    assert _sample(text, prefix + 'le="0.005"}') == 3
+    assert _sample(text, prefix + 'le="+Inf"}') == 4
+    assert _sample(text, 'http_request_duration_seconds_count{route="/x"}') == 4
+
+
+def _in_flight_worker(directory: str) -> None:
+    metrics = Metrics(directory)
+    metrics.inc("http_requests_in_flight")
+    metrics.inc("http_requests_total", 'route="/x"')
+
+
+def _worker(directory: str) -> None:
+    metrics = Metrics(directory)
+    for _ in range(100):
+        metrics.inc("http_requests_total", 'route="/x"')
+
+
+def test_counters_from_worker_processes_are_aggregated(tmp_path):
+    """Значения воркеров суммируются, в том числе после их завершения."""
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_worker, args=(str(tmp_path),)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # heartbeat_ttl=0: heartbeat файлов завершившихся воркеров уже истек.
+    metrics = Metrics(str(tmp_path), heartbeat_ttl=0)
+    metrics.inc("http_requests_total", 'route="/x"')
+
+    assert _sample(metrics.render(), 'http_requests_total{route="/x"}') == 301
+    # Файлы завершившихся воркеров сведены в один и удалены.
+    names = sorted(p.name for p in tmp_path.glob("*.db"))
+    assert len(names) == 2
+    assert names[0] == MERGED_NAME
+    assert names[1].startswith(f"metrics-{os.getpid()}-")
+
+
+def test_live_gauges_of_dead_processes_are_not_merged(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    worker = context.Process(target=_in_flight_worker, args=(str(tmp_path),))
+    worker.start()
+    worker.join()
+
+    metrics = Metrics(str(tmp_path), heartbeat_ttl=0)
+    metrics.inc("http_requests_total", 'route="/x"')
+    text = metrics.render()
+
+    assert _sample(text, "http_requests_in_flight") == 0
+    assert _sample(text, 'http_requests_total{route="/x"}') == 2
+
+
+def test_liveness_follows_heartbeat_not_pid(tmp_path):
+    """Файл со свежим heartbeat живой, даже если его pid здесь не виден."""
+    worker = Metrics(str(tmp_path))
+    worker.inc("http_requests_in_flight")
+    path = next(tmp_path.glob("metrics-*.db"))
+    path.rename(tmp_path / "metrics-999999999-0.db")
+    scraper = Metrics(str(tmp_path), heartbeat_ttl=0.5)
+
+    scraper.inc("http_requests_total", 'route="/x"')
+    assert _sample(scraper.render(), "http_requests_in_flight") == 1
+    assert (tmp_path / "metrics-999999999-0.db").exists()
+
+    time.sleep(0.6)
+    assert _sample(scraper.render(), "http_requests_in_flight") == 0
+    Metrics(str(tmp_path), heartbeat_ttl=0.5).inc("http_requests_total")
+    assert not (tmp_path / "metrics-999999999-0.db").exists()
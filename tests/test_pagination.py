@@ -0,0 +1,97 @@
+import json
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import _RETROS_DB, app
+from app.pagination import encode_cursor
+
+client = TestClient(app)
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _create(session_date: str) -> int:
+    response = client.post("/retros", json={"session_date": session_date, "items": []})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_keyset_pagination_walks_all_pages():
+    for day in ["2024-01-03", "2024-01-01", "2024-01-02", "2024-01-02", "2024-01-05"]:
+        _create(day)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/retros", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend((r["session_date"], r["id"]) for r in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen)
+    assert len(seen) == 5
+
+
+def test_pagination_respects_date_filters():
+    for day in ["2024-01-01", "2024-02-01", "2024-02-02", "2024-03-01"]:
+        _create(day)
+
+    response = client.get(
+        "/retros",
+        params={"from_date": "2024-02-01", "to_date": "2024-02-28", "limit": 1},
+    )
+    assert [r["session_date"] for r in response.json()] == ["2024-02-01"]
+
+    response = client.get(
+        "/retros",
+        params={
+            "from_date": "2024-02-01",
+            "to_date": "2024-02-28",
+            "limit": 1,
+            "cursor": response.headers["X-Next-Cursor"],
+        },
+    )
+    assert [r["session_date"] for r in response.json()] == ["2024-02-02"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_invalid_cursor_returns_problem_detail():
+    response = client.get("/retros", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 422
+    body = response.json()
+    assert body["title"] == "validation_error"
+    assert body["detail"] == "Invalid cursor"
+
+
+def test_cursor_with_out_of_range_id_is_rejected():
+    """Подделанный курсор с id вне диапазона не должен портить ключ индекса."""
+    for retro_id in (-1, 0, 1 << 40):
+        cursor = encode_cursor((date(2024, 1, 1), retro_id))
+
+        response = client.get("/retros", params={"limit": 1, "cursor": cursor})
+
+        assert response.status_code == 422
+        assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_ndjson_export_streams_one_retro_per_line():
+    for day in ["2024-01-02", "2024-01-01"]:
+        _create(day)
+
+    response = client.get("/retros", headers={"Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["session_date"] for r in lines] == ["2024-01-01", "2024-01-02"]
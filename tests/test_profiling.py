@@ -0,0 +1,72 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app as main_app
+from app.profiling import ProfiledRoute, ProfileRing, ProfilingMiddleware
+
+
+def _profiled_app(directory, max_files: int = 2) -> TestClient:
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(
+        ProfilingMiddleware, token="s3cret", ring=ProfileRing(directory, max_files)
+    )
+
+    @app.get("/work/{n}")
+    def work(n: int):
+        return {"total": sum(i * i for i in range(n))}
+
+    return TestClient(app)
+
+
+def test_profiling_is_not_installed_by_default():
+    assert all(m.cls is not ProfilingMiddleware for m in main_app.user_middleware)
+
+
+def test_request_with_trusted_token_is_profiled(tmp_path):
+    client = _profiled_app(tmp_path)
+
+    response = client.get("/work/200000", headers={"X-Profile-Token": "s3cret"})
+
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    summary = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert (tmp_path / f"{profile_id}.prof").is_file()
+    assert summary["route"] == "/work/{n}"
+    assert summary["status"] == 200
+    assert set(summary["stages_ms"]) == {
+        "limiter",
+        "validation",
+        "handler",
+        "serialization",
+    }
+    # Синхронный обработчик в threadpool тоже попадает в профиль.
+    assert summary["stages_ms"]["handler"] > 0
+    assert any("<genexpr>" in line for line in summary["top"])
+
+
+def test_request_without_valid_token_is_not_profiled(tmp_path):
+    client = _profiled_app(tmp_path)
+
+    plain = client.get("/work/10")
+    wrong = client.get("/work/10", headers={"X-Profile-Token": "guess"})
+
+    assert "x-profile-id" not in plain.headers
+    assert "x-profile-id" not in wrong.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiles_are_kept_in_a_bounded_ring(tmp_path):
+    client = _profiled_app(tmp_path, max_files=2)
+
+    ids = [
+        client.get("/work/10", headers={"X-Profile-Token": "s3cret"}).headers[
+            "x-profile-id"
+        ]
+        for _ in range(5)
+    ]
+
+    assert ids == ["profile-000", "profile-001"] * 2 + ["profile-000"]
+    assert len(list(tmp_path.glob("*.prof"))) == 2
@@ -0,0 +1,116 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.rate_limit import (
+    BYTES_PER_UNIT,
+    DEFAULT_COST,
+    RATE_LIMIT_EXTRA,
+    CostLimitedRoute,
+    CostLimiter,
+)
+from app.secure_upload import PNG_SIGNATURE
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    def set_budget(limit: str) -> CostLimiter:
+        limiter = CostLimiter(limit)
+        monkeypatch.setattr(app.state, "cost_limiter", limiter)
+        return limiter
+
+    return set_budget
+
+
+def _create_retro() -> int:
+    response = client.post("/retros", json={"session_date": "2024-01-01", "items": []})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_costed_route_reports_ratelimit_headers(budget):
+    budget("10/minute")
+
+    response = client.post("/retros", json={"session_date": "2024-01-01", "items": []})
+
+    assert response.headers["ratelimit-limit"] == "10"
+    assert response.headers["ratelimit-remaining"] == "9"
+    assert response.headers["ratelimit-policy"] == "10;w=60"
+    assert "ratelimit-limit" not in client.get("/health").headers
+
+
+def test_budget_exhaustion_returns_429_with_retry_after(budget):
+    budget("3/minute")
+    for _ in range(3):
+        assert client.delete("/retros/999").status_code == 404
+
+    response = client.delete("/retros/999")
+
+    assert response.status_code == 429
+    assert response.json()["status"] == 429
+    assert response.headers["ratelimit-remaining"] == "0"
+    assert int(response.headers["retry-after"]) > 0
+
+
+def test_upload_is_charged_by_received_bytes(budget, upload_dir):
+    """Загрузка стоит 5 единиц плюс единицу за каждые 64 КиБ тела."""
+    limiter = budget("100/minute")
+    retro_id = _create_retro()
+    data = PNG_SIGNATURE + b"\0" * (4 * BYTES_PER_UNIT)
+
+    response = client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", data, "image/png")}
+    )
+
+    assert response.status_code == 200
+    remaining = int(response.headers["ratelimit-remaining"])
+    assert remaining == 100 - 1 - 5 - 4
+    assert limiter.headers("testclient")["RateLimit-Remaining"] == str(remaining)
+
+
+def test_large_upload_is_rejected_while_body_streams(budget):
+    budget("20/minute")
+    retro_id = _create_retro()
+    data = PNG_SIGNATURE + b"\0" * (32 * BYTES_PER_UNIT)
+
+    response = client.post(
+        f"/retros/{retro_id}/attachments", files={"file": ("a.png", data, "image/png")}
+    )
+
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+
+
+def test_every_route_declares_its_cost():
+    """Каждый маршрут приложения объявляет стоимость явно, включая освобожденные."""
+    undeclared = [
+        route.path
+        for route in app.routes
+        if isinstance(route, APIRoute)
+        and RATE_LIMIT_EXTRA not in (route.openapi_extra or {})
+    ]
+
+    assert undeclared == []
+
+
+def test_reads_are_charged_and_undeclared_routes_cost_default(budget):
+    limiter = budget("100/minute")
+    retro_id = _create_retro()
+
+    response = client.get(f"/retros/{retro_id}")
+
+    assert response.headers["ratelimit-remaining"] == str(100 - 1 - 1)
+    undeclared = FastAPI()
+    undeclared.router.route_class = CostLimitedRoute
+    undeclared.state.cost_limiter = limiter
+
+    @undeclared.get("/ping")
+    def ping():
+        return {}
+
+    response = TestClient(undeclared).get("/ping")
+    assert response.headers["ratelimit-remaining"] == str(100 - 2 - DEFAULT_COST)
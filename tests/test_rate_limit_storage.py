@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+from app.rate_limit_storage import SharedMemoryStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    shm = SharedMemoryStorage(f"shm://{tmp_path}/limits?slots=64")
+    yield shm
+    shm.close()
+
+
+def test_storage_is_registered_for_shm_scheme(tmp_path):
+    shm = storage_from_string(f"shm://{tmp_path}/limits")
+    assert isinstance(shm, SharedMemoryStorage)
+    assert shm.check()
+
+
+def test_fixed_window_counts_and_expires(storage):
+    assert storage.incr("k", 1) == 1
+    assert storage.incr("k", 1, amount=2) == 3
+    assert storage.get("k") == 3
+    assert storage.get_expiry("k") > time.time()
+
+    storage.clear("k")
+    assert storage.get("k") == 0
+
+
+def test_sliding_window_limiter_blocks_over_limit(storage):
+    limiter = SlidingWindowCounterRateLimiter(storage)
+    item = parse("3/minute")
+
+    assert [limiter.hit(item, "1.2.3.4") for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(item, "5.6.7.8")
+    assert limiter.get_window_stats(item, "1.2.3.4").remaining == 0
+
+
+def test_idle_keys_are_evicted_in_fixed_size_table(tmp_path):
+    """Таблица из одной корзины: истекшие ключи освобождают слоты."""
+    storage = SharedMemoryStorage(f"shm://{tmp_path}/limits?slots=8")
+    for i in range(8):
+        storage.incr(f"old-{i}", 0.01)
+    time.sleep(0.02)
+    for i in range(8):
+        storage.incr(f"new-{i}", 60)
+
+    assert all(storage.get(f"new-{i}") == 1 for i in range(8))
+    assert storage.reset() == 8
+    storage.close()
+
+
+def test_file_with_other_slot_count_is_rejected_not_reset(tmp_path):
+    """Файл в mmap у других воркеров: чужая разметка — ошибка, а не переразметка."""
+    storage = SharedMemoryStorage(f"shm://{tmp_path}/limits?slots=64")
+    storage.incr("key", 60)
+
+    with pytest.raises(ValueError, match="laid out for 64 slots, expected 128"):
+        SharedMemoryStorage(f"shm://{tmp_path}/limits?slots=128")
+    (tmp_path / "garbage").write_bytes(b"not a limits file")
+    with pytest.raises(ValueError, match="unknown layout"):
+        SharedMemoryStorage(f"shm://{tmp_path}/garbage")
+
+    assert storage.get("key") == 1
+    assert (tmp_path / "limits").stat().st_size == storage._size
+    storage.close()
+
+
+def _hit_many(uri: str, count: int) -> None:
+    limiter = FixedWindowRateLimiter(SharedMemoryStorage(uri))
+    item = parse("1000/minute")
+    for _ in range(count):
+        limiter.hit(item, "shared")
+
+
+def test_counts_are_shared_between_processes(tmp_path):
+    uri = f"shm://{tmp_path}/limits?slots=64"
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_hit_many, args=(uri, 50)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    limiter = FixedWindowRateLimiter(SharedMemoryStorage(uri))
+    assert limiter.get_window_stats(parse("1000/minute"), "shared").remaining == 850
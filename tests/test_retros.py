@@ -31,7 +31,7 @@ def test_create_retro_success():
     assert len(body["items"]) == 1
 
     assert len(_RETROS_DB) == 1
-    assert _RETROS_DB[0].id == body["id"]
+    assert _RETROS_DB.get(body["id"]) is not None
 
 
 def test_create_retro_future_date_error():
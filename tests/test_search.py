@@ -0,0 +1,149 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import _RETROS_DB, app
+from app.models import Retro, RetroItem
+from app.search import SearchIndex, parse_query, tokenize
+from app.sqlite_store import SQLiteDatabase, SQLiteRetroRepository
+
+client = TestClient(app)
+
+
+def setup_function():
+    _RETROS_DB.clear()
+
+
+def _create(session_date: str, *texts: str) -> int:
+    items = [{"what_went_well": t, "to_improve": "-", "actions": "-"} for t in texts]
+    response = client.post(
+        "/retros", json={"session_date": session_date, "items": items}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _search(**params):
+    response = client.get("/retros/search", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_tokenize_handles_russian_and_english():
+    assert tokenize("Flaky tests в CI") == ["flaky", "test", "ci"]
+    assert tokenize("Падающие тесты, ёлка") == tokenize("падающих тестов елки")
+
+
+def test_parse_query_builds_or_of_and_groups():
+    assert parse_query("flaky tests OR деплой") == [["flaky", "test"], ["депл"]]
+
+
+def test_search_and_query_ranks_matches():
+    flaky = _create("2024-01-01", "Flaky tests again", "flaky tests in CI are flaky")
+    _create("2024-01-02", "Tests are green")
+    _create("2024-01-03", "Flaky network")
+
+    body = _search(q="flaky tests")
+
+    assert body["total"] == 1
+    assert body["hits"][0]["retro"]["id"] == flaky
+    assert body["hits"][0]["score"] > 0
+
+
+def test_search_or_query_and_russian_text():
+    first = _create("2024-01-01", "Падающие тесты мешают релизу")
+    second = _create("2024-01-02", "Медленный деплой")
+    _create("2024-01-03", "Все отлично")
+
+    body = _search(q="тест OR деплой")
+
+    assert body["total"] == 2
+    assert {hit["retro"]["id"] for hit in body["hits"]} == {first, second}
+
+
+def test_search_respects_date_filters_and_pagination():
+    ids = [_create(f"2024-01-0{day}", "flaky tests") for day in range(1, 6)]
+
+    body = _search(q="flaky", from_date="2024-01-02", to_date="2024-01-04", limit=2)
+    assert body["total"] == 3
+    assert len(body["hits"]) == 2
+
+    rest = _search(
+        q="flaky", from_date="2024-01-02", to_date="2024-01-04", limit=2, offset=2
+    )
+    found = {hit["retro"]["id"] for hit in body["hits"] + rest["hits"]}
+    assert found == set(ids[1:4])
+
+
+def test_search_index_follows_updates_and_deletes():
+    retro_id = _create("2024-01-01", "flaky tests")
+    client.put(
+        f"/retros/{retro_id}",
+        json={
+            "session_date": "2024-01-01",
+            "items": [{"what_went_well": "stable", "to_improve": "-", "actions": "-"}],
+        },
+    )
+    assert _search(q="flaky")["total"] == 0
+    assert _search(q="stable")["total"] == 1
+
+    client.delete(f"/retros/{retro_id}")
+    assert _search(q="stable")["total"] == 0
+
+
+def test_search_without_terms_is_rejected():
+    response = client.get("/retros/search", params={"q": "the OR a"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Query has no searchable terms"
+
+
+def _retro(retro_id: int, text: str) -> Retro:
+    item = RetroItem(what_went_well=text, to_improve="-", actions="-")
+    return Retro(id=retro_id, session_date=date(2024, 1, 1), items=[item])
+
+
+def _ids(index: SearchIndex, query: str) -> list:
+    return sorted(doc for doc, _ in index.search(query)[1])
+
+
+def test_search_index_ignores_events_older_than_applied_revision():
+    """Уведомления идут вне блокировок: опоздавшее событие не откатывает индекс."""
+    index = SearchIndex()
+
+    index.on_write(None, _retro(1, "stable"), 5)
+    index.on_write(None, _retro(1, "flaky"), 3)
+    index.on_write(_retro(2, "flaky"), None, 7)
+    index.on_write(None, _retro(2, "flaky"), 6)
+
+    assert _ids(index, "stable") == [1]
+    assert _ids(index, "flaky") == []
+
+
+def test_search_index_syncs_writes_of_other_workers(tmp_path):
+    """Два воркера на общем SQLite: индекс одного догоняет записи другого."""
+    path = str(tmp_path / "retros.sqlite3")
+    mine = SQLiteRetroRepository(SQLiteDatabase(path), batch_size=2)
+    other = SQLiteRetroRepository(SQLiteDatabase(path), batch_size=2)
+    index = SearchIndex()
+    index.rebuild(mine, mine.version)
+    mine.subscribe(index)
+    item = RetroItem(what_went_well="flaky", to_improve="-", actions="-")
+    day = date(2024, 1, 1)
+
+    kept = mine.create(day, [item]).id
+    created = [other.create(day, [item]).id for _ in range(3)]
+    other.update(created[0], day, [item.model_copy(update={"what_went_well": "ok"})])
+    other.delete(created[1])
+    index.sync(mine)
+
+    assert _ids(index, "flaky") == [kept, created[2]]
+    assert _ids(index, "ok") == [created[0]]
+    assert index.version == mine.version
+
+    other.clear()
+    other.create(day, [item])
+    index.sync(mine)
+
+    assert _ids(index, "flaky") == [1]
+    assert _ids(index, "ok") == []
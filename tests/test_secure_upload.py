@@ -1,14 +1,22 @@
+import asyncio
 from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
 
-from app.main import app
-from app.secure_upload import MAX_FILE_SIZE, PNG_SIGNATURE, secure_save
+from app.blob_store import BlobStore
+from app.executor import BoundedExecutor, ExecutorSaturated
+from app.main import app, read_executor, upload_executor
+from app.secure_upload import MAX_FILE_SIZE, PNG_SIGNATURE, StreamingUpload, secure_save
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def _uploads(upload_dir):
+    yield
+
+
 def test_secure_save_rejects_oversized_file(tmp_path: Path):
     """Негативный тест: файл, превышающий MAX_FILE_SIZE, должен быть отвергнут."""
     large_data = PNG_SIGNATURE + b"a" * (MAX_FILE_SIZE + 1)
@@ -91,3 +99,141 @@ def test_upload_endpoint_rejects_bad_file(tmp_path):
     body = response_upload.json()
     assert body["title"] == "upload_failed"
     assert body["detail"] == "Invalid file type"
+
+
+def test_streaming_upload_accepts_chunked_jpeg(tmp_path: Path):
+    """JPEG с маркером EOI, разорванным между чанками, принимается."""
+    jpeg = b"\xff\xd8" + b"x" * 100 + b"\xff\xd9"
+
+    with StreamingUpload(tmp_path) as upload:
+        for i in range(0, len(jpeg), 7):
+            upload.write(jpeg[i : i + 7])
+        saved = upload.commit()
+
+    assert saved.suffix == ".jpg"
+    assert saved.read_bytes() == jpeg
+    assert list(tmp_path.iterdir()) == [saved]
+
+
+def test_streaming_upload_aborts_as_soon_as_limit_exceeded(tmp_path: Path):
+    """Негативный тест: превышение лимита прерывает запись и удаляет временный файл."""
+    with pytest.raises(ValueError, match="File is too large"):
+        with StreamingUpload(tmp_path, max_size=16) as upload:
+            upload.write(PNG_SIGNATURE + b"a" * 8)
+            upload.write(b"b")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_streaming_upload_rejects_bad_signature_on_first_chunk(tmp_path: Path):
+    """Негативный тест: неверная сигнатура отвергается до записи на диск."""
+    with pytest.raises(ValueError, match="Invalid file type"):
+        with StreamingUpload(tmp_path) as upload:
+            upload.write(b"GIF89a-not-allowed")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_published_files_are_world_readable(tmp_path: Path):
+    """Опубликованные файлы читает и внешний статический сервер."""
+    blobs = BlobStore(tmp_path)
+    data = PNG_SIGNATURE + b"data"
+
+    paths = [secure_save(tmp_path, data), secure_save(tmp_path, data, blobs)]
+
+    assert [path.stat().st_mode & 0o777 for path in paths] == [0o644, 0o644]
+
+
+def test_upload_endpoint_requires_multipart_file():
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    url = f"/retros/{retro_id}/attachments"
+
+    for response in (
+        client.post(url, content=PNG_SIGNATURE),
+        client.post(url, data={"file": "not a file"}),
+        client.post(url, files={"other": ("a.png", PNG_SIGNATURE, "image/png")}),
+    ):
+        assert response.status_code == 422
+        assert response.json()["title"] == "upload_failed"
+
+
+def test_executor_submit_holds_slot_while_running():
+    executor = BoundedExecutor(max_workers=1, max_pending=1)
+
+    async def scenario():
+        pending = await executor.submit(lambda: executor.pending)
+        async with executor.slot():
+            with pytest.raises(ExecutorSaturated):
+                await executor.submit(lambda: None)
+        return pending
+
+    assert asyncio.run(scenario()) == 1
+    assert executor.pending == 0
+
+
+def test_upload_endpoint_returns_503_when_queue_full(monkeypatch):
+    """Негативный тест: при заполненной очереди загрузок сервер сразу отвечает 503."""
+    response_create = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    )
+    retro_id = response_create.json()["id"]
+    monkeypatch.setattr(upload_executor, "max_pending", 0)
+
+    response_upload = client.post(
+        f"/retros/{retro_id}/attachments",
+        files={"file": ("test.png", PNG_SIGNATURE + b"data", "image/png")},
+    )
+
+    assert response_upload.status_code == 503
+    assert response_upload.headers["Retry-After"] == "1"
+    assert response_upload.json()["title"] == "service_unavailable"
+
+
+def test_attachment_reads_succeed_while_uploads_are_saturated(monkeypatch):
+    """Чтение вложений идет через свой пул: заполненная очередь загрузок ему не мешает."""
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    data = PNG_SIGNATURE + b"data"
+    name = client.post(
+        f"/retros/{retro_id}/attachments",
+        files={"file": ("test.png", data, "image/png")},
+    ).json()["filename"]
+    session_id = client.post(
+        f"/retros/{retro_id}/attachments/sessions", headers={"Upload-Length": "64"}
+    ).json()["session_id"]
+    monkeypatch.setattr(upload_executor, "max_pending", 0)
+
+    assert (
+        client.post(
+            f"/retros/{retro_id}/attachments",
+            files={"file": ("test.png", data, "image/png")},
+        ).status_code
+        == 503
+    )
+    listed = client.get(f"/retros/{retro_id}/attachments")
+    assert listed.status_code == 200
+    assert [a["filename"] for a in listed.json()] == [name]
+    download = client.get(f"/retros/{retro_id}/attachments/{name}")
+    assert download.status_code == 200
+    assert download.content == data
+    session = client.get(f"/retros/{retro_id}/attachments/sessions/{session_id}")
+    assert session.status_code == 200
+    assert session.json()["offset"] == 0
+
+
+def test_attachment_reads_return_503_when_read_queue_full(monkeypatch):
+    retro_id = client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+    monkeypatch.setattr(read_executor, "max_pending", 0)
+
+    for url in (
+        f"/retros/{retro_id}/attachments",
+        f"/retros/{retro_id}/attachments/{'0' * 64}.png",
+    ):
+        response = client.get(url)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
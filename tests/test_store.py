@@ -0,0 +1,281 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+
+from app import store as store_module
+from app.models import RetroItem
+from app.repository import RetroListener, RevisionConflict
+from app.sqlite_store import SQLiteDatabase, SQLiteItemRepository, SQLiteRetroRepository
+from app.store import ItemStore, RetroStore
+
+ITEM = RetroItem(what_went_well="a", to_improve="b", actions="c")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield RetroStore()
+        return
+    db = SQLiteDatabase(str(tmp_path / "retros.sqlite3"), pool_size=2)
+    yield SQLiteRetroRepository(db, batch_size=2)
+    db.close()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def item_store(request, tmp_path):
+    if request.param == "memory":
+        return ItemStore()
+    return SQLiteItemRepository(SQLiteDatabase(str(tmp_path / "items.sqlite3")))
+
+
+def _create(store, session_date: str, items=()):
+    return store.create(date.fromisoformat(session_date), list(items))
+
+
+def test_store_lookup_by_id(store):
+    _create(store, "2024-01-10")
+    second = _create(store, "2024-01-05", [ITEM])
+
+    assert len(store) == 2
+    assert second.id in store
+    assert store.get(second.id).session_date == date(2024, 1, 5)
+    assert store.get(second.id).items == [ITEM]
+    assert store.get(999) is None
+    assert 999 not in store
+
+
+def test_store_range_query_is_sorted_and_inclusive(store):
+    ids = [
+        _create(store, day).id
+        for day in ["2024-03-01", "2024-01-01", "2024-02-01", "2024-02-15"]
+    ]
+
+    found = [r.id for r in store.range(date(2024, 2, 1), date(2024, 3, 1))]
+    assert found == [ids[2], ids[3], ids[0]]
+    assert [r.id for r in store.range(to_date=date(2024, 1, 31))] == [ids[1]]
+    assert [r.id for r in store.range(from_date=date(2024, 3, 2))] == []
+
+
+def test_store_range_after_key(store):
+    ids = [_create(store, day).id for day in ["2024-01-01", "2024-01-02", "2024-01-02"]]
+
+    found = [r.id for r in store.range(after=(date(2024, 1, 2), ids[1]))]
+    assert found == [ids[2]]
+
+
+def test_store_update_and_delete_keep_index_consistent(store):
+    first = _create(store, "2024-01-01")
+    second = _create(store, "2024-01-02")
+
+    updated = store.update(first.id, date(2024, 5, 1), [ITEM, ITEM])
+    assert updated.session_date == date(2024, 5, 1)
+    assert store.get(first.id).items == [ITEM, ITEM]
+    assert [r.id for r in store.range()] == [second.id, first.id]
+
+    assert store.delete(second.id).id == second.id
+    assert store.delete(second.id) is None
+    assert [r.id for r in store.range()] == [first.id]
+    assert store.update(42, date(2024, 1, 1), []) is None
+
+
+def test_store_ids_are_not_reused_after_delete(store):
+    _create(store, "2024-01-01")
+    second = _create(store, "2024-01-02")
+    store.delete(second.id)
+
+    assert _create(store, "2024-01-03").id > second.id
+
+
+def test_store_clear(store):
+    _create(store, "2024-01-01", [ITEM])
+    store.clear()
+
+    assert len(store) == 0
+    assert list(store) == []
+
+
+def test_item_store_roundtrip(item_store):
+    item = item_store.create("demo")
+
+    assert item_store.get(item["id"]) == item
+    assert item_store.get(999) is None
+
+
+def test_sqlite_store_persists_across_instances(tmp_path):
+    path = str(tmp_path / "retros.sqlite3")
+    retro = SQLiteRetroRepository(SQLiteDatabase(path)).create(date(2024, 1, 1), [ITEM])
+
+    reopened = SQLiteRetroRepository(SQLiteDatabase(path))
+    assert reopened.get(retro.id) == retro
+    with reopened.db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_store_versions_and_revisions(store):
+    start = store.version
+    retro = _create(store, "2024-01-01")
+    created_revision = store.revision(retro.id)
+
+    assert store.version > start
+    store.update(retro.id, date(2024, 1, 2), [], expected_revision=created_revision)
+    assert store.revision(retro.id) > created_revision
+
+    with pytest.raises(RevisionConflict):
+        store.update(retro.id, date(2024, 1, 3), [], expected_revision=created_revision)
+    assert store.get(retro.id).session_date == date(2024, 1, 2)
+
+    version = store.version
+    store.delete(retro.id)
+    assert store.version > version
+    assert store.revision(retro.id) is None
+
+
+class _Recorder(RetroListener):
+    def __init__(self):
+        self.events = []
+
+    def on_write(self, old, new, revision):
+        self.events.append(
+            (old and old.session_date, new and new.session_date, revision)
+        )
+
+    def on_clear(self):
+        self.events.append("clear")
+
+
+def test_store_notifies_listeners(store):
+    recorder = _Recorder()
+    store.subscribe(recorder)
+
+    retro = _create(store, "2024-01-01")
+    store.update(retro.id, date(2024, 1, 2), [])
+    store.delete(retro.id)
+    store.clear()
+
+    d1, d2 = date(2024, 1, 1), date(2024, 1, 2)
+    assert [e[:2] for e in recorder.events[:3]] == [(None, d1), (d1, d2), (d2, None)]
+    assert recorder.events[0][2] < recorder.events[1][2] < recorder.events[2][2]
+    assert recorder.events[3] == "clear"
+
+
+def test_store_concurrent_writes_lose_nothing(store):
+    """Параллельные create/update/delete не дают дублей id и потерянных записей."""
+    threads, per_thread = 8, 50
+    deleted: list = []
+
+    def worker(n: int) -> list:
+        ids = []
+        for i in range(per_thread):
+            retro = _create(store, f"2024-01-{1 + (n + i) % 28:02d}", [ITEM])
+            ids.append(retro.id)
+            store.update(retro.id, date(2024, 2, 1 + i % 28), [ITEM, ITEM])
+            if i % 5 == 0:
+                store.delete(retro.id)
+                deleted.append(retro.id)
+            assert sum(1 for _ in store.range()) <= threads * per_thread
+        return ids
+
+    with ThreadPoolExecutor(threads) as pool:
+        created = [i for ids in pool.map(worker, range(threads)) for i in ids]
+
+    assert len(created) == len(set(created)) == threads * per_thread
+    alive = set(created) - set(deleted)
+    assert {r.id for r in store.range()} == alive
+    assert len(store) == len(alive)
+    assert all(len(store.get(i).items) == 2 for i in alive)
+
+
+def test_item_store_concurrent_ids_are_unique(item_store):
+    with ThreadPoolExecutor(8) as pool:
+        items = list(pool.map(item_store.create, [f"item-{i}" for i in range(400)]))
+
+    assert len({item["id"] for item in items}) == 400
+    assert all(item_store.get(item["id"]) == item for item in items)
+
+
+def test_memory_store_keeps_compact_records_and_shares_equal_texts():
+    store = RetroStore()
+    text = "Flaky tests in CI"
+    first = store.create(
+        date(2024, 1, 1),
+        [RetroItem(what_went_well="a", to_improve="".join(text), actions="c")],
+    )
+    second = store.create(
+        date(2024, 1, 2),
+        [RetroItem(what_went_well="b", to_improve=text[:5] + text[5:], actions="c")],
+    )
+
+    assert store.get(first.id) == first
+    assert store.get(second.id) == second
+    assert (
+        store.get(first.id).items[0].to_improve
+        is store.get(second.id).items[0].to_improve
+    )
+
+
+def test_memory_store_chunks_match_plain_model(monkeypatch):
+    """Части снимка делятся и удаляются, а выборки совпадают с простой моделью."""
+    monkeypatch.setattr(store_module, "_CHUNK_BITS", 2)
+    monkeypatch.setattr(store_module, "_CHUNK", 4)
+    rng = random.Random(15)
+    store = RetroStore()
+    model = {}
+    for _ in range(600):
+        op = rng.random()
+        session_date = date(2024, 1, 1) + timedelta(days=rng.randrange(30))
+        if op < 0.5 or not model:
+            retro = store.create(session_date, [])
+            model[retro.id] = session_date
+        elif op < 0.75:
+            retro_id = rng.choice(list(model))
+            store.update(retro_id, session_date, [])
+            model[retro_id] = session_date
+        else:
+            retro_id = rng.choice(list(model))
+            store.delete(retro_id)
+            del model[retro_id]
+
+    expected = sorted((d, retro_id) for retro_id, d in model.items())
+    assert [(r.session_date, r.id) for r in store.range()] == expected
+    assert len(store) == len(model)
+    assert len(store._snapshot.chunks) > 1
+    lo, hi = date(2024, 1, 10), date(2024, 1, 20)
+    assert [(r.session_date, r.id) for r in store.range(lo, hi)] == [
+        key for key in expected if lo <= key[0] <= hi
+    ]
+    after = expected[len(expected) // 2]
+    assert [(r.session_date, r.id) for r in store.range(after=after)] == [
+        key for key in expected if key > after
+    ]
+
+
+def test_memory_store_write_copies_only_touched_chunks(monkeypatch):
+    monkeypatch.setattr(store_module, "_CHUNK_BITS", 2)
+    monkeypatch.setattr(store_module, "_CHUNK", 4)
+    store = RetroStore()
+    for day in range(1, 29):
+        store.create(date(2024, 1, day), [])
+    before = store._snapshot
+
+    store.update(1, date(2024, 1, 1), [ITEM])
+
+    after = store._snapshot
+    assert before.record(1).texts == ()
+    assert all(a is b for a, b in zip(before.chunks, after.chunks))
+    copied = [a is not b for a, b in zip(before.shards.values(), after.shards.values())]
+    assert copied.count(True) == 1
+
+
+@pytest.mark.parametrize("retro_id", [1 << 64, -(1 << 64), 99999999999999999999])
+def test_store_ids_out_of_range_are_not_found(store, item_store, retro_id):
+    """Id вне диапазона INTEGER SQLite — просто нет такой записи, как в памяти."""
+    _create(store, "2024-01-01")
+
+    assert store.get(retro_id) is None
+    assert store.revision(retro_id) is None
+    assert retro_id not in store
+    assert store.update(retro_id, date(2024, 1, 2), []) is None
+    assert store.delete(retro_id) is None
+    assert item_store.get(retro_id) is None
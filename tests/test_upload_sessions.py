@@ -0,0 +1,234 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import upload_sessions
+from app.main import app
+from app.secure_upload import JPEG_EOI, JPEG_SOI, MAX_FILE_SIZE, PNG_SIGNATURE
+from app.upload_sessions import UploadSessions
+
+client = TestClient(app)
+
+PNG = PNG_SIGNATURE + bytes(range(256)) * 64
+
+
+@pytest.fixture(autouse=True)
+def _uploads(upload_dir):
+    yield
+
+
+def _retro() -> int:
+    return client.post(
+        "/retros", json={"session_date": "2024-01-01", "items": []}
+    ).json()["id"]
+
+
+def _start(retro_id: int, length: int) -> str:
+    response = client.post(
+        f"/retros/{retro_id}/attachments/sessions",
+        headers={"Upload-Length": str(length)},
+    )
+    assert response.status_code == 201
+    assert response.headers["upload-offset"] == "0"
+    return response.json()["session_id"]
+
+
+def _patch(retro_id: int, session_id: str, offset: int, data: bytes):
+    return client.patch(
+        f"/retros/{retro_id}/attachments/sessions/{session_id}",
+        content=data,
+        headers={
+            "Upload-Offset": str(offset),
+            "Content-Type": "application/offset+octet-stream",
+        },
+    )
+
+
+def test_upload_resumes_from_reported_offset():
+    """Загрузка по частям: HEAD сообщает смещение, неверное смещение — 409."""
+    retro_id = _retro()
+    session_id = _start(retro_id, len(PNG))
+    url = f"/retros/{retro_id}/attachments/sessions/{session_id}"
+
+    first = _patch(retro_id, session_id, 0, PNG[:5000])
+    assert first.status_code == 204
+    assert first.headers["upload-offset"] == "5000"
+
+    status = client.head(url)
+    assert status.status_code == 200
+    assert status.headers["upload-offset"] == "5000"
+    assert status.headers["upload-length"] == str(len(PNG))
+
+    conflict = _patch(retro_id, session_id, 0, PNG[:5000])
+    assert conflict.status_code == 409
+    assert conflict.headers["upload-offset"] == "5000"
+
+    done = _patch(retro_id, session_id, 5000, PNG[5000:])
+    assert done.status_code == 200
+    assert done.json()["content_type"] == "image/png"
+
+    name = done.json()["filename"]
+    download = client.get(f"/retros/{retro_id}/attachments/{name}")
+    assert download.content == PNG
+    assert client.get(url).status_code == 404
+
+
+def test_invalid_signature_fails_whole_session():
+    retro_id = _retro()
+    session_id = _start(retro_id, 100)
+
+    response = _patch(retro_id, session_id, 0, b"GIF89a" + b"\0" * 10)
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Invalid file type"
+    url = f"/retros/{retro_id}/attachments/sessions/{session_id}"
+    assert client.get(url).status_code == 404
+
+
+def test_bytes_past_declared_length_are_rejected():
+    retro_id = _retro()
+    session_id = _start(retro_id, 16)
+
+    response = _patch(retro_id, session_id, 0, PNG[:32])
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "File is too large"
+
+
+def test_session_rejects_oversized_or_missing_length():
+    retro_id = _retro()
+    url = f"/retros/{retro_id}/attachments/sessions"
+
+    assert (
+        client.post(url, headers={"Upload-Length": str(MAX_FILE_SIZE + 1)}).status_code
+        == 422
+    )
+    assert client.post(url).status_code == 422
+    assert (
+        client.post(
+            "/retros/999999/attachments/sessions", headers={"Upload-Length": "10"}
+        ).status_code
+        == 404
+    )
+
+
+def test_session_belongs_to_its_retro():
+    retro_id = _retro()
+    session_id = _start(retro_id, len(PNG))
+
+    response = client.get(f"/retros/{_retro()}/attachments/sessions/{session_id}")
+
+    assert response.status_code == 404
+
+
+def test_jpeg_end_marker_is_checked_on_last_part(tmp_path):
+    sessions = UploadSessions(tmp_path)
+    jpeg = JPEG_SOI + b"\0" * 100
+    session = sessions.create(retro_id=1, length=len(jpeg))
+
+    write = sessions.begin_write(session.id, 0)
+    write.write(jpeg[:50])
+    assert write.finish() is None
+
+    write = sessions.begin_write(session.id, 50)
+    write.write(jpeg[50:])
+    with pytest.raises(ValueError, match="Invalid file type"):
+        write.finish()
+    with pytest.raises(upload_sessions.SessionNotFound):
+        sessions.get(session.id)
+
+
+def test_resumed_jpeg_is_committed(tmp_path):
+    sessions = UploadSessions(tmp_path)
+    jpeg = JPEG_SOI + b"\1" * 100 + JPEG_EOI
+    session = sessions.create(retro_id=1, length=len(jpeg))
+
+    for start, end in ((0, 1), (1, 60), (60, len(jpeg))):
+        write = sessions.begin_write(session.id, start)
+        write.write(jpeg[start:end])
+        saved = write.finish()
+
+    assert saved.path.read_bytes() == jpeg
+    assert saved.path.parent == tmp_path.resolve()
+    assert saved.sha256 == hashlib.sha256(jpeg).hexdigest()
+    assert saved.mime_type == "image/jpeg"
+
+
+def test_concurrent_write_and_wrong_offset(tmp_path):
+    sessions = UploadSessions(tmp_path)
+    session = sessions.create(retro_id=1, length=len(PNG))
+
+    write = sessions.begin_write(session.id, 0)
+    with pytest.raises(upload_sessions.SessionBusy):
+        sessions.begin_write(session.id, 0)
+    write.write(PNG[:10])
+    write.finish()
+
+    with pytest.raises(upload_sessions.OffsetMismatch) as exc:
+        sessions.begin_write(session.id, 0)
+    assert exc.value.offset == 10
+
+
+def test_sweep_removes_expired_sessions(tmp_path):
+    sessions = UploadSessions(tmp_path, ttl=60)
+    old = sessions.create(retro_id=1, length=10)
+    busy = sessions.create(retro_id=1, length=10)
+    write = sessions.begin_write(busy.id, 0)
+
+    assert sessions.sweep(now=time.time()) == 0
+    assert sessions.sweep(now=time.time() + 120) == 1
+    write.abandon()
+
+    with pytest.raises(upload_sessions.SessionNotFound):
+        sessions.get(old.id)
+    assert not sessions.part_path(old.id).exists()
+    assert sessions.get(busy.id).offset == 0
+
+
+def test_cancel_during_write_is_a_conflict():
+    """DELETE во время записи части — 409, а не удаление файла из-под PATCH."""
+    from app import main
+
+    retro_id = _retro()
+    session_id = _start(retro_id, len(PNG))
+    url = f"/retros/{retro_id}/attachments/sessions/{session_id}"
+    write = main.upload_sessions.begin_write(session_id, 0)
+
+    assert client.delete(url).status_code == 409
+    write.write(PNG)
+    saved = write.finish()
+
+    assert saved.path.read_bytes() == PNG
+    assert client.delete(url).status_code == 404
+
+
+def test_write_to_cancelled_session_is_not_found(tmp_path):
+    sessions = UploadSessions(tmp_path)
+    session = sessions.create(retro_id=1, length=len(PNG))
+    part = os.open(sessions.part_path(session.id), os.O_RDONLY)
+    sessions.cancel(session.id)
+
+    with pytest.raises(upload_sessions.SessionNotFound):
+        upload_sessions.SessionWrite(sessions, session)
+    os.close(part)
+
+
+def test_new_session_has_meta_before_part(tmp_path, monkeypatch):
+    """Sweep не удаляет только что созданную сессию как осиротевшую."""
+    sessions = UploadSessions(tmp_path, ttl=60)
+    swept = []
+    touch = Path.touch
+
+    def sweep_then_touch(path, *args, **kwargs):
+        swept.append(sessions.sweep())
+        touch(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "touch", sweep_then_touch)
+    session = sessions.create(retro_id=1, length=10)
+
+    assert swept == [0]
+    assert sessions.get(session.id).offset == 0